@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import csv
+import logging
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from ..services.downsample import as_of, parse_duration_ms
+from ..services.redis_store import get_rules_raw, get_timeseries_rows_many, get_watchlist
+from ..services.retention import aggregate_rows, project
+from .rule_engine import DEFAULT_RULESET, SERIES_STATES, CompiledRules, compile_ruleset
+from .srs import heuristic_srs
+from .windows import FUNDING_WINDOW_MS, PRICE_WINDOW_MS, TWAP_WINDOW_MS
+
+logger = logging.getLogger("srr.backtest")
+
+# Stored metrics a backtest replays. Snapshot fields without history (24h volumes, spot
+# availability, borrow) are missing, so rules that test them never fire in a replay.
+BACKTEST_METRICS = ("mark", "basis", "funding", "oi", "dominance", "imbalance")
+
+# (symbol, ts int64[n] on a regular grid, {metric: float64[n]}; NaN where no data)
+SymbolSeries = Tuple[str, np.ndarray, Dict[str, np.ndarray]]
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Sum of the last `window` values up to and including each index (shorter at the start)."""
+    cum = np.cumsum(x, dtype=np.int64 if x.dtype == bool else np.float64)
+    out = cum.copy()
+    out[window:] -= cum[:-window]
+    return out
+
+
+def forward_max(x: np.ndarray, window: int) -> np.ndarray:
+    """Max of the next `window` values after each index, -inf where none follow.
+
+    van Herk / Gil-Werman: prefix and suffix maxima over blocks of `window`, so the cost
+    does not depend on the window length.
+    """
+    y = x[1:]
+    m = y.size
+    padded = np.full(-(-(m + window - 1) // window) * window, -np.inf)
+    padded[:m] = y
+    blocks = padded.reshape(-1, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out = np.full(x.size, -np.inf)
+    np.maximum(suffix[:m], prefix[window - 1 : window - 1 + m], out=out[:m])
+    return out
+
+
+def lagged(x: np.ndarray, lag: int) -> np.ndarray:
+    """`x` shifted `lag` samples later; the first `lag` samples repeat the first value."""
+    out = np.empty_like(x)
+    out[lag:] = x[:-lag] if lag else x
+    out[:lag] = x[0] if x.size else 0
+    return out
+
+
+def derive_columns(raw: Dict[str, np.ndarray], step_ms: int) -> Dict[str, np.ndarray]:
+    """Rule fields and SRS over time, from stored metrics on a `step_ms` grid.
+
+    Mirrors the collector: TWAP15 is the trailing 15-minute mean of basis, price_up
+    compares mark with one hour earlier, funding_nonnegative needs no negative funding in
+    the trailing three hours and ΔOI 1h is the OI change over the last hour.
+    """
+    n = len(next(iter(raw.values())))
+    nan = np.full(n, np.nan)
+    mark, basis, funding, oi, dominance, imbalance = (raw.get(m, nan) for m in BACKTEST_METRICS)
+    twap_n = max(1, TWAP_WINDOW_MS // step_ms)
+    hour_n = max(1, PRICE_WINDOW_MS // step_ms)
+    funding_n = max(1, FUNDING_WINDOW_MS // step_ms)
+
+    seen = np.isfinite(basis)
+    count = rolling_sum(seen, twap_n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        twap = rolling_sum(np.where(seen, basis, 0.0), twap_n) / count
+    delta_oi = nan.copy()
+    delta_oi[hour_n:] = oi[hour_n:] - oi[:-hour_n]
+    price_up = mark > lagged(mark, min(hour_n, n))
+    funding_nonnegative = (rolling_sum(funding < 0, funding_n) == 0) & np.isfinite(funding)
+
+    delta_oi_scaled = np.maximum(delta_oi, 0.0) / np.maximum(oi, 1.0)
+    srs = heuristic_srs((np.abs(funding), np.abs(twap), dominance, delta_oi_scaled, imbalance))
+    return {
+        "mark": mark,
+        "funding_1h_pct": funding,
+        "basis_pct": basis,
+        "basis_twap15_pct": twap,
+        "perp_dominance_pct": dominance,
+        "delta_oi_1h_usdt": delta_oi,
+        "oi_usdt": oi,
+        "orderbook_imbalance": imbalance,
+        "srs": srs.astype(np.float64),
+        "price_up": price_up.astype(np.float64),
+        "funding_nonnegative": funding_nonnegative.astype(np.float64),
+    }
+
+
+class SignalStats:
+    """Confusion counts of one boolean signal against the adverse-move label."""
+
+    __slots__ = ("signals", "hits", "events")
+
+    def __init__(self) -> None:
+        self.signals = 0
+        self.hits = 0
+        self.events = 0
+
+    def add(self, signal: np.ndarray, event: np.ndarray, scored: np.ndarray) -> None:
+        """Count `signal` over `scored` samples; `event` is already False outside them."""
+        self.signals += int(np.count_nonzero(signal & scored))
+        self.hits += int(np.count_nonzero(signal & event))
+        self.events += int(np.count_nonzero(event))
+
+    def as_dict(self, base_rate: float) -> Dict[str, Any]:
+        precision = self.hits / self.signals if self.signals else None
+        return {
+            "signals": self.signals,
+            "hits": self.hits,
+            "precision": precision,
+            "recall": self.hits / self.events if self.events else None,
+            "lift": precision / base_rate if precision is not None and base_rate > 0 else None,
+        }
+
+
+class Backtest:
+    """SRS and traffic-light rule states replayed over stored history.
+
+    Every signal is scored as a *no-short* call: a sample counts as an adverse move (a
+    drawdown for a fresh short) when mark rises by `rise_pct` or more within `horizon_ms`.
+    Each symbol is replayed in one vectorized pass over its whole history, so memory
+    holds one symbol at a time and a month of 10s samples costs milliseconds.
+    Samples inside the first `warmup_ms` (lookbacks still filling) or without a full
+    horizon after them are not scored.
+    """
+
+    def __init__(
+        self,
+        rules: CompiledRules,
+        horizon_ms: int = 4 * 3600 * 1000,
+        rise_pct: float = 3.0,
+        srs_threshold: int = 70,
+        warmup_ms: int = FUNDING_WINDOW_MS,
+    ) -> None:
+        self.rules = rules
+        self.horizon_ms = horizon_ms
+        self.rise_pct = rise_pct
+        self.srs_threshold = srs_threshold
+        self.warmup_ms = warmup_ms
+        self.samples = 0
+        self.events = 0
+        self.signals: Dict[str, SignalStats] = {
+            "red": SignalStats(),
+            "not_green": SignalStats(),
+            f"srs>={srs_threshold}": SignalStats(),
+        }
+        self.rule_stats: Dict[str, SignalStats] = {r.id: SignalStats() for r in rules.rules}
+        self.per_symbol: Dict[str, Dict[str, Any]] = {}
+        self.unavailable_fields: List[str] = []
+
+    def replay(self, symbol: str, ts: np.ndarray, raw: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Replay one symbol and fold it into the statistics; returns its per-sample columns."""
+        n = ts.size
+        step_ms = int(ts[1] - ts[0]) if n > 1 else 1
+        cols = derive_columns(raw, step_ms)
+        state, masks = self.rules.evaluate_series(symbol, cols)
+        self.unavailable_fields = sorted({f for r in self.rules.rules for f, _, _ in r.conds} - set(cols))
+
+        horizon_n = max(1, self.horizon_ms // step_ms)
+        mark = cols["mark"]
+        ahead = forward_max(np.where(np.isfinite(mark), mark, -np.inf), horizon_n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            max_rise_pct = (ahead / mark - 1.0) * 100.0
+        valid = np.isfinite(max_rise_pct)
+        valid[: self.warmup_ms // step_ms] = False
+        valid[max(n - horizon_n, 0) :] = False
+        adverse = valid & (max_rise_pct >= self.rise_pct)
+
+        red = state == 0
+        self.signals["red"].add(red, adverse, valid)
+        self.signals["not_green"].add(state != 2, adverse, valid)
+        self.signals[f"srs>={self.srs_threshold}"].add(cols["srs"] >= self.srs_threshold, adverse, valid)
+        for rule, mask in zip(self.rules.rules, masks):
+            self.rule_stats[rule.id].add(mask, adverse, valid)
+        scored = int(np.count_nonzero(valid))
+        events = int(np.count_nonzero(adverse))
+        self.samples += scored
+        self.events += events
+        sym_red = SignalStats()
+        sym_red.add(red, adverse, valid)
+        self.per_symbol[symbol] = {"samples": scored, **sym_red.as_dict(events / scored if scored else 0.0)}
+
+        cols.update(state=state, masks=masks, valid=valid, adverse=adverse, max_rise_pct=max_rise_pct)
+        return cols
+
+    def report(self) -> Dict[str, Any]:
+        base_rate = self.events / self.samples if self.samples else 0.0
+        return {
+            "horizon_ms": self.horizon_ms,
+            "rise_pct": self.rise_pct,
+            "symbols": len(self.per_symbol),
+            "samples": self.samples,
+            "adverse_samples": self.events,
+            "base_rate": base_rate,
+            "unavailable_fields": self.unavailable_fields,
+            "signals": {k: v.as_dict(base_rate) for k, v in self.signals.items()},
+            "rules": {k: v.as_dict(base_rate) for k, v in self.rule_stats.items()},
+            "per_symbol": self.per_symbol,
+        }
+
+
+def signal_rows(
+    rules: CompiledRules, symbol: str, ts: np.ndarray, cols: Dict[str, np.ndarray]
+) -> Iterator[Dict[str, Any]]:
+    """CSV rows for every sample where the state turns RED (the onset of a no-short call)."""
+    red = cols["state"] == 0
+    onsets = np.flatnonzero(red & ~np.r_[False, red[:-1]])
+    red_rules = [i for i, r in enumerate(rules.rules) if r.level == "red"]
+    for i in onsets.tolist():
+        yield {
+            "symbol": symbol,
+            "ts": int(ts[i]),
+            "state": SERIES_STATES[cols["state"][i]],
+            "srs": int(cols["srs"][i]),
+            "rules": ";".join(rules.rules[r].id for r in red_rules if cols["masks"][r, i]),
+            "mark": float(cols["mark"][i]),
+            "funding_1h_pct": float(cols["funding_1h_pct"][i]),
+            "basis_twap15_pct": float(cols["basis_twap15_pct"][i]),
+            "perp_dominance_pct": float(cols["perp_dominance_pct"][i]),
+            "delta_oi_1h_usdt": float(cols["delta_oi_1h_usdt"][i]),
+            "max_rise_pct": float(cols["max_rise_pct"][i]) if cols["valid"][i] else "",
+            "adverse": int(cols["adverse"][i]) if cols["valid"][i] else "",
+        }
+
+
+def align_series(
+    series: Dict[str, Tuple[np.ndarray, np.ndarray]], start_ms: int, end_ms: int, step_ms: int
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Stored rows per metric as-of joined onto one `step_ms` grid (last value per bucket)."""
+    grid = np.arange(start_ms - start_ms % step_ms, end_ms + 1, step_ms, dtype=np.int64)
+    cols = {}
+    for metric, (ts, rows) in series.items():
+        bucket_ts, bucket_rows = aggregate_rows(ts, rows, step_ms)
+        cols[metric] = as_of(grid, bucket_ts, project(bucket_rows, "last"), 2 * step_ms)
+    return grid, cols
+
+
+async def iter_redis(
+    symbols: Sequence[str], start_ms: int, end_ms: int, step_ms: int, concurrency: int = 8
+) -> AsyncIterator[SymbolSeries]:
+    """Stored history per symbol, `concurrency` symbols per batch of pipelined reads."""
+    for i in range(0, len(symbols), concurrency):
+        batch = [s.upper() for s in symbols[i : i + concurrency]]
+        results = await asyncio.gather(
+            *(get_timeseries_rows_many(sym, list(BACKTEST_METRICS), start_ms, end_ms) for sym in batch)
+        )
+        for sym, series in zip(batch, results):
+            grid, cols = align_series(series, start_ms, end_ms, step_ms)
+            yield sym, grid, cols
+
+
+def iter_npz(path: str) -> Iterator[SymbolSeries]:
+    """Symbols from a dataset written by `save_npz`, loaded one at a time."""
+    with np.load(path) as data:
+        for sym in data["symbols"].tolist():
+            metrics = {m: data[f"{sym}.{m}"] for m in BACKTEST_METRICS if f"{sym}.{m}" in data.files}
+            yield sym, data[f"{sym}.ts"], metrics
+
+
+def save_npz(path: str, series: Iterable[SymbolSeries]) -> None:
+    """Write a dataset for offline runs: `symbols`, then `<symbol>.ts` and `<symbol>.<metric>`."""
+    arrays: Dict[str, np.ndarray] = {}
+    symbols: List[str] = []
+    for sym, ts, cols in series:
+        symbols.append(sym)
+        arrays[f"{sym}.ts"] = ts
+        arrays.update((f"{sym}.{m}", v) for m, v in cols.items())
+    np.savez_compressed(path, symbols=np.array(symbols), **arrays)
+
+
+def _format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['symbols']} symbols, {report['samples']} samples, "
+        f"{report['adverse_samples']} adverse (base rate {report['base_rate']:.2%}; "
+        f"rise >= {report['rise_pct']:g}% within {report['horizon_ms'] // 60000}m)",
+        "no history for (rules on them never fire): " + (", ".join(report["unavailable_fields"]) or "-"),
+        "",
+        f"{'signal':<28}{'signals':>10}{'precision':>11}{'recall':>9}{'lift':>7}",
+    ]
+
+    def pct(v: Optional[float]) -> str:
+        return f"{v:.1%}" if v is not None else "-"
+
+    for section in ("signals", "rules"):
+        for name, s in report[section].items():
+            lift = f"{s['lift']:.2f}" if s["lift"] is not None else "-"
+            lines.append(f"{name:<28}{s['signals']:>10}{pct(s['precision']):>11}{pct(s['recall']):>9}{lift:>7}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.analytics.backtest",
+        description="Replay SRS and the traffic-light rules over stored history and score them "
+        "as no-short calls against subsequent price rises.",
+    )
+    parser.add_argument("--npz", help="offline dataset written by --save-npz (no Redis needed)")
+    parser.add_argument("--symbols", help="comma-separated symbols (default: the watchlist)")
+    parser.add_argument("--window", default="30d", help="history to replay from Redis (default 30d)")
+    parser.add_argument("--step", default="1m", help="grid step for Redis data (default 1m)")
+    parser.add_argument("--horizon", default="4h", help="look-ahead for the adverse move (default 4h)")
+    parser.add_argument("--rise-pct", type=float, default=3.0, help="adverse mark rise in %% (default 3)")
+    parser.add_argument("--srs-threshold", type=int, default=70, help="SRS scored as a no-short call (default 70)")
+    parser.add_argument("--rules", help="rule set JSON file (default: the active one, or the built-in set offline)")
+    parser.add_argument("--save-npz", help="also write the loaded dataset here")
+    parser.add_argument("--signals-csv", help="write every RED onset with its metrics and outcome here")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    horizon_ms = parse_duration_ms(args.horizon)
+    window_ms = parse_duration_ms(args.window)
+    step_ms = parse_duration_ms(args.step)
+    if horizon_ms is None or window_ms is None or step_ms is None:
+        parser.error("durations look like 90s, 15m, 4h or 30d")
+    wanted = [s.strip().upper() for s in (args.symbols or "").split(",") if s.strip()]
+    return asyncio.run(_run(args, wanted, horizon_ms, window_ms, step_ms))
+
+
+async def _run(args: argparse.Namespace, wanted: List[str], horizon_ms: int, window_ms: int, step_ms: int) -> int:
+    if args.rules:
+        with open(args.rules, "rb") as f:
+            rules = compile_ruleset(orjson.loads(f.read()))
+    elif args.npz:
+        rules = compile_ruleset(copy.deepcopy(DEFAULT_RULESET))
+    else:
+        raw = await get_rules_raw()
+        rules = compile_ruleset(orjson.loads(raw) if raw else copy.deepcopy(DEFAULT_RULESET))
+
+    async def source() -> AsyncIterator[SymbolSeries]:
+        if args.npz:
+            for item in iter_npz(args.npz):
+                if not wanted or item[0] in wanted:
+                    yield item
+            return
+        now = int(time.time() * 1000)
+        async for item in iter_redis(wanted or await get_watchlist(), now - window_ms, now, step_ms):
+            yield item
+
+    backtest = Backtest(rules, horizon_ms=horizon_ms, rise_pct=args.rise_pct, srs_threshold=args.srs_threshold)
+    kept: List[SymbolSeries] = []
+    csv_file = open(args.signals_csv, "w", newline="") if args.signals_csv else None
+    writer: Optional[csv.DictWriter] = None
+    started = time.perf_counter()
+    try:
+        async for sym, ts, raw in source():
+            if ts.size < 2:
+                logger.warning("%s: not enough history, skipped", sym)
+                continue
+            if args.save_npz:
+                kept.append((sym, ts, raw))
+            cols = backtest.replay(sym, ts, raw)
+            if csv_file is not None:
+                for row in signal_rows(rules, sym, ts, cols):
+                    if writer is None:
+                        writer = csv.DictWriter(csv_file, fieldnames=list(row))
+                        writer.writeheader()
+                    writer.writerow(row)
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+    logger.info("replayed %d symbols in %.2fs", len(backtest.per_symbol), time.perf_counter() - started)
+    if args.save_npz:
+        save_npz(args.save_npz, kept)
+
+    report = backtest.report()
+    if args.json:
+        sys.stdout.write(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode() + "\n")
+    else:
+        sys.stdout.write(_format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    sys.exit(main())
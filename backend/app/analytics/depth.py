@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from itertools import chain
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import calc_orderbook_imbalance
+
+DEFAULT_BANDS_PCT = (0.25, 0.5, 1.0, 2.0, 5.0)
+DEFAULT_SLIPPAGE_SIZES_USDT = (10_000.0, 100_000.0, 1_000_000.0)
+# Band that feeds the headline `orderbook_imbalance` (PRD: ±2%)
+IMBALANCE_BAND_PCT = 2.0
+
+DepthArrays = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+_EMPTY = np.empty(0, dtype=np.float64)
+
+
+def _side(levels: Sequence[Sequence[Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    if not levels:
+        return _EMPTY, _EMPTY
+    # Levels are [price, qty] string pairs; fromiter parses them without building a 2-D object array
+    flat = np.fromiter(chain.from_iterable(levels), dtype=np.float64, count=2 * len(levels))
+    return flat[0::2], flat[1::2]
+
+
+def depth_arrays(depth: Dict[str, Any]) -> DepthArrays:
+    """(bid_px desc, bid_qty, ask_px asc, ask_qty) from a REST/WS depth payload, parsed once."""
+    bid_px, bid_qty = _side(depth.get("bids", []))
+    ask_px, ask_qty = _side(depth.get("asks", []))
+    return bid_px, bid_qty, ask_px, ask_qty
+
+
+def depth_metrics(
+    arrays: DepthArrays,
+    fallback_mid: float,
+    bands_pct: Sequence[float] = DEFAULT_BANDS_PCT,
+    slippage_sizes_usdt: Sequence[float] = DEFAULT_SLIPPAGE_SIZES_USDT,
+) -> Dict[str, Any]:
+    """Imbalance and notional depth for every band plus slippage estimates, in one pass.
+
+    Both sides are laid out on a single ascending "distance from mid" axis (bids, then
+    asks shifted past every bid), cumulatively summed once, and every band edge and
+    order size is resolved with one binary search over it.
+    Returns {"orderbook_imbalance", "depth_bands": [...], "slippage": [...]}.
+    """
+    bid_px, bid_qty, ask_px, ask_qty = arrays
+    best_bid = float(bid_px[0]) if bid_px.size else fallback_mid
+    best_ask = float(ask_px[0]) if ask_px.size else fallback_mid
+    mid = (best_bid + best_ask) / 2.0 if best_bid and best_ask else fallback_mid
+
+    bands = [float(b) for b in bands_pct]
+    if IMBALANCE_BAND_PCT not in bands:
+        bands.append(IMBALANCE_BAND_PCT)
+    nbands = len(bands)
+    nb = bid_px.size
+
+    px = np.concatenate((bid_px, ask_px))
+    qty = np.concatenate((bid_qty, ask_qty))
+    # Bid distances are at most `mid`, so this offset keeps every ask after every bid
+    offset = mid + 1.0
+    dist = np.abs(px - mid)
+    dist[nb:] += offset
+    cum = np.zeros((2, px.size + 1), dtype=np.float64)
+    np.cumsum(qty, out=cum[0, 1:])
+    np.cumsum(px * qty, out=cum[1, 1:])
+
+    edges = np.asarray(bands, dtype=np.float64) * (mid / 100.0)
+    band_sums = cum[:, np.searchsorted(dist, np.concatenate((edges, edges + offset)), side="right")]
+    band_sums[:, nbands:] -= cum[:, nb : nb + 1]
+    bid_q, ask_q = band_sums[0, :nbands].tolist(), band_sums[0, nbands:].tolist()
+    bid_usd, ask_usd = band_sums[1, :nbands].tolist(), band_sums[1, nbands:].tolist()
+    imbalances = [calc_orderbook_imbalance(b, a) for b, a in zip(bid_q, ask_q)]
+
+    depth_bands = [
+        {
+            "band_pct": bands[i],
+            "bid_qty": bid_q[i],
+            "ask_qty": ask_q[i],
+            "bid_notional_usdt": bid_usd[i],
+            "ask_notional_usdt": ask_usd[i],
+            "imbalance": imbalances[i],
+        }
+        for i in range(len(bands_pct))
+    ]
+
+    # Sells walk the bids, buys walk the asks (whose running notional starts after all bids)
+    sizes = [float(x) for x in slippage_sizes_usdt]
+    n = px.size
+    bid_total_qty, bid_total_usd = float(cum[0, nb]), float(cum[1, nb])
+    fills = np.searchsorted(cum[1, 1:], sizes + [x + bid_total_usd for x in sizes], side="left")
+    at = np.minimum(fills, max(n - 1, 0))
+    qty_at, usd_at = cum[:, at].tolist()
+    px_at = px[at].tolist() if n else [0.0] * len(at)
+    fills = fills.tolist()
+
+    def walk(k: int, size: float, end: int, base_qty: float, base_usd: float) -> Optional[float]:
+        if fills[k] >= end or mid <= 0:
+            return None  # displayed depth cannot fill the order
+        filled = qty_at[k] - base_qty + (size + base_usd - usd_at[k]) / px_at[k]
+        return (size / filled / mid - 1.0) * 1e4
+
+    m = len(sizes)
+    slippage = []
+    for i, size in enumerate(sizes):
+        sell = walk(i, size, nb, 0.0, 0.0)
+        buy = walk(m + i, size, n, bid_total_qty, bid_total_usd)
+        slippage.append(
+            {"notional_usdt": size, "buy_bps": buy, "sell_bps": -sell if sell is not None else None}
+        )
+
+    return {
+        "orderbook_imbalance": imbalances[bands.index(IMBALANCE_BAND_PCT)],
+        "depth_bands": depth_bands,
+        "slippage": slippage,
+    }
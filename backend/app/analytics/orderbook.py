@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metrics import calc_orderbook_imbalance
+
+DEFAULT_BAND_PCT = 0.02
+# Band sums are kept against an anchor mid; once mid drifts further than this they are rebuilt
+DEFAULT_REANCHOR_PCT = 0.001
+
+
+class OrderBook:
+    """Local L2 book maintained from a REST snapshot plus futures diff-depth events.
+
+    Follows Binance USD-M sequencing: events older than the snapshot are dropped, the
+    first applied event must straddle the snapshot's lastUpdateId (U <= id <= u), and
+    every later event's `pu` must equal the previous event's `u`. `apply_event`
+    returns False on a gap; the caller then reloads a snapshot.
+
+    Bid/ask quantity inside ±band_pct of an anchor mid is updated incrementally as
+    levels change, so `imbalance()` is O(1).
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        band_pct: float = DEFAULT_BAND_PCT,
+        reanchor_pct: float = DEFAULT_REANCHOR_PCT,
+    ) -> None:
+        self.symbol = symbol
+        self.band_pct = band_pct
+        self.reanchor_pct = reanchor_pct
+        self.last_update_id: Optional[int] = None
+        self.event_time: int = 0
+        self._bridged = False
+        self._bid_px: List[float] = []  # ascending; best bid is last
+        self._ask_px: List[float] = []  # ascending; best ask is first
+        self._bids: Dict[float, float] = {}
+        self._asks: Dict[float, float] = {}
+        self._anchor = 0.0
+        self._band_lo = 0.0
+        self._band_hi = 0.0
+        self.band_bid_qty = 0.0
+        self.band_ask_qty = 0.0
+
+    @property
+    def synced(self) -> bool:
+        return self.last_update_id is not None and self._bridged
+
+    def reset(self) -> None:
+        self.last_update_id = None
+        self._bridged = False
+
+    def load_snapshot(self, last_update_id: int, bids: Iterable[Sequence[Any]], asks: Iterable[Sequence[Any]]) -> None:
+        self._bids = {float(p): float(q) for p, q, *_ in bids if float(q) > 0}
+        self._asks = {float(p): float(q) for p, q, *_ in asks if float(q) > 0}
+        self._bid_px = sorted(self._bids)
+        self._ask_px = sorted(self._asks)
+        self.last_update_id = int(last_update_id)
+        self._bridged = False
+        self._reanchor()
+
+    def apply_event(self, event: Dict[str, Any]) -> bool:
+        """Apply one depthUpdate payload; False means a sequence gap (reload needed)."""
+        if self.last_update_id is None:
+            return False
+        first_id, final_id = int(event["U"]), int(event["u"])
+        if final_id < self.last_update_id:
+            return True  # already contained in the snapshot
+        if not self._bridged:
+            if not (first_id <= self.last_update_id <= final_id):
+                return False
+            self._bridged = True
+        elif int(event.get("pu", -1)) != self.last_update_id:
+            return False
+        for p, q, *_ in event.get("b", []):
+            self._set_level(self._bid_px, self._bids, float(p), float(q), is_bid=True)
+        for p, q, *_ in event.get("a", []):
+            self._set_level(self._ask_px, self._asks, float(p), float(q), is_bid=False)
+        self.last_update_id = final_id
+        self.event_time = int(event.get("E", self.event_time))
+        mid = self.mid()
+        if mid and abs(mid - self._anchor) > self._anchor * self.reanchor_pct:
+            self._reanchor()
+        return True
+
+    def _set_level(self, prices: List[float], book: Dict[float, float], price: float, qty: float, is_bid: bool) -> None:
+        old = book.get(price, 0.0)
+        if qty <= 0:
+            if price in book:
+                del book[price]
+                del prices[bisect_left(prices, price)]
+        else:
+            if price not in book:
+                insort(prices, price)
+            book[price] = qty
+        if self._band_lo <= price <= self._band_hi:
+            if is_bid:
+                self.band_bid_qty += qty - old
+            else:
+                self.band_ask_qty += qty - old
+
+    def _reanchor(self) -> None:
+        mid = self.mid()
+        self._anchor = mid or 0.0
+        self._band_lo = self._anchor * (1.0 - self.band_pct)
+        self._band_hi = self._anchor * (1.0 + self.band_pct)
+        self.band_bid_qty = self._range_qty(self._bid_px, self._bids)
+        self.band_ask_qty = self._range_qty(self._ask_px, self._asks)
+
+    def _range_qty(self, prices: List[float], book: Dict[float, float]) -> float:
+        i = bisect_left(prices, self._band_lo)
+        j = bisect_right(prices, self._band_hi)
+        return sum(book[p] for p in prices[i:j])
+
+    def best_bid(self) -> Optional[float]:
+        return self._bid_px[-1] if self._bid_px else None
+
+    def best_ask(self) -> Optional[float]:
+        return self._ask_px[0] if self._ask_px else None
+
+    def mid(self) -> Optional[float]:
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return bid or ask
+        return (bid + ask) / 2.0
+
+    def imbalance(self) -> float:
+        """Σ bid qty / Σ ask qty within ±band_pct of mid."""
+        return calc_orderbook_imbalance(self.band_bid_qty, self.band_ask_qty)
+
+    def to_arrays(self, max_levels: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(bid_px desc, bid_qty, ask_px asc, ask_qty) as float64 arrays."""
+        # Slice before reversing so a capped copy never touches the whole side
+        bid_px = self._bid_px[: -max_levels - 1 : -1] if max_levels else self._bid_px[::-1]
+        ask_px = self._ask_px[:max_levels] if max_levels else self._ask_px
+        return (
+            np.fromiter(bid_px, dtype=np.float64, count=len(bid_px)),
+            np.fromiter((self._bids[p] for p in bid_px), dtype=np.float64, count=len(bid_px)),
+            np.fromiter(ask_px, dtype=np.float64, count=len(ask_px)),
+            np.fromiter((self._asks[p] for p in ask_px), dtype=np.float64, count=len(ask_px)),
+        )
@@ -0,0 +1,543 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import operator
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from ..services.redis_store import get_rules_raw, rules_events
+
+logger = logging.getLogger("srr.rule_engine")
+
+LEVELS = ("red", "yellow", "green")
+OPS: Dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+# Fields a condition may test. Booleans are 0/1 and missing values 0; the lookbacks
+# (price_up, funding_nonnegative) come from the collector's windows.
+_PLAIN_FIELDS = (
+    "funding_1h_pct",
+    "basis_pct",
+    "basis_twap15_pct",
+    "perp_dominance_pct",
+    "delta_oi_1h_usdt",
+    "oi_usdt",
+    "fut_vol24_usdt",
+    "spot_vol24_usdt",
+    "orderbook_imbalance",
+    "srs",
+    "has_spot",
+)
+_BORROW_FIELDS = ("shortable", "borrow_venues")
+SNAPSHOT_FIELDS = _PLAIN_FIELDS + _BORROW_FIELDS + ("oi_to_vol24",)
+
+
+def _f(key: str) -> Callable[[Dict[str, Any]], float]:
+    return lambda snap: float(snap.get(key) or 0.0)
+
+
+# Per-snapshot versions of the same fields, for the closure path
+_SCALAR_FIELDS: Dict[str, Callable[[Dict[str, Any]], float]] = {f: _f(f) for f in _PLAIN_FIELDS}
+_SCALAR_FIELDS.update(
+    {
+        "oi_to_vol24": lambda s: float(s.get("oi_usdt") or 0.0) / max(float(s.get("fut_vol24_usdt") or 0.0), 1e-9),
+        "shortable": lambda s: float(bool((s.get("borrow") or {}).get("shortable"))),
+        "borrow_venues": lambda s: float(len((s.get("borrow") or {}).get("venues") or ())),
+    }
+)
+
+
+def _column(snaps: List[Dict[str, Any]], key: str) -> np.ndarray:
+    # One list comprehension per field; None becomes NaN, then 0 like `or 0.0`
+    return np.nan_to_num(np.array([s.get(key) for s in snaps], dtype=np.float64), nan=0.0)
+
+
+def snapshot_columns(snaps: List[Dict[str, Any]], fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Column arrays for the requested SNAPSHOT_FIELDS across a batch of snapshots."""
+    wanted = set(fields)
+    if "oi_to_vol24" in wanted:
+        wanted |= {"oi_usdt", "fut_vol24_usdt"}
+    cols = {f: _column(snaps, f) for f in _PLAIN_FIELDS if f in wanted}
+    if "oi_to_vol24" in wanted:
+        cols["oi_to_vol24"] = cols["oi_usdt"] / np.maximum(cols["fut_vol24_usdt"], 1e-9)
+    if wanted & set(_BORROW_FIELDS):
+        borrows = [s.get("borrow") or {} for s in snaps]
+        cols["shortable"] = np.array([bool(b.get("shortable")) for b in borrows], dtype=np.float64)
+        cols["borrow_venues"] = np.array([len(b.get("venues") or ()) for b in borrows], dtype=np.float64)
+    return cols
+
+
+LOOKBACK_FIELDS = ("price_up", "funding_nonnegative")
+
+# The original hard-coded rules, as data
+DEFAULT_RULESET: Dict[str, Any] = {
+    "params": {
+        "red_dominance_pct": 70.0,
+        "oi_perpvol_min_ratio": 0.25,
+        "basis_twap15_green_min": 0.10,
+        "funding_very_negative": -0.15,  # per hour
+        "green_dominance_max": 60.0,
+    },
+    "profiles": {},
+    "symbols": {},
+    "rules": [
+        {
+            "id": "perp_discount",
+            "level": "red",
+            "all": [["funding_1h_pct", "<", 0], ["basis_twap15_pct", "<=", 0]],
+            "reason": "funding_1h < 0 and basis_twap15 ≤ 0 (perp discount)",
+        },
+        {
+            "id": "perp_dominance",
+            "level": "red",
+            "all": [
+                ["perp_dominance_pct", ">=", "$red_dominance_pct"],
+                ["fut_vol24_usdt", ">", 0],
+                ["oi_to_vol24", ">=", "$oi_perpvol_min_ratio"],
+            ],
+            "reason": "perp_dominance ≥ {red_dominance_pct:g}% and oi/usdt_vol24 ≥ {oi_perpvol_min_ratio:g}",
+        },
+        {
+            "id": "oi_up_price_up",
+            "level": "red",
+            "all": [["delta_oi_1h_usdt", ">", 0], ["price_up", "==", 1]],
+            "reason": "ΔOI 1h > 0 while price ↑ last hour",
+        },
+        {
+            "id": "no_spot",
+            "level": "red",
+            "all": [["has_spot", "==", 0]],
+            "reason": "no spot market available for borrow/hedge",
+        },
+        {
+            "id": "not_borrowable",
+            "level": "red",
+            "all": [["borrow_venues", ">", 0], ["shortable", "==", 0]],
+            "reason": "spot short not borrowable or APR too high",
+        },
+        {
+            "id": "funding_very_negative",
+            "level": "yellow",
+            "all": [["funding_1h_pct", "<=", "$funding_very_negative"], ["shortable", "==", 1]],
+            "reason": "funding very negative but spot short borrowable",
+        },
+        {
+            "id": "funding_nonnegative",
+            "level": "green",
+            "all": [["funding_nonnegative", "==", 1]],
+            "reason": "funding_1h ≥ 0 for ≥3h",
+        },
+        {
+            "id": "basis_positive",
+            "level": "green",
+            "all": [["basis_twap15_pct", ">=", "$basis_twap15_green_min"]],
+            "reason": "basis_twap15 ≥ {basis_twap15_green_min:+.2f}%",
+        },
+        {
+            "id": "oi_not_rising",
+            "level": "green",
+            "all": [["delta_oi_1h_usdt", "<=", 0]],
+            "reason": "ΔOI 1h ≤ 0",
+        },
+        {
+            "id": "dominance_low",
+            "level": "green",
+            "all": [["perp_dominance_pct", "<", "$green_dominance_max"]],
+            "reason": "perp_dominance < {green_dominance_max:g}%",
+        },
+    ],
+}
+
+RuleResult = Tuple[str, List[str]]
+# Traffic light per state code of `CompiledRules.evaluate_series` (3 is the default YELLOW)
+SERIES_STATES = ("RED", "YELLOW", "GREEN", "YELLOW")
+SymbolEvaluator = Callable[[Dict[str, Any], bool, bool], RuleResult]
+_RESOLVED_CACHE_MAX = 4096
+# Below this batch size per-symbol closures beat NumPy's per-call overhead
+VECTORIZE_MIN_SYMBOLS = 16
+
+
+class RuleSetError(ValueError):
+    """A rule set document that does not validate or compile."""
+
+
+def _mapping(name: str, value: Any) -> Dict[str, Any]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise RuleSetError(f"{name} must be an object")
+    return value
+
+
+def _number(scope: str, key: str, value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RuleSetError(f"{scope}: {key} must be a number, got {value!r}")
+    return float(value)
+
+
+def _check_green_min(scope: str, value: Any) -> None:
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+        raise RuleSetError(f"{scope}: green_min must be a non-negative integer, got {value!r}")
+
+
+class _Rule:
+    __slots__ = ("id", "level", "conds", "reason")
+
+    def __init__(self, rule_id: str, level: str, conds: List[Tuple[str, Callable, Any]], reason: str) -> None:
+        self.id = rule_id
+        self.level = level
+        self.conds = conds  # (field, op, float constant or "$param")
+        self.reason = reason
+
+
+class _Resolved:
+    """Per-symbol parameters of one symbol tuple, as arrays aligned with it."""
+
+    __slots__ = ("params", "enabled", "green_min", "reasons")
+
+    def __init__(self, params, enabled, green_min, reasons) -> None:
+        self.params: Dict[str, np.ndarray] = params
+        self.enabled: np.ndarray = enabled  # bool[rules, n]
+        self.green_min: np.ndarray = green_min  # int[n]
+        self.reasons: List[List[str]] = reasons  # [symbol][rule]
+
+
+class CompiledRules:
+    """A validated rule set compiled into fast evaluators.
+
+    Batches of VECTORIZE_MIN_SYMBOLS or more run as vectorized masks: each condition is
+    one comparison between a field column and a constant or that parameter's
+    per-symbol array, so a tick costs a few NumPy operations per rule however many
+    symbols it covers. Parameter arrays, enabled flags and formatted reasons are
+    resolved once per symbol tuple and cached. Smaller batches (the streaming
+    collector evaluates one symbol per event) use a closure per symbol with its
+    thresholds and reasons baked in.
+
+    Semantics match the original rules: RED lists every matching red rule; otherwise
+    the first matching yellow rule wins; otherwise GREEN needs `green_min` matching
+    green rules (default: all of them); anything else is YELLOW "default state".
+    """
+
+    def __init__(self, doc: Dict[str, Any]) -> None:
+        try:
+            self._compile(doc)
+        except RuleSetError:
+            raise
+        except (ValueError, TypeError, AttributeError) as e:
+            # Malformed shapes that slipped past the explicit checks are still bad input
+            raise RuleSetError(f"invalid rule set: {e}") from e
+
+    def _compile(self, doc: Dict[str, Any]) -> None:
+        self.doc = doc
+        self.params: Dict[str, float] = {
+            k: _number("params", k, v) for k, v in _mapping("params", doc.get("params")).items()
+        }
+        _check_green_min("rule set", doc.get("green_min"))
+        self.profiles: Dict[str, Dict[str, Any]] = doc.get("profiles") or {}
+        self.symbols: Dict[str, Dict[str, Any]] = {k.upper(): v for k, v in (doc.get("symbols") or {}).items()}
+        self.rules: List[_Rule] = [self._compile_rule(i, r) for i, r in enumerate(doc.get("rules") or [])]
+        ids = [r.id for r in self.rules]
+        if len(set(ids)) != len(ids):
+            raise RuleSetError("rule ids must be unique")
+        self.fields = sorted({f for r in self.rules for f, _, _ in r.conds if f in SNAPSHOT_FIELDS})
+        self._red, self._yellow, self._green = (
+            [i for i, r in enumerate(self.rules) if r.level == level] for level in LEVELS
+        )
+        for name, scope in [(f"profile {k}", v) for k, v in self.profiles.items()] + [
+            (f"symbol {k}", v) for k, v in self.symbols.items()
+        ]:
+            self._check_scope(name, scope)
+        self._resolved: Dict[Tuple[str, ...], _Resolved] = {}
+        self._closures: Dict[str, SymbolEvaluator] = {}
+        # Fail now, not on the first tick, if a reason template does not format
+        self._resolve(("",))
+
+    def _compile_rule(self, index: int, rule: Dict[str, Any]) -> _Rule:
+        rule_id = str(rule.get("id") or f"rule{index}")
+        level = rule.get("level")
+        if level not in LEVELS:
+            raise RuleSetError(f"{rule_id}: level must be one of {LEVELS}")
+        conds = []
+        for cond in rule.get("all") or []:
+            if not isinstance(cond, (list, tuple)) or len(cond) != 3:
+                raise RuleSetError(f"{rule_id}: conditions are [field, op, value]")
+            field, op, value = cond
+            if field not in SNAPSHOT_FIELDS and field not in LOOKBACK_FIELDS:
+                raise RuleSetError(f"{rule_id}: unknown field {field!r}")
+            if op not in OPS:
+                raise RuleSetError(f"{rule_id}: unknown op {op!r}")
+            if isinstance(value, str):
+                if not value.startswith("$") or value[1:] not in self.params:
+                    raise RuleSetError(f"{rule_id}: {value!r} is not a declared $param")
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+            else:
+                raise RuleSetError(f"{rule_id}: value must be a number or $param")
+            conds.append((field, OPS[op], value))
+        if not conds:
+            raise RuleSetError(f"{rule_id}: needs at least one condition")
+        return _Rule(rule_id, level, conds, str(rule.get("reason") or rule_id))
+
+    def _check_scope(self, name: str, scope: Dict[str, Any]) -> None:
+        if not isinstance(scope, dict):
+            raise RuleSetError(f"{name}: must be an object")
+        params = _mapping(f"{name} params", scope.get("params"))
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise RuleSetError(f"{name}: unknown params {sorted(unknown)}")
+        for key, value in params.items():
+            _number(f"{name} params", key, value)
+        _check_green_min(name, scope.get("green_min"))
+        profile = scope.get("profile")
+        if profile is not None and profile not in self.profiles:
+            raise RuleSetError(f"{name}: unknown profile {profile!r}")
+        unknown = set(scope.get("disabled") or []) - {r.id for r in self.rules}
+        if unknown:
+            raise RuleSetError(f"{name}: unknown rules {sorted(unknown)}")
+
+    def settings_for(self, symbol: str) -> Tuple[Dict[str, float], set, Optional[int]]:
+        """(params, disabled rule ids, green_min) after profile then symbol overrides."""
+        params = dict(self.params)
+        disabled: set = set()
+        green_min = self.doc.get("green_min")
+        sym_scope = self.symbols.get(symbol.upper()) or {}
+        for scope in (self.profiles.get(sym_scope.get("profile") or "default") or {}, sym_scope):
+            params.update({k: float(v) for k, v in (scope.get("params") or {}).items()})
+            disabled.update(scope.get("disabled") or [])
+            green_min = scope.get("green_min", green_min)
+        return params, disabled, green_min
+
+    def _resolve(self, symbols: Tuple[str, ...]) -> _Resolved:
+        cached = self._resolved.get(symbols)
+        if cached is not None:
+            return cached
+        settings = [self.settings_for(s) for s in symbols]
+        params = {k: np.array([p[k] for p, _, _ in settings]) for k in self.params}
+        enabled = np.array([[r.id not in d for _, d, _ in settings] for r in self.rules], dtype=bool).reshape(
+            len(self.rules), len(symbols)
+        )
+        n_green = np.array([sum(1 for r in self.rules if r.level == "green" and r.id not in d) for _, d, _ in settings])
+        green_min = np.array([g if g is not None else n for (_, _, g), n in zip(settings, n_green)], dtype=np.int64)
+        try:
+            reasons = [[r.reason.format(**p) for r in self.rules] for p, _, _ in settings]
+        except (KeyError, ValueError, IndexError) as e:
+            raise RuleSetError(f"reason template failed: {e}") from e
+        resolved = _Resolved(params, enabled, green_min, reasons)
+        if len(self._resolved) >= _RESOLVED_CACHE_MAX:
+            self._resolved.clear()
+        self._resolved[symbols] = resolved
+        return resolved
+
+    def closure_for(self, symbol: str) -> SymbolEvaluator:
+        """`evaluate(snapshot, price_up, funding_nonnegative)` for one symbol, cached."""
+        cached = self._closures.get(symbol)
+        if cached is not None:
+            return cached
+        params, disabled, green_min = self.settings_for(symbol)
+        getters = [(f, _SCALAR_FIELDS[f]) for f in self.fields]
+        by_level: Dict[str, List[Tuple[str, List[Tuple[str, Callable, float]]]]] = {lv: [] for lv in LEVELS}
+        for rule in self.rules:
+            if rule.id in disabled:
+                continue
+            checks = [(f, op, params[v[1:]] if isinstance(v, str) else v) for f, op, v in rule.conds]
+            by_level[rule.level].append((rule.reason.format(**params), checks))
+        red, yellow, green = (by_level[lv] for lv in LEVELS)
+        need_green = green_min if green_min is not None else len(green)
+
+        def evaluate(snap: Dict[str, Any], price_up: bool, funding_nonnegative: bool) -> RuleResult:
+            v = {f: get(snap) for f, get in getters}
+            v["price_up"] = float(price_up)
+            v["funding_nonnegative"] = float(funding_nonnegative)
+            reds = [reason for reason, checks in red if all(op(v[f], c) for f, op, c in checks)]
+            if reds:
+                return ("RED", reds)
+            for reason, checks in yellow:
+                if all(op(v[f], c) for f, op, c in checks):
+                    return ("YELLOW", [reason])
+            greens = [reason for reason, checks in green if all(op(v[f], c) for f, op, c in checks)]
+            if need_green > 0 and len(greens) >= need_green:
+                return ("GREEN", greens)
+            return ("YELLOW", ["default state"])  # neutral when neither Red nor Green
+
+        if len(self._closures) >= _RESOLVED_CACHE_MAX:
+            self._closures.clear()
+        self._closures[symbol] = evaluate
+        return evaluate
+
+    def evaluate(
+        self,
+        snapshots: Mapping[str, Dict[str, Any]],
+        price_up: Sequence[bool],
+        funding_nonnegative: Sequence[bool],
+    ) -> Dict[str, RuleResult]:
+        """Traffic light and reasons for every snapshot; lookbacks are aligned with `snapshots`."""
+        if len(snapshots) < VECTORIZE_MIN_SYMBOLS:
+            return {
+                sym: self.closure_for(sym)(snap, up, ok)
+                for (sym, snap), up, ok in zip(snapshots.items(), price_up, funding_nonnegative)
+            }
+        return self.evaluate_vectorized(snapshots, price_up, funding_nonnegative)
+
+    def evaluate_vectorized(
+        self,
+        snapshots: Mapping[str, Dict[str, Any]],
+        price_up: Sequence[bool],
+        funding_nonnegative: Sequence[bool],
+    ) -> Dict[str, RuleResult]:
+        symbols = tuple(snapshots)
+        if not symbols:
+            return {}
+        res = self._resolve(symbols)
+        cols = snapshot_columns(list(snapshots.values()), self.fields)
+        cols["price_up"] = np.asarray(price_up, dtype=np.float64)
+        cols["funding_nonnegative"] = np.asarray(funding_nonnegative, dtype=np.float64)
+
+        masks = res.enabled.copy()
+        for i, rule in enumerate(self.rules):
+            for field, op, value in rule.conds:
+                rhs = res.params[value[1:]] if isinstance(value, str) else value
+                masks[i] &= op(cols[field], rhs)
+
+        state = self._states(masks, res.green_min).tolist()
+
+        out: Dict[str, RuleResult] = {}
+        for sym, st, row, reasons in zip(symbols, state, masks.T.tolist(), res.reasons):
+            if st == 0:
+                out[sym] = ("RED", [reasons[i] for i in self._red if row[i]])
+            elif st == 1:
+                out[sym] = ("YELLOW", [next(reasons[i] for i in self._yellow if row[i])])
+            elif st == 2:
+                out[sym] = ("GREEN", [reasons[i] for i in self._green if row[i]])
+            else:
+                out[sym] = ("YELLOW", ["default state"])  # neutral when neither Red nor Green
+        return out
+
+    def evaluate_series(self, symbol: str, columns: Mapping[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """`(state, masks)` for one symbol over time, from per-field column arrays.
+
+        `state` holds SERIES_STATES codes and `masks` is bool[rules, n]. Conditions on a
+        field missing from `columns` never match, so rules that need it stay silent.
+        """
+        params, disabled, green_min = self.settings_for(symbol)
+        n = len(next(iter(columns.values()))) if columns else 0
+        masks = np.zeros((len(self.rules), n), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            if rule.id in disabled or any(f not in columns for f, _, _ in rule.conds):
+                continue
+            mask = np.ones(n, dtype=bool)
+            for field, op, value in rule.conds:
+                mask &= op(columns[field], params[value[1:]] if isinstance(value, str) else value)
+            masks[i] = mask
+        if green_min is None:
+            green_min = sum(1 for r in self.rules if r.level == "green" and r.id not in disabled)
+        return self._states(masks, np.int64(green_min)), masks
+
+    def _states(self, masks: np.ndarray, green_min: np.ndarray) -> np.ndarray:
+        is_red = masks[self._red].any(axis=0)
+        is_yellow = ~is_red & masks[self._yellow].any(axis=0)
+        green_ok = (masks[self._green].sum(axis=0) >= green_min) & (green_min > 0)
+        return np.select([is_red, is_yellow, green_ok], [0, 1, 2], 3).astype(np.int8)
+
+
+def compile_ruleset(doc: Any) -> CompiledRules:
+    if not isinstance(doc, dict):
+        raise RuleSetError("rule set must be a JSON object")
+    return CompiledRules(doc)
+
+
+class RuleEngine:
+    """The active compiled rule set, hot-reloaded from Redis.
+
+    Falls back to DEFAULT_RULESET when nothing is stored. A stored document that fails to
+    compile is logged and ignored, so the previous rules keep running. `evaluate` applies
+    the same policy at run time: a rule set that raises during evaluation is replaced by
+    the last one that evaluated cleanly (or the defaults), so the collector keeps going.
+    """
+
+    def __init__(self) -> None:
+        self.compiled = compile_ruleset(copy.deepcopy(DEFAULT_RULESET))
+        self._last_good: Optional[CompiledRules] = None
+        self._source: Optional[bytes] = None
+
+    def load(self, raw: Optional[bytes]) -> None:
+        if raw == self._source:
+            return
+        self.compiled = compile_ruleset(orjson.loads(raw) if raw else copy.deepcopy(DEFAULT_RULESET))
+        self._source = raw
+        logger.info("rule set loaded (%d rules)", len(self.compiled.rules))
+
+    def evaluate(
+        self,
+        snapshots: Mapping[str, Dict[str, Any]],
+        price_up: Sequence[bool],
+        funding_nonnegative: Sequence[bool],
+    ) -> Dict[str, RuleResult]:
+        """`CompiledRules.evaluate` on the active rule set, never raising into the collector."""
+        compiled = self.compiled
+        try:
+            out = compiled.evaluate(snapshots, price_up, funding_nonnegative)
+        except Exception as e:
+            fallback = self._last_good
+            if fallback is None or fallback is compiled:
+                fallback = compile_ruleset(copy.deepcopy(DEFAULT_RULESET))
+            which = "previous" if fallback is self._last_good else "default"
+            logger.exception("rule set evaluation failed, falling back to the %s rules: %s", which, e)
+            if self.compiled is compiled:
+                self.compiled = fallback
+            try:
+                out = fallback.evaluate(snapshots, price_up, funding_nonnegative)
+            except Exception:
+                logger.exception("fallback rule set failed too")
+                return {sym: ("YELLOW", ["rules unavailable"]) for sym in snapshots}
+            compiled = fallback
+        self._last_good = compiled
+        return out
+
+    async def reload(self) -> None:
+        try:
+            self.load(await get_rules_raw())
+        except Exception as e:
+            logger.warning("rule set reload failed, keeping the previous one: %s", e)
+
+    async def watch(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                # "subscribed" comes first, so changes made while disconnected are picked up
+                async for _ in rules_events():
+                    await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("rule set subscription failed: %s", e)
+                await asyncio.sleep(2)
+
+
+_engine: Optional[RuleEngine] = None
+
+
+def get_rule_engine() -> RuleEngine:
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine()
+    return _engine
+
+
+async def run_rules_watcher(stop_event: asyncio.Event) -> None:
+    engine = get_rule_engine()
+    task = asyncio.create_task(engine.watch(stop_event))
+    try:
+        await stop_event.wait()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -1,18 +1,15 @@
 from __future__ import annotations
 
 import time
-from typing import List, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-from .metrics import calc_dominance_pct
+from .rule_engine import get_rule_engine
+from .windows import WindowStore
 from ..services.redis_store import get_timeseries, get_snapshot
 
-# Thresholds (can be made configurable per symbol via DB/config later)
-RED_DOMINANCE_THRESHOLD = 70.0
-OI_PERPVOL_MIN_RATIO = 0.25
-BASIS_TWAP15_GREEN_MIN = 0.10
-FUNDING_VERY_NEGATIVE = -0.15  # per hour
+# Thresholds and rule logic live in the rule set (see rule_engine.DEFAULT_RULESET);
+# this is only the funding lookback used when reading stored timeseries
 GREEN_FUNDING_NONNEG_HOURS = 3
-GREEN_DOMINANCE_MAX = 60.0
 
 
 async def _price_up_last_hour(symbol: str) -> bool:
@@ -36,61 +33,36 @@ async def _funding_nonnegative_last_n_hours(symbol: str, n: int) -> bool:
     return all(float(v) >= 0 for _, v in points)
 
 
-async def evaluate_rules(symbol: str) -> Tuple[str, List[str]]:
-    snap = await get_snapshot(symbol)
-    if not snap:
-        return ("YELLOW", ["no snapshot yet"])
-
-    reasons: List[str] = []
-
-    funding_1h = float(snap.get("funding_1h_pct", 0.0))
-    basis_twap15 = float(snap.get("basis_twap15_pct", 0.0))
-    dominance = float(snap.get("perp_dominance_pct", 0.0))
-    delta_oi_1h = float(snap.get("delta_oi_1h_usdt", 0.0))
-    oi_usdt = float(snap.get("oi_usdt", 0.0))
-    fut_vol24 = float(snap.get("fut_vol24_usdt", 0.0))
-
-    # Red rules
-    if funding_1h < 0 and basis_twap15 <= 0:
-        reasons.append("funding_1h < 0 and basis_twap15 ≤ 0 (perp discount)")
+def evaluate_snapshot(snap: Dict[str, Any], price_up: bool, funding_nonnegative: bool) -> Tuple[str, List[str]]:
+    """Traffic light and reasons for one snapshot, given its price and funding lookbacks."""
+    sym = str(snap.get("symbol") or "")
+    return get_rule_engine().evaluate({sym: snap}, [price_up], [funding_nonnegative])[sym]
 
-    if dominance >= RED_DOMINANCE_THRESHOLD and fut_vol24 > 0 and (oi_usdt / max(fut_vol24, 1e-9)) >= OI_PERPVOL_MIN_RATIO:
-        reasons.append("perp_dominance ≥ 70% and oi/usdt_vol24 ≥ 0.25")
 
-    if delta_oi_1h > 0 and await _price_up_last_hour(symbol):
-        reasons.append("ΔOI 1h > 0 while price ↑ last hour")
+def evaluate_batch(snapshots: Mapping[str, Dict[str, Any]], windows: WindowStore) -> Dict[str, Tuple[str, List[str]]]:
+    """Rules for a whole tick's freshly built snapshots, with lookbacks from the collector's windows.
 
-    # Borrowability rule (apply only if known)
-    borrow = snap.get("borrow") or {}
-    venues = borrow.get("venues") or []
-    shortable = bool(borrow.get("shortable", False))
-    # If no spot market exists, disallow shorting per PRD update
-    has_spot = bool(snap.get("has_spot", False))
-    if not has_spot:
-        reasons.append("no spot market available for borrow/hedge")
-    if venues and (not shortable):
-        reasons.append("spot short not borrowable or APR too high")
+    No Redis I/O: the snapshots are the ones about to be written, not the previous tick's,
+    and the active rule set is evaluated as vectorized masks over all of them at once.
+    Evaluation errors fall back to the last good rule set instead of reaching the collector.
+    """
+    price_up, funding_ok = [], []
+    for sym in snapshots:
+        w = windows.get(sym)
+        price_up.append(w.price_up() if w is not None else False)
+        funding_ok.append(w.funding_nonnegative() if w is not None else False)
+    return get_rule_engine().evaluate(snapshots, price_up, funding_ok)
 
-    if reasons:
-        return ("RED", reasons)
 
-    # Yellow (basis-only)
-    if funding_1h <= FUNDING_VERY_NEGATIVE and shortable:
-        return ("YELLOW", ["funding very negative but spot short borrowable"]) 
+async def evaluate_rules(symbol: str, snapshot: Optional[Dict[str, Any]] = None) -> Tuple[str, List[str]]:
+    """Evaluate traffic-light rules for `symbol` outside the collector.
 
-    # Green window
-    green_reasons: List[str] = []
+    Uses `snapshot` when given, otherwise the stored one; the price and funding
+    lookbacks are read from stored timeseries.
+    """
+    snap = snapshot if snapshot is not None else await get_snapshot(symbol)
+    if not snap:
+        return ("YELLOW", ["no snapshot yet"])
+    price_up = await _price_up_last_hour(symbol)
     funding_ok = await _funding_nonnegative_last_n_hours(symbol, GREEN_FUNDING_NONNEG_HOURS)
-    if funding_ok:
-        green_reasons.append("funding_1h ≥ 0 for ≥3h")
-    if basis_twap15 >= BASIS_TWAP15_GREEN_MIN:
-        green_reasons.append("basis_twap15 ≥ +0.10%")
-    if delta_oi_1h <= 0:
-        green_reasons.append("ΔOI 1h ≤ 0")
-    if dominance < GREEN_DOMINANCE_MAX:
-        green_reasons.append("perp_dominance < 60%")
-
-    if len(green_reasons) >= 4:
-        return ("GREEN", green_reasons)
-
-    return ("YELLOW", ["default state"])  # neutral when neither Red nor Green
+    return evaluate_snapshot(snap, price_up, funding_ok)
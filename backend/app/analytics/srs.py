@@ -1,6 +1,24 @@
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import get_settings
+from ..services.downsample import as_of
+from ..services.redis_store import get_timeseries_rows_many
+from ..services.retention import aggregate_rows, project
+
+# SRS components, their weights and the heuristic scale at which each saturates
+SRS_COMPONENTS = ("funding", "basis", "dominance", "delta_oi", "depth")
+SRS_WEIGHTS = np.array([0.25, 0.20, 0.20, 0.20, 0.15])
+HEURISTIC_SCALE = np.array([0.2, 0.2, 100.0, 1.0, 2.0])  # 0.2%/h funding ~ strong
+
+# Warm start: stored history is aligned on this grid before the statistics are folded in
+SEED_BUCKET_MS = 60 * 1000
+_SEED_METRICS = ("funding", "basis", "dominance", "oi", "imbalance")
 
 
 def compute_srs(snapshot: Dict) -> int:
@@ -24,3 +42,212 @@ def compute_srs(snapshot: Dict) -> int:
     )
     score = max(0.0, min(1.0, score))
     return int(round(score * 100))
+
+
+def srs_components(snapshots: Sequence[Mapping]) -> np.ndarray:
+    """Raw SRS component values, one row per snapshot, columns in SRS_COMPONENTS order."""
+    out = np.array(
+        [
+            (
+                s.get("funding_1h_pct", 0.0),
+                s.get("basis_twap15_pct", 0.0),
+                s.get("perp_dominance_pct", 0.0),
+                s.get("delta_oi_1h_usdt", 0.0),
+                s.get("oi_usdt", 0.0),
+                s.get("orderbook_imbalance", 0.0),
+            )
+            for s in snapshots
+        ],
+        dtype=np.float64,
+    ).reshape(-1, 6)
+    delta_oi = np.maximum(out[:, 3], 0.0) / np.maximum(out[:, 4], 1.0)
+    x = np.column_stack((np.abs(out[:, 0]), np.abs(out[:, 1]), out[:, 2], delta_oi, out[:, 5]))
+    return np.nan_to_num(x)
+
+
+def heuristic_srs(components: Sequence[np.ndarray]) -> np.ndarray:
+    """`compute_srs` over whole arrays: one array per component, in SRS_COMPONENTS order."""
+    score = np.zeros(np.shape(components[0]))
+    scaled = np.empty_like(score)
+    for values, scale, weight in zip(components, HEURISTIC_SCALE.tolist(), SRS_WEIGHTS.tolist()):
+        # In place (large temporaries dominate at backtest sizes); fmax/fmin also map NaN to 0
+        np.divide(values, scale, out=scaled)
+        np.fmin(np.fmax(scaled, 0.0, out=scaled), 1.0, out=scaled)
+        scaled *= weight
+        score += scaled
+    np.minimum(score, 1.0, out=score)
+    return np.rint(score * 100).astype(np.int64)
+
+
+def history_components(
+    series: Mapping[str, Tuple[np.ndarray, np.ndarray]], start_ms: int, end_ms: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """`(ts, components[n, 5])` rebuilt from stored timeseries on a SEED_BUCKET_MS grid.
+
+    Stored basis is instantaneous, so TWAP15 is recomputed as a 15-bucket rolling mean,
+    and ΔOI 1h is the OI change over the previous hour of buckets. Rows missing any
+    input are dropped.
+    """
+    grid = np.arange(start_ms - start_ms % SEED_BUCKET_MS, end_ms + 1, SEED_BUCKET_MS, dtype=np.int64)
+    cols = {}
+    for metric in _SEED_METRICS:
+        ts, rows = series.get(metric, (np.empty(0, dtype=np.int64), np.empty((0, 5))))
+        bucket_ts, bucket_rows = aggregate_rows(ts, rows, SEED_BUCKET_MS)
+        cols[metric] = as_of(grid, bucket_ts, project(bucket_rows, "mean"), 2 * SEED_BUCKET_MS)
+    twap_n = 15 * 60 * 1000 // SEED_BUCKET_MS
+    hour_n = 3600 * 1000 // SEED_BUCKET_MS
+    basis = cols["basis"]
+    cum = np.r_[0.0, np.cumsum(basis)]
+    twap = np.full(grid.size, np.nan)
+    if grid.size >= twap_n:
+        twap[twap_n - 1 :] = (cum[twap_n:] - cum[:-twap_n]) / twap_n
+    oi = cols["oi"]
+    delta_oi = np.full(grid.size, np.nan)
+    delta_oi[hour_n:] = oi[hour_n:] - oi[:-hour_n]
+    x = np.column_stack(
+        (
+            np.abs(cols["funding"]),
+            np.abs(twap),
+            cols["dominance"],
+            np.maximum(delta_oi, 0.0) / np.maximum(oi, 1.0),
+            cols["imbalance"],
+        )
+    )
+    keep = np.isfinite(x).all(axis=1)
+    return grid[keep], x[keep]
+
+
+class SrsNormalizer:
+    """Streaming z-score SRS for a whole watchlist.
+
+    Keeps an exponentially weighted mean and variance per symbol per component, updated
+    with West's incremental (Welford-style) recurrence, so each tick costs O(1) per
+    symbol and nothing is recomputed over history. The decay of each update follows the
+    time since the symbol's previous one (`1 - exp(-dt / lookback)`), which keeps the
+    effective lookback the same at REST and streaming cadences.
+
+    A component's contribution is its z-score against the statistics *before* the
+    current sample, clipped to `[0, z_cap]` and scaled to `[0, 1]`. Components with
+    fewer than `min_samples` observations, or no variance yet, fall back to the
+    heuristic scale of `compute_srs`.
+    """
+
+    def __init__(self, lookbacks_sec: Sequence[float], min_samples: int = 30, z_cap: float = 3.0) -> None:
+        lookbacks = np.asarray(lookbacks_sec, dtype=np.float64)
+        self.lookbacks_ms = np.broadcast_to(lookbacks, (len(SRS_COMPONENTS),)) * 1000.0
+        self.min_samples = min_samples
+        self.z_cap = z_cap
+        self._index: Dict[str, int] = {}
+        self._mean = np.zeros((0, len(SRS_COMPONENTS)))
+        self._var = np.zeros((0, len(SRS_COMPONENTS)))
+        self._count = np.zeros(0, dtype=np.int64)
+        self._last_ts = np.zeros(0, dtype=np.int64)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.upper() in self._index
+
+    def stats(self, symbol: str) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """`(mean, variance, samples)` per component for one symbol, or None if unseen."""
+        i = self._index.get(symbol.upper())
+        if i is None:
+            return None
+        return self._mean[i].copy(), self._var[i].copy(), int(self._count[i])
+
+    def _rows(self, symbols: Sequence[str]) -> np.ndarray:
+        new = [s for s in dict.fromkeys(symbols) if s not in self._index]
+        if new:
+            base = len(self._index)
+            self._index.update((s, base + k) for k, s in enumerate(new))
+            width = len(SRS_COMPONENTS)
+            self._mean = np.vstack((self._mean, np.zeros((len(new), width))))
+            self._var = np.vstack((self._var, np.zeros((len(new), width))))
+            self._count = np.r_[self._count, np.zeros(len(new), dtype=np.int64)]
+            self._last_ts = np.r_[self._last_ts, np.zeros(len(new), dtype=np.int64)]
+        return np.array([self._index[s] for s in symbols], dtype=np.int64)
+
+    def retain(self, symbols: Sequence[str]) -> None:
+        """Drop statistics for symbols no longer watched."""
+        wanted = {s.upper() for s in symbols}
+        keep = [s for s in self._index if s in wanted]
+        rows = np.array([self._index[s] for s in keep], dtype=np.int64)
+        self._index = {s: k for k, s in enumerate(keep)}
+        self._mean, self._var = self._mean[rows], self._var[rows]
+        self._count, self._last_ts = self._count[rows], self._last_ts[rows]
+
+    def normalized(self, rows: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Per-component scores in [0, 1] for `x` against the current statistics of `rows`."""
+        heuristic = np.clip(x / HEURISTIC_SCALE, 0.0, 1.0)
+        std = np.sqrt(self._var[rows])
+        warm = (self._count[rows] >= self.min_samples)[:, None] & (std > 1e-12)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (x - self._mean[rows]) / std
+        zscored = np.clip(z, 0.0, self.z_cap) / self.z_cap
+        return np.where(warm, zscored, heuristic)
+
+    def update(self, rows: np.ndarray, ts_ms: np.ndarray, x: np.ndarray) -> None:
+        """Fold one sample per row into the exponentially weighted statistics."""
+        dt = np.maximum(ts_ms - self._last_ts[rows], 0).astype(np.float64)
+        alpha = -np.expm1(-dt[:, None] / self.lookbacks_ms)
+        fresh = self._count[rows] == 0
+        alpha[fresh] = 1.0
+        mean, var = self._mean[rows], self._var[rows]
+        diff = x - mean
+        incr = alpha * diff
+        self._mean[rows] = mean + incr
+        self._var[rows] = (1.0 - alpha) * (var + diff * incr)
+        self._count[rows] += 1
+        self._last_ts[rows] = np.maximum(self._last_ts[rows], ts_ms)
+
+    def score(self, snapshots: Mapping[str, Mapping]) -> Dict[str, int]:
+        """Z-scored SRS for every snapshot in one pass, then fold the snapshots into the stats."""
+        if not snapshots:
+            return {}
+        symbols = [s.upper() for s in snapshots]
+        snaps = list(snapshots.values())
+        rows = self._rows(symbols)
+        x = srs_components(snaps)
+        ts_ms = np.array([int(s.get("ts") or 0) for s in snaps], dtype=np.int64)
+        score = np.clip(self.normalized(rows, x) @ SRS_WEIGHTS, 0.0, 1.0)
+        self.update(rows, ts_ms, x)
+        return dict(zip(snapshots, np.rint(score * 100).astype(int).tolist()))
+
+    def seed(self, symbol: str, ts_ms: np.ndarray, x: np.ndarray) -> None:
+        """Warm start one symbol from historical components, replacing its statistics.
+
+        Closed-form exponentially weighted mean and variance over the whole history; the
+        same as replaying it through `update` once the history spans a few lookbacks.
+        """
+        row = self._rows([symbol.upper()])[0]
+        if ts_ms.size == 0:
+            return
+        age = (ts_ms[-1] - ts_ms).astype(np.float64)[:, None]
+        w = np.exp(-age / self.lookbacks_ms)
+        total = w.sum(axis=0)
+        mean = (w * x).sum(axis=0) / total
+        self._mean[row] = mean
+        self._var[row] = (w * (x - mean) ** 2).sum(axis=0) / total
+        self._count[row] = ts_ms.size
+        self._last_ts[row] = ts_ms[-1]
+
+    async def sync(self, symbols: List[str]) -> None:
+        """Warm start new symbols from stored history and drop removed ones."""
+        self.retain(symbols)
+        missing = sorted({s.upper() for s in symbols} - set(self._index))
+        if not missing:
+            return
+        now = int(time.time() * 1000)
+        start = now - int(self.lookbacks_ms.max())
+        histories = await asyncio.gather(
+            *(get_timeseries_rows_many(sym, list(_SEED_METRICS), start, now) for sym in missing)
+        )
+        for sym, series in zip(missing, histories):
+            ts, x = history_components(series, start, now)
+            self.seed(sym, ts, x)
+
+
+def srs_normalizer_from_settings() -> Optional[SrsNormalizer]:
+    """The configured normalizer, or None when SRS stays on the heuristic scale."""
+    settings = get_settings()
+    if not settings.srs_zscore:
+        return None
+    return SrsNormalizer(settings.srs_lookbacks_sec or [86400.0], settings.srs_min_samples, settings.srs_z_cap)
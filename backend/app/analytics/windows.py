@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from ..services.redis_store import get_timeseries_many
+
+TWAP_WINDOW_MS = 15 * 60 * 1000
+PRICE_WINDOW_MS = 60 * 60 * 1000
+FUNDING_WINDOW_MS = 3 * 60 * 60 * 1000
+
+
+class RollingWindow:
+    """Time-bounded ring buffer of (ts, value) with O(1) amortised aggregates.
+
+    Keeps a running sum for the mean, a monotonic deque for the minimum and
+    exposes the first/last samples still inside the window.
+    """
+
+    def __init__(self, span_ms: int) -> None:
+        self.span_ms = span_ms
+        self._items: Deque[Tuple[int, float]] = deque()
+        self._mins: Deque[Tuple[int, float]] = deque()
+        self._sum = 0.0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def push(self, ts_ms: int, value: float) -> None:
+        value = float(value)
+        self._items.append((ts_ms, value))
+        self._sum += value
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((ts_ms, value))
+        self.evict(ts_ms)
+
+    def extend(self, points: Iterable[Tuple[int, float]]) -> None:
+        for ts_ms, value in points:
+            self.push(int(ts_ms), value)
+
+    def evict(self, now_ms: int) -> None:
+        cutoff = now_ms - self.span_ms
+        items = self._items
+        while items and items[0][0] < cutoff:
+            _, value = items.popleft()
+            self._sum -= value
+        while self._mins and self._mins[0][0] < cutoff:
+            self._mins.popleft()
+        if not items:
+            # Reset instead of carrying float drift from the running sum
+            self._sum = 0.0
+
+    def mean(self) -> Optional[float]:
+        if not self._items:
+            return None
+        return self._sum / len(self._items)
+
+    def mean_with(self, value: float) -> float:
+        """Mean as if `value` had been pushed, without storing it."""
+        return (self._sum + float(value)) / (len(self._items) + 1)
+
+    def min(self) -> Optional[float]:
+        return self._mins[0][1] if self._mins else None
+
+    def first(self) -> Optional[float]:
+        return self._items[0][1] if self._items else None
+
+    def last(self) -> Optional[float]:
+        return self._items[-1][1] if self._items else None
+
+
+class SymbolWindows:
+    """Lookback windows the collector and rule engine need for one symbol.
+
+    With a `resolution_ms` the windows keep at most one sample per bucket of that width,
+    so a collector that builds snapshots more often than the REST cadence (one per
+    markPrice event) holds the same number of samples the windows were sized for.
+    """
+
+    def __init__(self, resolution_ms: int = 0) -> None:
+        self.basis = RollingWindow(TWAP_WINDOW_MS)
+        self.mark = RollingWindow(PRICE_WINDOW_MS)
+        self.funding = RollingWindow(FUNDING_WINDOW_MS)
+        self.resolution_ms = resolution_ms
+        self._bucket: Optional[int] = None
+
+    def sample_due(self, ts_ms: int) -> bool:
+        """Whether a sample at `ts_ms` should be pushed; claims its bucket when it is."""
+        if self.resolution_ms <= 0:
+            return True
+        bucket = ts_ms // self.resolution_ms
+        if bucket == self._bucket:
+            return False
+        self._bucket = bucket
+        return True
+
+    def evict(self, now_ms: int) -> None:
+        self.basis.evict(now_ms)
+        self.mark.evict(now_ms)
+        self.funding.evict(now_ms)
+
+    def price_up(self) -> bool:
+        if len(self.mark) < 2:
+            return False
+        return float(self.mark.last()) > float(self.mark.first())  # type: ignore[arg-type]
+
+    def funding_nonnegative(self) -> bool:
+        low = self.funding.min()
+        return low is not None and low >= 0
+
+
+# (window attribute, persisted metric, span)
+_SEED_SOURCES = (
+    ("basis", "basis_1m", TWAP_WINDOW_MS),
+    ("mark", "mark", PRICE_WINDOW_MS),
+    ("funding", "funding", FUNDING_WINDOW_MS),
+)
+
+
+class WindowStore:
+    """Per-symbol in-memory windows, seeded once from Redis and then fed every tick.
+
+    `resolution_ms` is passed on to every `SymbolWindows`.
+    """
+
+    def __init__(self, resolution_ms: int = 0) -> None:
+        self.resolution_ms = resolution_ms
+        self._windows: Dict[str, SymbolWindows] = {}
+
+    def get(self, symbol: str) -> Optional[SymbolWindows]:
+        return self._windows.get(symbol.upper())
+
+    def __getitem__(self, symbol: str) -> SymbolWindows:
+        windows = self._windows.get(symbol.upper())
+        if windows is None:
+            windows = self._windows[symbol.upper()] = SymbolWindows(self.resolution_ms)
+        return windows
+
+    async def sync(self, symbols: List[str]) -> None:
+        """Seed windows for new symbols from stored history and drop removed ones."""
+        wanted = {s.upper() for s in symbols}
+        for sym in list(self._windows):
+            if sym not in wanted:
+                del self._windows[sym]
+        missing = sorted(wanted - set(self._windows))
+        if not missing:
+            return
+        now = int(time.time() * 1000)
+        seeded = {sym: SymbolWindows(self.resolution_ms) for sym in missing}
+        for attr, metric, span in _SEED_SOURCES:
+            history = await get_timeseries_many(missing, metric, now - span)
+            for sym, points in history.items():
+                getattr(seeded[sym], attr).extend(points)
+        self._windows.update(seeded)
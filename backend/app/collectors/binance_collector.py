@@ -2,36 +2,61 @@ from __future__ import annotations
 
 import asyncio
 import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
 from ..config import get_settings
-from ..services.binance_client import BinanceClient
+from ..services.alerts import get_alert_dispatcher
+from ..services.binance_client import BinanceClient, get_binance_client
 from ..services.redis_store import (
     get_watchlist,
     ensure_default_watchlist,
-    put_snapshot,
-    push_timeseries_point,
     get_cached_funding_interval_hours,
     set_cached_funding_interval_hours,
-    get_metric_values_since,
-    get_cached_has_spot,
     set_cached_has_spot,
+    write_tick,
+    get_cached_has_spot_many,
 )
-from ..analytics.metrics import (
-    calc_basis_pct,
-    calc_dominance_pct,
-    calc_orderbook_imbalance,
-    simple_twap,
+from ..services.instrumentation import (
+    COLLECTOR_STAGE_SECONDS,
+    COLLECTOR_SYMBOL_FAILURES,
+    COLLECTOR_SYMBOLS,
+    COLLECTOR_TICK_SECONDS,
 )
-from ..analytics.rules import evaluate_rules
-from ..analytics.srs import compute_srs
+from ..services.timescale import offer_history
+from ..analytics.depth import depth_arrays
+from ..analytics.rules import evaluate_batch
+from ..analytics.windows import WindowStore
+from ..analytics.srs import SrsNormalizer, srs_normalizer_from_settings
+from .depth_stream import OrderBookManager
+from .scheduler import CollectorScheduler
+from .snapshot_builder import snapshot_from_inputs, tile_from_snapshot
 
 
 settings = get_settings()
 logger = logging.getLogger("srr.collector")
 DEPTH_LIMIT = 100
-DEPTH_WINDOW_PCT = 0.02
+
+# Timeseries metric name -> snapshot field, persisted once per tick
+TIMESERIES_FIELDS = (
+    ("mark", "mark"),
+    ("basis", "basis_pct"),
+    ("funding", "funding_1h_pct"),
+    ("oi", "oi_usdt"),
+    ("dominance", "perp_dominance_pct"),
+    ("imbalance", "orderbook_imbalance"),
+)
+
+
+def timeseries_points(sym: str, snapshot: Dict[str, Any], ts_ms: int) -> List[Tuple[str, str, int, float]]:
+    """Timeseries rows persisted for one snapshot: basis_1m at the snapshot time plus TIMESERIES_FIELDS."""
+    points = [(sym, "basis_1m", int(snapshot["ts"]), float(snapshot.get("basis_pct", 0.0)))]
+    points.extend((sym, metric, ts_ms, float(snapshot.get(field, 0.0))) for metric, field in TIMESERIES_FIELDS)
+    return points
+
+
+class InputsNotReady(RuntimeError):
+    """A symbol's cached upstream inputs are not all available yet (e.g. right after it was added)."""
 
 
 async def get_funding_interval_hours(client: BinanceClient, symbol: str) -> int:
@@ -43,295 +68,172 @@ async def get_funding_interval_hours(client: BinanceClient, symbol: str) -> int:
     return hours
 
 
-async def collect_once(client: BinanceClient, symbol: str) -> Dict[str, Any]:
-    now_ms = int(time.time() * 1000)
-    # premium index
-    pi = await client.premium_index(symbol)
-    mark = float(pi.get("markPrice", 0.0))
-    index = float(pi.get("indexPrice", 0.0))
-    basis = calc_basis_pct(mark, index)
-
-    # push to basis timeseries at 1m resolution
-    await push_timeseries_point(symbol, "basis_1m", now_ms, basis)
-
-    # TWAP15
-    since_15m = now_ms - 15 * 60 * 1000
-    basis_values = await get_metric_values_since(symbol, "basis_1m", since_15m)
-    basis_twap15 = simple_twap(basis_values[-15:]) if basis_values else basis
-
-    # Funding
-    funding_interval_hours = await get_funding_interval_hours(client, symbol)
-    funding_interval_pct = float(pi.get("lastFundingRate", 0.0)) * 100.0
-    funding_1h_pct = funding_interval_pct / max(1, funding_interval_hours)
-    next_funding_in_sec = max(0, int((int(pi.get("nextFundingTime", 0)) - now_ms) / 1000))
-
-    # OI / ΔOI 1h
-    oi_hist = await client.open_interest_hist(symbol, period="5m", limit=13)
-    oi_usdt_now = float(oi_hist[-1]["sumOpenInterestValue"]) if oi_hist else 0.0
-    oi_usdt_then = float(oi_hist[0]["sumOpenInterestValue"]) if len(oi_hist) >= 1 else 0.0
-    delta_oi_1h_usdt = oi_usdt_now - oi_usdt_then
-
-    # Dominance
-    fut_24h = await client.ticker_24h(symbol)
-    fut_vol24 = float(fut_24h.get("quoteVolume", 0.0))
-    # Determine spot market existence and volume
-    # Cache has_spot to avoid flapping when spot exchangeInfo is rate-limited or transient
-    cached_has_spot = await get_cached_has_spot(symbol)
-    has_spot: Optional[bool]
-    if cached_has_spot is not None:
-        has_spot = bool(cached_has_spot)
-    else:
-        try:
-            has_spot = await client.spot_symbol_exists(symbol)
-        except Exception as exc:
-            logger.warning("spot existence probe failed for %s: %s", symbol, exc)
-            has_spot = None
-        else:
-            await set_cached_has_spot(symbol, has_spot)
-    spot_vol24 = 0.0
-    spot_data_ok = False
-    if has_spot is not False:
-        try:
-            spot_24h = await client.spot_ticker_24h(symbol)
-            spot_vol24 = float(spot_24h.get("quoteVolume", 0.0))
-            spot_data_ok = True
-            if has_spot is not True:
-                has_spot = True
-                await set_cached_has_spot(symbol, True)
-        except Exception as exc:
-            logger.debug("spot 24h fetch failed for %s: %s", symbol, exc)
-            spot_vol24 = 0.0
-    has_spot_flag = bool(has_spot)
-    if has_spot_flag and spot_vol24 <= 0.0:
-        spot_vol24 = await client.spot_quote_volume_24h_via_klines(symbol)
-        spot_data_ok = True
-    # If spot is unavailable but perp exists, dominance should be 100 only when fut_vol24>0.
-    # Also mark dominance unknown when both sides are zero to avoid a misleading 100.
-    dominance_unknown = False
-    if (has_spot_flag and not spot_data_ok) or (fut_vol24 <= 0 and spot_vol24 <= 0):
-        perp_dominance_pct = 0.0
-        dominance_unknown = True
-    else:
-        perp_dominance_pct = calc_dominance_pct(fut_vol24, spot_vol24)
-
-    # Orderbook imbalance within ±2% mid
-    depth = await client.depth(symbol, limit=DEPTH_LIMIT)
-    bids: List[List[str]] = depth.get("bids", [])
-    asks: List[List[str]] = depth.get("asks", [])
-    best_bid = float(bids[0][0]) if bids else mark
-    best_ask = float(asks[0][0]) if asks else mark
-    mid = (best_bid + best_ask) / 2.0 if best_bid and best_ask else mark
-    lo = mid * (1.0 - DEPTH_WINDOW_PCT)
-    hi = mid * (1.0 + DEPTH_WINDOW_PCT)
-
-    sum_bids = 0.0
-    for p, q, *_ in bids:
-        price = float(p)
-        if lo <= price <= hi:
-            sum_bids += float(q)
-    sum_asks = 0.0
-    for p, q, *_ in asks:
-        price = float(p)
-        if lo <= price <= hi:
-            sum_asks += float(q)
-    orderbook_imbalance = calc_orderbook_imbalance(sum_bids, sum_asks)
-
-    snapshot = {
-        "symbol": symbol,
-        "ts": now_ms,
-        "mark": mark,
-        "index": index,
-        "basis_pct": basis,
-        "basis_twap15_pct": basis_twap15,
-        "funding_1h_pct": funding_1h_pct,
-        "funding_interval_hours": funding_interval_hours,
-        "funding_daily_est_pct": funding_1h_pct * 24,
-        "oi_usdt": oi_usdt_now,
-        "delta_oi_1h_usdt": delta_oi_1h_usdt,
-        "perp_dominance_pct": perp_dominance_pct,
-        "orderbook_imbalance": orderbook_imbalance,
-        "borrow": {"shortable": has_spot_flag, "venues": []},
-        "fut_vol24_usdt": fut_vol24,
-        "spot_vol24_usdt": spot_vol24,
-        "next_funding_in_sec": next_funding_in_sec,
-        "has_spot": has_spot_flag,
-        "dominance_unknown": dominance_unknown,
-    }
-
-    # Compute SRS & rules
-    srs = compute_srs(snapshot)
-    traffic, reasons = await evaluate_rules(symbol)
-    snapshot["srs"] = srs
-    snapshot["traffic_light"] = traffic
-    snapshot["rule_reasons"] = reasons
-
-    return snapshot
-
-
 async def run_collector_loop(stop_event: asyncio.Event) -> None:
     await ensure_default_watchlist()
-    client = BinanceClient()
+    client = get_binance_client()
+    windows = WindowStore()
+    srs = srs_normalizer_from_settings()
+
+    async def funding_interval(sym: str) -> int:
+        return await get_funding_interval_hours(client, sym)
+
+    scheduler = CollectorScheduler(client, funding_interval, depth_limit=DEPTH_LIMIT)
+    books = OrderBookManager(client) if settings.use_depth_stream else None
     try:
-        while not stop_event.is_set():
+        await _collect_forever(stop_event, client, windows, scheduler, books, srs)
+    finally:
+        if books is not None:
+            await books.stop()
+
+
+async def _collect_forever(
+    stop_event: asyncio.Event,
+    client: BinanceClient,
+    windows: WindowStore,
+    scheduler: CollectorScheduler,
+    books: Optional[OrderBookManager],
+    srs: Optional[SrsNormalizer] = None,
+) -> None:
+    # Last good tile per symbol, so one failed tick doesn't drop a symbol from the dashboard
+    tiles: Dict[str, Dict[str, Any]] = {}
+    while not stop_event.is_set():
+        tick_started = time.perf_counter()
+        with COLLECTOR_STAGE_SECONDS.time(stage="fetch"):
             watchlist = await get_watchlist()
-
-            # Batch fetch 24h tickers to reduce rate/latency
-            fut_map: Dict[str, Any] = {}
-            spot_map: Dict[str, Any] = {}
             try:
-                fut_map = await client.ticker_24h_batch(watchlist)
-                logger.debug("fut_map keys=%s", list(fut_map.keys()))
+                await windows.sync(watchlist)
             except Exception as e:
-                logger.warning("ticker_24h_batch error: %s", e)
-                fut_map = {}
-            # Only include symbols that likely have spot
-            try:
-                spot_map = await client.spot_ticker_24h_batch(watchlist)
-                logger.debug("spot_map keys=%s", list(spot_map.keys()))
-            except Exception as e:
-                logger.warning("spot_ticker_24h_batch error: %s", e)
-                spot_map = {}
-
-            async def collect_with_maps(sym: str) -> Dict[str, Any]:
-                # Small shim to pass batch data into per-symbol collector
-                # Falls back to per-request methods if missing
-                nonlocal fut_map, spot_map
-                now_ms = int(time.time() * 1000)
-                pi = await client.premium_index(sym)
-                mark = float(pi.get("markPrice", 0.0))
-                index = float(pi.get("indexPrice", 0.0))
-                basis = calc_basis_pct(mark, index)
-                await push_timeseries_point(sym, "basis_1m", now_ms, basis)
-
-                since_15m = now_ms - 15 * 60 * 1000
-                basis_values = await get_metric_values_since(sym, "basis_1m", since_15m)
-                basis_twap15 = simple_twap(basis_values[-15:]) if basis_values else basis
-
-                funding_interval_hours = await get_funding_interval_hours(client, sym)
-                funding_interval_pct = float(pi.get("lastFundingRate", 0.0)) * 100.0
-                funding_1h_pct = funding_interval_pct / max(1, funding_interval_hours)
-                next_funding_in_sec = max(0, int((int(pi.get("nextFundingTime", 0)) - now_ms) / 1000))
-
-                oi_hist = await client.open_interest_hist(sym, period="5m", limit=13)
-                oi_usdt_now = float(oi_hist[-1]["sumOpenInterestValue"]) if oi_hist else 0.0
-                oi_usdt_then = float(oi_hist[0]["sumOpenInterestValue"]) if len(oi_hist) >= 1 else 0.0
-                delta_oi_1h_usdt = oi_usdt_now - oi_usdt_then
-
-                fut_24h = fut_map.get(sym) or {}
-                fut_vol24 = float((fut_24h or {}).get("quoteVolume", 0.0))
-                if not fut_24h:
-                    try:
-                        one = await client.ticker_24h(sym)
-                        fut_vol24 = float(one.get("quoteVolume", 0.0))
-                    except Exception:
-                        fut_vol24 = 0.0
-                cached_has_spot = await get_cached_has_spot(sym)
-                has_spot: Optional[bool] = bool(cached_has_spot) if cached_has_spot is not None else None
-                spot_24h = spot_map.get(sym) or {}
-                spot_vol24 = 0.0
-                spot_data_ok = False
-                if spot_24h:
-                    try:
-                        spot_vol24 = float(spot_24h.get("quoteVolume", 0.0))
-                        spot_data_ok = True
-                    except Exception:
-                        spot_vol24 = 0.0
-                    if spot_data_ok and has_spot is not True:
-                        has_spot = True
-                        await set_cached_has_spot(sym, True)
-                if has_spot is None:
-                    try:
-                        has_spot = await client.spot_symbol_exists(sym)
-                    except Exception as exc:
-                        logger.warning("spot existence probe failed for %s: %s", sym, exc)
-                        has_spot = None
-                    else:
-                        await set_cached_has_spot(sym, has_spot)
-                has_spot_flag = bool(has_spot)
-                if has_spot_flag and not spot_data_ok:
-                    try:
-                        spot_single = await client.spot_ticker_24h(sym)
-                        spot_vol24 = float(spot_single.get("quoteVolume", 0.0))
-                        spot_data_ok = True
-                    except Exception as exc:
-                        logger.debug("spot 24h single failed for %s: %s", sym, exc)
-                if has_spot_flag and spot_vol24 <= 0.0:
-                    # Fallback to summing last 24h quote volumes via klines if public 24h ticker is unreliable
-                    spot_vol24 = await client.spot_quote_volume_24h_via_klines(sym)
+                logger.warning("window seeding failed: %s", e)
+            if srs is not None:
+                try:
+                    await srs.sync(watchlist)
+                except Exception as e:
+                    logger.warning("SRS statistics warm start failed: %s", e)
+
+            # Per-tick Redis reads are batched up front (MGET) instead of per symbol
+            has_spot_cache = await get_cached_has_spot_many(watchlist)
+            spot_candidates = [s for s in watchlist if has_spot_cache.get(s) is not False]
+
+            # Streamed books replace REST depth polling for every symbol that is in sync
+            depth_candidates: Optional[List[str]] = None
+            if books is not None:
+                await books.ensure(watchlist)
+                synced = books.synced_symbols()
+                depth_candidates = [s for s in watchlist if s not in synced]
+
+            # Every source refreshes at its own cadence; snapshots use the freshest cached inputs
+            await scheduler.refresh(watchlist, spot_symbols=spot_candidates, depth_symbols=depth_candidates)
+
+        async def collect_with_maps(sym: str) -> Dict[str, Any]:
+            pi = scheduler.premium.get(sym)
+            oi_hist = scheduler.oi_hist.get(sym)
+            book = books.book(sym) if books is not None else None
+            depth = scheduler.depth.get(sym)
+            funding_interval_hours = scheduler.funding_interval.get(sym)
+            fut_24h = scheduler.fut_ticker.get(sym)
+            if (
+                pi is None
+                or oi_hist is None
+                or (book is None and depth is None)
+                or funding_interval_hours is None
+                or fut_24h is None
+            ):
+                raise InputsNotReady(f"inputs not ready for {sym}")
+            compute_started = time.perf_counter()
+            now_ms = int(time.time() * 1000)
+            fut_vol24 = float(fut_24h.get("quoteVolume", 0.0))
+            cached_has_spot = has_spot_cache.get(sym)
+            has_spot: Optional[bool] = bool(cached_has_spot) if cached_has_spot is not None else None
+            spot_24h = scheduler.spot_ticker.get(sym) or {}
+            spot_vol24 = 0.0
+            spot_data_ok = False
+            if spot_24h:
+                try:
+                    spot_vol24 = float(spot_24h.get("quoteVolume", 0.0))
                     spot_data_ok = True
-                logger.info("%s volumes fut=%s spot=%s", sym, fut_vol24, spot_vol24)
-
-                dominance_unknown = False
-                if (has_spot_flag and not spot_data_ok) or (fut_vol24 <= 0 and spot_vol24 <= 0):
-                    perp_dominance_pct = 0.0
-                    dominance_unknown = True
+                except Exception:
+                    spot_vol24 = 0.0
+                if spot_data_ok and has_spot is not True:
+                    has_spot = True
+                    await set_cached_has_spot(sym, True)
+            if has_spot is None:
+                try:
+                    has_spot = await client.spot_symbol_exists(sym)
+                except Exception as exc:
+                    logger.warning("spot existence probe failed for %s: %s", sym, exc)
+                    has_spot = None
                 else:
-                    perp_dominance_pct = calc_dominance_pct(fut_vol24, spot_vol24)
-
-                depth = await client.depth(sym, limit=DEPTH_LIMIT)
-                bids: List[List[str]] = depth.get("bids", [])
-                asks: List[List[str]] = depth.get("asks", [])
-                best_bid = float(bids[0][0]) if bids else mark
-                best_ask = float(asks[0][0]) if asks else mark
-                mid = (best_bid + best_ask) / 2.0 if best_bid and best_ask else mark
-                lo = mid * (1.0 - DEPTH_WINDOW_PCT)
-                hi = mid * (1.0 + DEPTH_WINDOW_PCT)
-                sum_bids = 0.0
-                for p, q, *_ in bids:
-                    price = float(p)
-                    if lo <= price <= hi:
-                        sum_bids += float(q)
-                sum_asks = 0.0
-                for p, q, *_ in asks:
-                    price = float(p)
-                    if lo <= price <= hi:
-                        sum_asks += float(q)
-                orderbook_imbalance = calc_orderbook_imbalance(sum_bids, sum_asks)
-
-                snapshot = {
-                    "symbol": sym,
-                    "ts": now_ms,
-                    "mark": mark,
-                    "index": index,
-                    "basis_pct": basis,
-                    "basis_twap15_pct": basis_twap15,
-                    "funding_1h_pct": funding_1h_pct,
-                    "funding_interval_hours": funding_interval_hours,
-                    "funding_daily_est_pct": funding_1h_pct * 24,
-                    "oi_usdt": oi_usdt_now,
-                    "delta_oi_1h_usdt": delta_oi_1h_usdt,
-                    "perp_dominance_pct": perp_dominance_pct,
-                    "orderbook_imbalance": orderbook_imbalance,
-                    "borrow": {"shortable": has_spot_flag, "venues": []},
-                    "fut_vol24_usdt": fut_vol24,
-                    "spot_vol24_usdt": spot_vol24,
-                    "next_funding_in_sec": next_funding_in_sec,
-                    "has_spot": has_spot_flag,
-                    "dominance_unknown": dominance_unknown,
-                }
-                srs = compute_srs(snapshot)
-                traffic, reasons = await evaluate_rules(sym)
-                snapshot["srs"] = srs
-                snapshot["traffic_light"] = traffic
-                snapshot["rule_reasons"] = reasons
-                return snapshot
-
-            tasks = [collect_with_maps(sym) for sym in watchlist]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            now_ms = int(time.time() * 1000)
-            for sym, res in zip(watchlist, results):
-                if isinstance(res, Exception):
-                    continue
-                await put_snapshot(sym, res)
-                await push_timeseries_point(sym, "mark", now_ms, float(res.get("mark", 0.0)))
-                await push_timeseries_point(sym, "basis", now_ms, float(res.get("basis_pct", 0.0)))
-                await push_timeseries_point(sym, "funding", now_ms, float(res.get("funding_1h_pct", 0.0)))
-                await push_timeseries_point(sym, "oi", now_ms, float(res.get("oi_usdt", 0.0)))
-                await push_timeseries_point(sym, "dominance", now_ms, float(res.get("perp_dominance_pct", 0.0)))
-                await push_timeseries_point(sym, "imbalance", now_ms, float(res.get("orderbook_imbalance", 0.0)))
+                    await set_cached_has_spot(sym, has_spot)
+            has_spot_flag = bool(has_spot)
+            if has_spot_flag and spot_vol24 <= 0.0:
+                # Fallback to summing last 24h quote volumes via klines if public 24h ticker is unreliable
+                await scheduler.spot_klines.refresh([sym])
+                klines_vol = scheduler.spot_klines.get(sym)
+                if klines_vol is not None:
+                    spot_vol24 = float(klines_vol)
+                    spot_data_ok = True
+            logger.debug("%s volumes fut=%s spot=%s", sym, fut_vol24, spot_vol24)
+
+            sym_windows = windows[sym]
+            snapshot = snapshot_from_inputs(
+                sym,
+                now_ms,
+                sym_windows,
+                premium=pi,
+                funding_interval_hours=funding_interval_hours,
+                oi_hist=oi_hist,
+                depth=book.to_arrays(max_levels=DEPTH_LIMIT) if book is not None else depth_arrays(depth),
+                fut_vol24=fut_vol24,
+                spot_vol24=spot_vol24,
+                spot_data_ok=spot_data_ok,
+                has_spot=has_spot_flag,
+                depth_bands_pct=settings.depth_bands_pct,
+                slippage_sizes_usdt=settings.slippage_sizes_usdt,
+                orderbook_imbalance=book.imbalance() if book is not None else None,
+            )
+            COLLECTOR_STAGE_SECONDS.observe(time.perf_counter() - compute_started, stage="compute")
+            return snapshot
+
+        tasks = [collect_with_maps(sym) for sym in watchlist]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        now_ms = int(time.time() * 1000)
+        snapshots: Dict[str, Dict[str, Any]] = {}
+        points: List[Tuple[str, str, int, float]] = []
+        for sym, res in zip(watchlist, results):
+            if isinstance(res, Exception):
+                if isinstance(res, InputsNotReady):
+                    COLLECTOR_SYMBOL_FAILURES.inc(symbol=sym, reason="inputs_not_ready")
+                    logger.debug("%s", res)
+                else:
+                    COLLECTOR_SYMBOL_FAILURES.inc(symbol=sym, reason=type(res).__name__)
+                    logger.warning("snapshot failed for %s: %r", sym, res)
+                continue
+            snapshots[sym] = res
+            points.extend(timeseries_points(sym, res, now_ms))
+        if srs is not None:
+            # Z-scored SRS for the whole tick in one pass, before rules that may read it
+            with COLLECTOR_STAGE_SECONDS.time(stage="srs"):
+                for sym, score in srs.score(snapshots).items():
+                    snapshots[sym]["srs"] = score
+        with COLLECTOR_STAGE_SECONDS.time(stage="rules"):
+            for sym, (traffic, reasons) in evaluate_batch(snapshots, windows).items():
+                snapshots[sym]["traffic_light"] = traffic
+                snapshots[sym]["rule_reasons"] = reasons
+        # Transitions are queued for the alert dispatcher; never blocks the tick
+        get_alert_dispatcher().observe(snapshots)
+        tiles = {s: tiles[s] for s in watchlist if s in tiles}
+        tiles.update((s, tile_from_snapshot(snap)) for s, snap in snapshots.items())
+        COLLECTOR_SYMBOLS.set(len(snapshots), outcome="ok")
+        COLLECTOR_SYMBOLS.set(len(watchlist) - len(snapshots), outcome="failed")
+        with COLLECTOR_STAGE_SECONDS.time(stage="persist"):
             try:
-                await asyncio.wait_for(stop_event.wait(), timeout=settings.collect_interval_sec)
-            except asyncio.TimeoutError:
-                pass
-    finally:
-        await client.close()
+                await write_tick(snapshots, points, tiles)
+            except Exception as e:
+                logger.warning("tick persist failed for %d symbols: %s", len(snapshots), e)
+        # Buffered for the TimescaleDB sink (if enabled); flushed by its own task
+        offer_history(snapshots, points)
+        COLLECTOR_TICK_SECONDS.observe(time.perf_counter() - tick_started, mode="rest")
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.collect_interval_sec)
+        except asyncio.TimeoutError:
+            pass
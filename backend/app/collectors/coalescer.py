@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..services.instrumentation import COLLECTOR_STAGE_SECONDS
+from ..services.redis_store import write_tick
+from .binance_collector import timeseries_points
+from .snapshot_builder import tile_from_snapshot
+
+logger = logging.getLogger("srr.coalescer")
+
+Point = Tuple[str, str, int, float]
+TickWriter = Callable[[Dict[str, Dict[str, Any]], Iterable[Point], Optional[Dict[str, Dict[str, Any]]]], Awaitable[None]]
+
+
+class WriteCoalescer:
+    """Merges per-symbol snapshot updates and flushes them as one pipelined batch.
+
+    `update()` merges fields into the symbol's last known state and marks it dirty; it
+    never touches Redis. Every `flush_ms` the dirty symbols are written with a single
+    `write_tick`, so a symbol updated many times between flushes costs one write. Points
+    are downsampled to one per `resolution_ms` bucket per symbol. Each flush also
+    rewrites the tiles document with every known symbol; only dirty tiles are rebuilt.
+    """
+
+    def __init__(self, flush_ms: int, resolution_ms: int, writer: TickWriter = write_tick) -> None:
+        self.flush_ms = flush_ms
+        self.resolution_ms = max(1, resolution_ms)
+        self._writer = writer
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._dirty: Set[str] = set()
+        self._buckets: Dict[str, int] = {}
+        self._tiles: Dict[str, Dict[str, Any]] = {}
+
+    def update(self, symbol: str, fields: Dict[str, Any]) -> None:
+        state = self._state.setdefault(symbol, {})
+        state.update(fields)
+        self._dirty.add(symbol)
+
+    def state(self, symbol: str) -> Dict[str, Any]:
+        return self._state.get(symbol, {})
+
+    def forget(self, symbol: str) -> None:
+        self._state.pop(symbol, None)
+        self._buckets.pop(symbol, None)
+        self._tiles.pop(symbol, None)
+        self._dirty.discard(symbol)
+
+    def drain(self) -> Tuple[Dict[str, Dict[str, Any]], List[Point]]:
+        """Take the dirty snapshots and their due timeseries points, clearing the dirty set."""
+        snapshots: Dict[str, Dict[str, Any]] = {}
+        points: List[Point] = []
+        for sym in self._dirty:
+            snap = self._state.get(sym)
+            if not snap or "ts" not in snap:
+                continue
+            snapshots[sym] = dict(snap)
+            self._tiles[sym] = tile_from_snapshot(snap)
+            ts = int(snap["ts"])
+            bucket = ts // self.resolution_ms
+            if bucket != self._buckets.get(sym):
+                self._buckets[sym] = bucket
+                points.extend(timeseries_points(sym, snap, ts))
+        self._dirty.clear()
+        return snapshots, points
+
+    async def flush(self) -> int:
+        snapshots, points = self.drain()
+        if not snapshots:
+            return 0
+        with COLLECTOR_STAGE_SECONDS.time(stage="persist"):
+            try:
+                await self._writer(snapshots, points, dict(self._tiles))
+            except Exception as e:
+                logger.warning("coalesced flush failed for %d symbols: %s", len(snapshots), e)
+                # Retry on the next flush with the then-latest state
+                self._dirty.update(snapshots)
+                for sym in snapshots:
+                    self._buckets.pop(sym, None)
+                return 0
+        return len(snapshots)
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from ..config import get_settings
+from ..services.redis_store import compact_timeseries, get_watchlist, migrate_legacy_timeseries
+
+
+settings = get_settings()
+logger = logging.getLogger("srr.compactor")
+
+
+async def run_compactor_loop(stop_event: asyncio.Event) -> None:
+    """Periodically roll up the watchlist's timeseries chunks, after a one-time legacy migration."""
+    # Leave one collect interval of slack so the newest bucket has all its points
+    grace_ms = settings.collect_interval_sec * 1000
+    try:
+        removed = await migrate_legacy_timeseries()
+        if removed:
+            logger.info("migrated %d legacy timeseries keys into chunks", removed)
+    except Exception as e:
+        logger.warning("legacy timeseries migration failed (retried on next start): %s", e)
+    while not stop_event.is_set():
+        try:
+            watchlist = await get_watchlist()
+            written = await compact_timeseries(watchlist, grace_ms=grace_ms)
+            logger.debug("compacted %d rollup buckets for %d symbols", written, len(watchlist))
+        except Exception as e:
+            logger.warning("timeseries compaction failed: %s", e)
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=settings.ts_compact_interval_sec)
+        except asyncio.TimeoutError:
+            pass
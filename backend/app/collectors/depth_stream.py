@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from ..analytics.orderbook import OrderBook
+from ..services.binance_client import BinanceClient
+from .stream_shards import FUTURES_MAX_STREAMS, FUTURES_WS_URL, StreamShards
+
+logger = logging.getLogger("srr.depth_stream")
+
+SNAPSHOT_LIMIT = 1000
+MAX_BUFFERED_EVENTS = 2000
+RESYNC_DELAY_SEC = 1.0
+
+
+class OrderBookManager:
+    """Keeps an `OrderBook` per symbol in sync from `<symbol>@depth@100ms` diff streams.
+
+    Streams are spread over `StreamShards` connections and (un)subscribed live as the
+    symbol set changes. Events are buffered until a REST snapshot is loaded, then
+    replayed; any sequence gap or reconnect resets the affected books and triggers a
+    fresh snapshot.
+    """
+
+    def __init__(self, client: BinanceClient) -> None:
+        self._client = client
+        self._books: Dict[str, OrderBook] = {}
+        self._buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self._loading: Set[str] = set()
+        self._symbols: Set[str] = set()
+        self._streams = StreamShards(
+            FUTURES_WS_URL, self._on_payload, FUTURES_MAX_STREAMS, on_connect=self._on_connect, name="depth"
+        )
+        self._background: Set[asyncio.Task] = set()
+
+    def book(self, symbol: str) -> Optional[OrderBook]:
+        """The symbol's book if it is currently in sync, else None."""
+        book = self._books.get(symbol.upper())
+        return book if book is not None and book.synced else None
+
+    def synced_symbols(self) -> Set[str]:
+        return {s for s, b in self._books.items() if b.synced}
+
+    async def ensure(self, symbols: List[str]) -> None:
+        """Subscribe depth streams for new symbols and unsubscribe removed ones."""
+        wanted = {s.upper() for s in symbols}
+        self._symbols = wanted
+        for sym in list(self._books):
+            if sym not in wanted:
+                self._books.pop(sym, None)
+                self._buffers.pop(sym, None)
+        await self._streams.set_streams(f"{s.lower()}@depth@100ms" for s in wanted)
+
+    async def stop(self) -> None:
+        await self._streams.stop()
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._streams.stats(), "synced": len(self.synced_symbols())}
+
+    def _on_connect(self, streams: List[str]) -> None:
+        # Continuity is lost across connections: every book on this one must be rebuilt
+        for stream in streams:
+            self._reset(stream.split("@", 1)[0].upper())
+
+    def _on_payload(self, payload: Dict[str, Any]) -> None:
+        sym = str(payload.get("s") or "").upper()
+        # Events can still arrive for a symbol between its removal and the UNSUBSCRIBE ack
+        if sym in self._symbols:
+            self.on_event(sym, payload)
+
+    def _reset(self, sym: str) -> None:
+        book = self._books.get(sym)
+        if book is not None:
+            book.reset()
+        self._buffers[sym] = []
+
+    def on_event(self, sym: str, event: Dict[str, Any]) -> None:
+        book = self._books.get(sym)
+        if book is None:
+            book = self._books[sym] = OrderBook(sym)
+        if book.last_update_id is None:
+            buf = self._buffers.setdefault(sym, [])
+            buf.append(event)
+            if len(buf) > MAX_BUFFERED_EVENTS:
+                del buf[: len(buf) - MAX_BUFFERED_EVENTS]
+            self._schedule_bootstrap(sym)
+            return
+        if not book.apply_event(event):
+            logger.info("depth sequence gap for %s; resyncing", sym)
+            book.reset()
+            self._buffers[sym] = [event]
+            self._schedule_bootstrap(sym)
+
+    def _schedule_bootstrap(self, sym: str, delay: float = 0.0) -> None:
+        if sym in self._loading:
+            return
+        self._loading.add(sym)
+        task = asyncio.create_task(self._bootstrap(sym, delay))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _bootstrap(self, sym: str, delay: float) -> None:
+        retry = False
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                snap = await self._client.depth(sym, limit=SNAPSHOT_LIMIT)
+            except Exception as e:
+                logger.warning("depth snapshot failed for %s: %s", sym, e)
+                retry = True
+                return
+            book = self._books.get(sym)
+            if book is None:
+                return
+            book.load_snapshot(int(snap.get("lastUpdateId", 0)), snap.get("bids", []), snap.get("asks", []))
+            for event in self._buffers.pop(sym, []):
+                if not book.apply_event(event):
+                    # Snapshot predates the buffered stream; take a newer one
+                    book.reset()
+                    self._buffers[sym] = []
+                    retry = True
+                    return
+        finally:
+            self._loading.discard(sym)
+            if retry and sym in self._books:
+                self._schedule_bootstrap(sym, RESYNC_DELAY_SEC)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..config import get_settings
+from ..services.binance_client import BinanceClient
+from ..services.instrumentation import SOURCE_REFRESH_FAILURES
+
+
+settings = get_settings()
+logger = logging.getLogger("srr.scheduler")
+
+FetchOne = Callable[[str], Awaitable[Any]]
+FetchBatch = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+
+class Source:
+    """One upstream data source with its own refresh cadence and last-value cache.
+
+    Values are cached per symbol with the time they were fetched. A refresh only
+    fetches symbols whose value is missing or older than `interval_sec`; failures
+    keep the previous value so snapshots are built from the freshest data we have,
+    and are retried no sooner than `retry_sec`. Symbols a batch response leaves out
+    count as failures: they keep their previous value and stay due.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval_sec: float,
+        fetch_one: Optional[FetchOne] = None,
+        fetch_batch: Optional[FetchBatch] = None,
+        retry_sec: Optional[float] = None,
+    ) -> None:
+        if fetch_one is None and fetch_batch is None:
+            raise ValueError(f"source {name} needs fetch_one or fetch_batch")
+        self.name = name
+        self.interval_sec = interval_sec
+        self._fetch_one = fetch_one
+        self._fetch_batch = fetch_batch
+        self.retry_sec = min(interval_sec, retry_sec if retry_sec is not None else settings.collect_interval_sec)
+        self._values: Dict[str, Tuple[float, Any]] = {}
+        self._attempts: Dict[str, float] = {}
+
+    def get(self, symbol: str) -> Optional[Any]:
+        entry = self._values.get(symbol)
+        return entry[1] if entry else None
+
+    def age(self, symbol: str, now: Optional[float] = None) -> Optional[float]:
+        entry = self._values.get(symbol)
+        if entry is None:
+            return None
+        return (now if now is not None else time.time()) - entry[0]
+
+    def put(self, symbol: str, value: Any, now: Optional[float] = None) -> None:
+        self._values[symbol] = (now if now is not None else time.time(), value)
+
+    def due(self, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        now = now if now is not None else time.time()
+        out = []
+        for sym in symbols:
+            entry = self._values.get(sym)
+            if entry is not None and now - entry[0] < self.interval_sec:
+                continue
+            attempt = self._attempts.get(sym)
+            if attempt is not None and now - attempt < self.retry_sec:
+                continue
+            out.append(sym)
+        return out
+
+    def retain(self, symbols: Iterable[str]) -> None:
+        keep = set(symbols)
+        for sym in list(self._values):
+            if sym not in keep:
+                del self._values[sym]
+        for sym in list(self._attempts):
+            if sym not in keep:
+                del self._attempts[sym]
+
+    async def refresh(self, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Fetch due symbols; returns the ones that were refreshed."""
+        now = now if now is not None else time.time()
+        due = self.due(symbols, now)
+        if not due:
+            return []
+        for sym in due:
+            self._attempts[sym] = now
+        if self._fetch_batch is not None:
+            try:
+                got = await self._fetch_batch(due)
+            except Exception as e:
+                logger.warning("%s batch refresh failed: %s", self.name, e)
+                SOURCE_REFRESH_FAILURES.inc(source=self.name)
+                return []
+            refreshed = [sym for sym in due if got.get(sym) is not None]
+            missing = len(due) - len(refreshed)
+            if missing:
+                logger.warning("%s batch response missing %d of %d symbols", self.name, missing, len(due))
+                SOURCE_REFRESH_FAILURES.inc(missing, source=self.name)
+            for sym in refreshed:
+                self.put(sym, got[sym], now)
+            return refreshed
+
+        assert self._fetch_one is not None
+        results = await asyncio.gather(*(self._fetch_one(s) for s in due), return_exceptions=True)
+        refreshed = []
+        for sym, res in zip(due, results):
+            if isinstance(res, Exception):
+                logger.warning("%s refresh failed for %s: %s", self.name, sym, res)
+                SOURCE_REFRESH_FAILURES.inc(source=self.name)
+                continue
+            self.put(sym, res, now)
+            refreshed.append(sym)
+        return refreshed
+
+
+class CollectorScheduler:
+    """Multi-rate refresh of every REST input the collector needs.
+
+    Cadences: premium index every tick (one bulk request), 24h tickers every `ticker_refresh_sec`,
+    depth every `depth_refresh_sec`, OI history every `oi_refresh_sec`, funding
+    interval every `funding_refresh_sec` and the spot klines volume fallback every
+    `spot_klines_refresh_sec`.
+    """
+
+    def __init__(self, client: BinanceClient, funding_interval: FetchOne, depth_limit: int = 100) -> None:
+        self.premium = Source(
+            "premium_index", settings.collect_interval_sec, fetch_batch=client.premium_index_batch
+        )
+        self.oi_hist = Source(
+            "oi_hist",
+            settings.oi_refresh_sec,
+            fetch_one=lambda s: client.open_interest_hist(s, period="5m", limit=13),
+        )
+        self.fut_ticker = Source("fut_ticker_24h", settings.ticker_refresh_sec, fetch_batch=client.ticker_24h_batch)
+        self.spot_ticker = Source(
+            "spot_ticker_24h", settings.ticker_refresh_sec, fetch_batch=client.spot_ticker_24h_batch
+        )
+        self.depth = Source(
+            "depth", settings.depth_refresh_sec, fetch_one=lambda s: client.depth(s, limit=depth_limit)
+        )
+        self.funding_interval = Source("funding_interval", settings.funding_refresh_sec, fetch_one=funding_interval)
+        self.spot_klines = Source(
+            "spot_klines_volume",
+            settings.spot_klines_refresh_sec,
+            fetch_one=client.spot_quote_volume_24h_via_klines,
+        )
+
+    @property
+    def sources(self) -> List[Source]:
+        return [
+            self.premium,
+            self.oi_hist,
+            self.fut_ticker,
+            self.spot_ticker,
+            self.depth,
+            self.funding_interval,
+            self.spot_klines,
+        ]
+
+    async def refresh(
+        self,
+        symbols: List[str],
+        spot_symbols: Optional[List[str]] = None,
+        depth_symbols: Optional[List[str]] = None,
+    ) -> None:
+        """Refresh every due source concurrently; the klines fallback is refreshed separately.
+
+        `spot_symbols` limits the spot ticker to symbols not known to lack a spot market and
+        `depth_symbols` limits REST depth to symbols without a streamed order book.
+        """
+        for src in self.sources:
+            src.retain(symbols)
+        now = time.time()
+        await asyncio.gather(
+            self.premium.refresh(symbols, now),
+            self.oi_hist.refresh(symbols, now),
+            self.fut_ticker.refresh(symbols, now),
+            self.spot_ticker.refresh(symbols if spot_symbols is None else spot_symbols, now),
+            self.depth.refresh(symbols if depth_symbols is None else depth_symbols, now),
+            self.funding_interval.refresh(symbols, now),
+        )
+
+    async def refresh_slow(
+        self,
+        symbols: List[str],
+        depth_symbols: Optional[List[str]] = None,
+        klines_symbols: Iterable[str] = (),
+    ) -> None:
+        """Refresh only the REST-only inputs streaming mode still needs.
+
+        OI history and funding interval for every symbol, depth for `depth_symbols` (those
+        without a synced streamed book) and the spot klines volume fallback for `klines_symbols`.
+        """
+        for src in self.sources:
+            src.retain(symbols)
+        now = time.time()
+        await asyncio.gather(
+            self.oi_hist.refresh(symbols, now),
+            self.funding_interval.refresh(symbols, now),
+            self.depth.refresh(symbols if depth_symbols is None else depth_symbols, now),
+            self.spot_klines.refresh(klines_symbols, now),
+        )
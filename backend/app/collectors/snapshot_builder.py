@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..analytics.depth import DepthArrays, depth_metrics
+from ..analytics.metrics import (
+    calc_basis_pct,
+    calc_dominance_pct,
+)
+from ..analytics.srs import compute_srs
+from ..analytics.windows import SymbolWindows
+
+
+# Fields the watchlist tiles show; depth bands, slippage and borrow stay on the full snapshot
+TILE_FIELDS = (
+    "symbol",
+    "ts",
+    "mark",
+    "index",
+    "basis_pct",
+    "basis_twap15_pct",
+    "funding_1h_pct",
+    "funding_daily_est_pct",
+    "funding_interval_hours",
+    "next_funding_in_sec",
+    "oi_usdt",
+    "delta_oi_1h_usdt",
+    "perp_dominance_pct",
+    "dominance_unknown",
+    "fut_vol24_usdt",
+    "spot_vol24_usdt",
+    "orderbook_imbalance",
+    "has_spot",
+    "srs",
+    "traffic_light",
+    "rule_reasons",
+)
+
+
+def tile_from_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: snapshot.get(k) for k in TILE_FIELDS}
+
+
+def premium_from_mark_price(event: Dict[str, Any]) -> Dict[str, Any]:
+    """premiumIndex-shaped dict from a `<symbol>@markPrice@1s` stream event."""
+    return {
+        "symbol": event.get("s"),
+        "markPrice": event.get("p"),
+        "indexPrice": event.get("i"),
+        "lastFundingRate": event.get("r"),
+        "nextFundingTime": event.get("T"),
+        "time": event.get("E"),
+    }
+
+
+def funding_fields(premium: Dict[str, Any], funding_interval_hours: int, now_ms: int) -> Tuple[float, int]:
+    """Return (funding_1h_pct, next_funding_in_sec) from a premiumIndex payload."""
+    funding_interval_pct = float(premium.get("lastFundingRate") or 0.0) * 100.0
+    funding_1h_pct = funding_interval_pct / max(1, funding_interval_hours)
+    next_funding_in_sec = max(0, int((int(premium.get("nextFundingTime") or 0) - now_ms) / 1000))
+    return funding_1h_pct, next_funding_in_sec
+
+
+def oi_fields(oi_hist: List[Dict[str, Any]]) -> Tuple[float, float]:
+    """Return (oi_usdt_now, delta_oi_1h_usdt) from 13 rows of 5m openInterestHist."""
+    oi_usdt_now = float(oi_hist[-1]["sumOpenInterestValue"]) if oi_hist else 0.0
+    oi_usdt_then = float(oi_hist[0]["sumOpenInterestValue"]) if len(oi_hist) >= 1 else 0.0
+    return oi_usdt_now, oi_usdt_now - oi_usdt_then
+
+
+def dominance_fields(fut_vol24: float, spot_vol24: float, has_spot: bool, spot_data_ok: bool) -> Tuple[float, bool]:
+    """Return (perp_dominance_pct, dominance_unknown)."""
+    # If spot is unavailable but perp exists, dominance should be 100 only when fut_vol24>0.
+    # Also mark dominance unknown when both sides are zero to avoid a misleading 100.
+    if (has_spot and not spot_data_ok) or (fut_vol24 <= 0 and spot_vol24 <= 0):
+        return 0.0, True
+    return calc_dominance_pct(fut_vol24, spot_vol24), False
+
+
+def build_snapshot(
+    symbol: str,
+    now_ms: int,
+    *,
+    mark: float,
+    index: float,
+    basis_twap15_pct: float,
+    funding_1h_pct: float,
+    funding_interval_hours: Optional[int],
+    next_funding_in_sec: int,
+    oi_usdt: float,
+    delta_oi_1h_usdt: float,
+    fut_vol24: float,
+    spot_vol24: float,
+    spot_data_ok: bool,
+    has_spot: bool,
+    orderbook_imbalance: float,
+    depth_bands: Optional[List[Dict[str, Any]]] = None,
+    slippage: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Assemble the snapshot dict (without srs / traffic light) from already-fetched inputs."""
+    perp_dominance_pct, dominance_unknown = dominance_fields(fut_vol24, spot_vol24, has_spot, spot_data_ok)
+    return {
+        "symbol": symbol,
+        "ts": now_ms,
+        "mark": mark,
+        "index": index,
+        "basis_pct": calc_basis_pct(mark, index),
+        "basis_twap15_pct": basis_twap15_pct,
+        "funding_1h_pct": funding_1h_pct,
+        "funding_interval_hours": funding_interval_hours,
+        "funding_daily_est_pct": funding_1h_pct * 24,
+        "oi_usdt": oi_usdt,
+        "delta_oi_1h_usdt": delta_oi_1h_usdt,
+        "perp_dominance_pct": perp_dominance_pct,
+        "orderbook_imbalance": orderbook_imbalance,
+        "depth_bands": depth_bands,
+        "slippage": slippage,
+        "borrow": {"shortable": has_spot, "venues": []},
+        "fut_vol24_usdt": fut_vol24,
+        "spot_vol24_usdt": spot_vol24,
+        "next_funding_in_sec": next_funding_in_sec,
+        "has_spot": has_spot,
+        "dominance_unknown": dominance_unknown,
+    }
+
+
+def snapshot_from_inputs(
+    symbol: str,
+    now_ms: int,
+    windows: SymbolWindows,
+    *,
+    premium: Dict[str, Any],
+    funding_interval_hours: int,
+    oi_hist: List[Dict[str, Any]],
+    depth: DepthArrays,
+    fut_vol24: float,
+    spot_vol24: float,
+    spot_data_ok: bool,
+    has_spot: bool,
+    depth_bands_pct: Sequence[float],
+    slippage_sizes_usdt: Sequence[float],
+    orderbook_imbalance: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Snapshot with SRS (but without rules) from cached inputs; feeds the symbol's windows.
+
+    Shared by the REST and streaming collectors so both produce identical snapshots.
+    `orderbook_imbalance` overrides the headline value from `depth` when a local book
+    already tracks it incrementally (`OrderBook.imbalance()`).
+    """
+    mark = float(premium.get("markPrice") or 0.0)
+    index = float(premium.get("indexPrice") or 0.0)
+    # Windows take at most one sample per resolution bucket; others are only previewed
+    sample = windows.sample_due(now_ms)
+    # TWAP15 from the in-memory window, including this sample
+    basis_now = calc_basis_pct(mark, index)
+    if sample:
+        windows.basis.push(now_ms, basis_now)
+        basis_twap15 = windows.basis.mean()
+    else:
+        basis_twap15 = windows.basis.mean_with(basis_now)
+    funding_1h_pct, next_funding_in_sec = funding_fields(premium, funding_interval_hours, now_ms)
+    oi_usdt_now, delta_oi_1h_usdt = oi_fields(oi_hist)
+    depth_stats = depth_metrics(depth, mark, depth_bands_pct, slippage_sizes_usdt)
+    snapshot = build_snapshot(
+        symbol,
+        now_ms,
+        mark=mark,
+        index=index,
+        basis_twap15_pct=basis_twap15 if basis_twap15 is not None else 0.0,
+        funding_1h_pct=funding_1h_pct,
+        funding_interval_hours=funding_interval_hours,
+        next_funding_in_sec=next_funding_in_sec,
+        oi_usdt=oi_usdt_now,
+        delta_oi_1h_usdt=delta_oi_1h_usdt,
+        fut_vol24=fut_vol24,
+        spot_vol24=spot_vol24,
+        spot_data_ok=spot_data_ok,
+        has_spot=has_spot,
+        orderbook_imbalance=(
+            orderbook_imbalance if orderbook_imbalance is not None else depth_stats["orderbook_imbalance"]
+        ),
+        depth_bands=depth_stats["depth_bands"],
+        slippage=depth_stats["slippage"],
+    )
+    if sample:
+        windows.mark.push(now_ms, mark)
+        windows.funding.push(now_ms, funding_1h_pct)
+    windows.evict(now_ms)
+    snapshot["srs"] = compute_srs(snapshot)
+    return snapshot
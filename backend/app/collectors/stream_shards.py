@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import websockets
+
+logger = logging.getLogger("srr.stream_shards")
+
+FUTURES_WS_URL = "wss://fstream.binance.com/stream"
+SPOT_WS_URL = "wss://stream.binance.com:9443/stream"
+# Binance caps streams per connection (futures 200, spot 1024) and inbound control messages
+FUTURES_MAX_STREAMS = 200
+SPOT_MAX_STREAMS = 1024
+PARAMS_PER_MESSAGE = 100
+CONTROL_MESSAGE_INTERVAL_SEC = 0.25
+
+OnMessage = Callable[[Dict[str, Any]], Any]
+OnConnect = Callable[[List[str]], None]
+
+
+class _Shard:
+    """One combined-stream connection and the streams subscribed on it."""
+
+    def __init__(self, owner: "StreamShards", index: int) -> None:
+        self.owner = owner
+        self.index = index
+        self.streams: Set[str] = set()
+        self.ws: Optional[Any] = None
+        self.connects = 0
+        self._send_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def _control(self, method: str, streams: Iterable[str]) -> None:
+        params = sorted(streams)
+        async with self._send_lock:
+            ws = self.ws
+            if ws is None:
+                return  # (re)connect subscribes the current set
+            for i in range(0, len(params), PARAMS_PER_MESSAGE):
+                chunk = params[i : i + PARAMS_PER_MESSAGE]
+                await ws.send(json.dumps({"method": method, "params": chunk, "id": next(self.owner.ids)}))
+                await asyncio.sleep(CONTROL_MESSAGE_INTERVAL_SEC)
+
+    async def subscribe(self, streams: Set[str]) -> None:
+        self.streams |= streams
+        await self._control("SUBSCRIBE", streams)
+
+    async def unsubscribe(self, streams: Set[str]) -> None:
+        self.streams -= streams
+        await self._control("UNSUBSCRIBE", streams)
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        async for ws in websockets.connect(self.owner.url, ping_interval=20, ping_timeout=20, max_size=None):
+            try:
+                async with self._send_lock:
+                    self.ws = ws
+                    self.connects += 1
+                self.owner.on_connect(sorted(self.streams))
+                await self._control("SUBSCRIBE", self.streams)
+                async for msg in ws:
+                    data = json.loads(msg)
+                    payload = data.get("data")
+                    if payload is None:
+                        if data.get("error"):
+                            logger.warning("%s shard %d control error: %s", self.owner.name, self.index, data)
+                        continue
+                    res = self.owner.on_message(payload)
+                    if asyncio.iscoroutine(res):
+                        await res
+            except websockets.ConnectionClosed:
+                continue
+            except Exception as e:
+                logger.warning("%s shard %d failed: %s", self.owner.name, self.index, e)
+                await asyncio.sleep(2)
+                continue
+            finally:
+                self.ws = None
+
+
+class StreamShards:
+    """Combined-stream WebSocket connections with live SUBSCRIBE / UNSUBSCRIBE.
+
+    Streams are packed into connections of at most `max_streams`. `set_streams()` diffs
+    the wanted set against what is subscribed and only sends SUBSCRIBE / UNSUBSCRIBE
+    frames to the affected connections, so every other stream keeps flowing. Sockets
+    stay open indefinitely; when Binance drops one (at the latest after 24h) it
+    reconnects and resubscribes its streams, calling `on_connect` with them first.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        on_message: OnMessage,
+        max_streams: int,
+        on_connect: Optional[OnConnect] = None,
+        name: str = "stream",
+    ) -> None:
+        self.url = url
+        self.on_message = on_message
+        self.on_connect: OnConnect = on_connect or (lambda streams: None)
+        self.max_streams = max_streams
+        self.name = name
+        self.ids = itertools.count(1)
+        self._shards: List[_Shard] = []
+        self._owner: Dict[str, _Shard] = {}
+
+    @property
+    def streams(self) -> Set[str]:
+        return set(self._owner)
+
+    async def set_streams(self, streams: Iterable[str]) -> None:
+        wanted = set(streams)
+        removed = set(self._owner) - wanted
+        added = sorted(wanted - set(self._owner))
+
+        by_shard: Dict[int, Set[str]] = {}
+        for stream in removed:
+            by_shard.setdefault(id(self._owner.pop(stream)), set()).add(stream)
+        for shard in list(self._shards):
+            gone = by_shard.get(id(shard))
+            if gone:
+                await shard.unsubscribe(gone)
+            if not shard.streams:
+                self._shards.remove(shard)
+                await shard.stop()
+
+        # Fill existing connections first, then open new ones
+        for shard in self._shards + [None] * len(added):  # type: ignore[operator]
+            if not added:
+                break
+            if shard is None:
+                shard = _Shard(self, len(self._shards))
+                self._shards.append(shard)
+            room = self.max_streams - len(shard.streams)
+            if room <= 0:
+                continue
+            batch, added = set(added[:room]), added[room:]
+            for stream in batch:
+                self._owner[stream] = shard
+            await shard.subscribe(batch)
+
+    async def stop(self) -> None:
+        shards, self._shards = self._shards, []
+        self._owner.clear()
+        await asyncio.gather(*(s.stop() for s in shards), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._shards),
+            "streams": len(self._owner),
+            "shards": [
+                {"streams": len(s.streams), "connected": s.ws is not None, "connects": s.connects}
+                for s in self._shards
+            ],
+        }
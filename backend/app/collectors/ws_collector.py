@@ -1,139 +1,253 @@
 from __future__ import annotations
 
 import asyncio
-import json
-from typing import List, Dict, Any
-
-import websockets
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 from ..config import get_settings
+from ..services.alerts import get_alert_dispatcher
+from ..services.binance_client import BinanceClient, get_binance_client
+from ..services.instrumentation import COLLECTOR_STAGE_SECONDS, COLLECTOR_TICK_SECONDS
 from ..services.redis_store import (
     ensure_default_watchlist,
     get_watchlist,
-    put_snapshot,
-    push_timeseries_point,
+    get_cached_has_spot_many,
+    set_cached_has_spot,
+    watchlist_events,
+    write_tick,
 )
-from ..analytics.metrics import calc_dominance_pct
+from ..services.timescale import offer_history
+from ..analytics.depth import depth_arrays
+from ..analytics.rules import evaluate_batch
+from ..analytics.srs import srs_normalizer_from_settings
+from ..analytics.windows import WindowStore
+from .binance_collector import DEPTH_LIMIT, get_funding_interval_hours
+from .coalescer import Point, WriteCoalescer
+from .depth_stream import OrderBookManager
+from .scheduler import CollectorScheduler
+from .snapshot_builder import premium_from_mark_price, snapshot_from_inputs
+from .stream_shards import FUTURES_MAX_STREAMS, FUTURES_WS_URL, SPOT_MAX_STREAMS, SPOT_WS_URL, StreamShards
 
 settings = get_settings()
+logger = logging.getLogger("srr.ws_collector")
 
 
-async def _fapi_stream(symbols: List[str], state: Dict[str, Dict[str, float]]):
-    # Aggregate streams: !markPrice@arr for mark/index/funding; ticker for volumes
-    streams = []
-    for s in symbols:
-        s_lower = s.lower()
-        streams.append(f"{s_lower}@ticker")
-    url = "wss://fstream.binance.com/stream?streams=" + "/".join(streams)
-    async for ws in websockets.connect(url, ping_interval=20, ping_timeout=20):
-        try:
-            async for msg in ws:
-                data = json.loads(msg)
-                payload = data.get("data") or {}
-                sym = str(payload.get("s") or "").upper()
-                if not sym:
-                    continue
-                # Ticker payload fields
-                mark = float(payload.get("c") or 0.0)  # last price as proxy
-                # Futures doesn't provide index in this stream; leave index=mark for UI continuity
-                index = mark
-                fut_vol24 = float(payload.get("q") or 0.0)  # quoteVolume
-
-                s = state.setdefault(sym, {"fut_vol24": 0.0, "spot_vol24": 0.0, "mark": 0.0})
-                s["fut_vol24"] = fut_vol24
-                s["mark"] = mark
-
-                ts = int(payload.get("E") or 0)
-                spot_vol = s.get("spot_vol24", 0.0)
-                dom_unknown = fut_vol24 <= 0 and spot_vol <= 0
-                dom = 0.0 if dom_unknown else calc_dominance_pct(fut_vol24, spot_vol)
-                snap = {
-                    "symbol": sym,
-                    "ts": ts,
-                    "mark": mark,
-                    "index": index,
-                    "basis_pct": 0.0,
-                    "basis_twap15_pct": 0.0,
-                    "funding_1h_pct": 0.0,
-                    "funding_interval_hours": None,
-                    "funding_daily_est_pct": 0.0,
-                    "oi_usdt": 0.0,
-                    "delta_oi_1h_usdt": 0.0,
-                    "perp_dominance_pct": dom,
-                    "orderbook_imbalance": 0.0,
-                    "borrow": {"shortable": s.get("spot_vol24", 0.0) > 0, "venues": []},
-                    "fut_vol24_usdt": fut_vol24,
-                    "spot_vol24_usdt": spot_vol,
-                    "next_funding_in_sec": 0,
-                    "has_spot": s.get("spot_vol24", 0.0) > 0,
-                    "dominance_unknown": dom_unknown,
-                }
-                await put_snapshot(sym, snap)
-                await push_timeseries_point(sym, "mark", ts, mark)
-        except Exception:
-            await asyncio.sleep(2)
-            continue
-
-
-async def _spot_stream(symbols: List[str], state: Dict[str, Dict[str, float]]):
-    streams = []
-    for s in symbols:
-        streams.append(f"{s.lower()}@ticker")
-    url = "wss://stream.binance.com:9443/stream?streams=" + "/".join(streams)
-    async for ws in websockets.connect(url, ping_interval=20, ping_timeout=20):
-        try:
-            async for msg in ws:
-                data = json.loads(msg)
-                payload = data.get("data") or {}
-                sym = str(payload.get("s") or "").upper()
-                if not sym:
-                    continue
-                spot_vol24 = float(payload.get("Q") or 0.0)  # quoteVolume on spot
-                s = state.setdefault(sym, {"fut_vol24": 0.0, "spot_vol24": 0.0, "mark": 0.0})
-                s["spot_vol24"] = spot_vol24
-                # Let futures stream drive mark, just update dominance here by writing snapshot quickly using last mark
-                mark = s.get("mark", 0.0)
-                fut = s.get("fut_vol24", 0.0)
-                dom_unknown = fut <= 0 and spot_vol24 <= 0
-                dom = 0.0 if dom_unknown else calc_dominance_pct(fut, spot_vol24)
-                ts = int(payload.get("E") or 0)
-                snap = {
-                    "symbol": sym,
-                    "ts": ts,
-                    "mark": mark,
-                    "index": mark,
-                    "basis_pct": 0.0,
-                    "basis_twap15_pct": 0.0,
-                    "funding_1h_pct": 0.0,
-                    "funding_interval_hours": None,
-                    "funding_daily_est_pct": 0.0,
-                    "oi_usdt": 0.0,
-                    "delta_oi_1h_usdt": 0.0,
-                    "perp_dominance_pct": dom,
-                    "orderbook_imbalance": 0.0,
-                    "borrow": {"shortable": spot_vol24 > 0, "venues": []},
-                    "fut_vol24_usdt": fut,
-                    "spot_vol24_usdt": spot_vol24,
-                    "next_funding_in_sec": 0,
-                    "has_spot": spot_vol24 > 0,
-                    "dominance_unknown": dom_unknown,
-                }
-                await put_snapshot(sym, snap)
-        except Exception:
-            await asyncio.sleep(2)
-            continue
+async def write_tick_with_history(
+    snapshots: Dict[str, Dict[str, Any]], points: Iterable[Point], tiles: Optional[Dict[str, Dict[str, Any]]]
+) -> None:
+    """Coalescer writer: Redis first, then the TimescaleDB buffer once the batch is accepted."""
+    points = list(points)
+    await write_tick(snapshots, points, tiles)
+    offer_history(snapshots, points)
 
 
-async def run_ws_collector(stop_event: asyncio.Event) -> None:
-    await ensure_default_watchlist()
-    state: Dict[str, Dict[str, float]] = {}
-    while not stop_event.is_set():
-        watch = await get_watchlist()
+class StreamingCollector:
+    """Full snapshots from Binance streams, published on every `@markPrice@1s` event.
+
+    Mark, index and funding come from `<symbol>@markPrice@1s`, 24h volumes from the
+    futures and spot `<symbol>@ticker` streams and depth from local order books
+    (`OrderBookManager`). Only REST-only inputs (OI history, funding interval, the spot
+    klines volume fallback, and depth for symbols whose book is not in sync yet) are
+    refreshed in the background through `CollectorScheduler.refresh_slow`.
+
+    Snapshots go through a `WriteCoalescer`, so Redis sees one pipelined batch per
+    flush interval however many events arrive.
+
+    Streams are sharded over long-lived connections (`StreamShards`) and subscribed or
+    unsubscribed live. The watchlist is reloaded only when a Redis watchlist event
+    arrives, so sockets are never torn down to pick up changes.
+    """
+
+    def __init__(self, client: BinanceClient) -> None:
+        self.client = client
+        # One window sample per REST collect interval, not per markPrice event
+        self.windows = WindowStore(resolution_ms=settings.collect_interval_sec * 1000)
+        self.srs = srs_normalizer_from_settings()
+
+        async def funding_interval(sym: str) -> int:
+            return await get_funding_interval_hours(client, sym)
+
+        self.scheduler = CollectorScheduler(client, funding_interval, depth_limit=DEPTH_LIMIT)
+        self.books = OrderBookManager(client)
+        self.premium: Dict[str, Dict[str, Any]] = {}
+        self.fut_vol24: Dict[str, float] = {}
+        self.spot_vol24: Dict[str, float] = {}
+        self.has_spot: Dict[str, Optional[bool]] = {}
+        self.futures_streams = StreamShards(FUTURES_WS_URL, self.on_futures_event, FUTURES_MAX_STREAMS, name="futures")
+        self.spot_streams = StreamShards(SPOT_WS_URL, self.on_spot_event, SPOT_MAX_STREAMS, name="spot")
+        self._symbols: Set[str] = set()
+        self._watchlist: Optional[List[str]] = None
+        self._watchlist_changed = asyncio.Event()
+        self.coalescer = WriteCoalescer(
+            settings.ws_flush_interval_ms, settings.ws_timeseries_resolution_sec * 1000, writer=write_tick_with_history
+        )
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        flusher = asyncio.create_task(self.coalescer.run(stop_event))
+        listener = asyncio.create_task(self._listen_watchlist(stop_event))
         try:
-            await asyncio.wait_for(
-                asyncio.gather(_fapi_stream(watch, state), _spot_stream(watch, state)),
-                timeout=60,
+            await self._maintain(stop_event)
+        finally:
+            listener.cancel()
+            await asyncio.gather(flusher, listener, return_exceptions=True)
+
+    async def _listen_watchlist(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                async for event in watchlist_events():
+                    logger.debug("watchlist event: %s", event)
+                    self._watchlist_changed.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("watchlist subscription failed: %s", e)
+                await asyncio.sleep(2)
+
+    async def _maintain(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("streaming collector refresh failed: %s", e)
+            COLLECTOR_TICK_SECONDS.observe(time.perf_counter() - started, mode="ws")
+            # Wake early for watchlist changes so new symbols start streaming immediately
+            waiters = [asyncio.create_task(stop_event.wait()), asyncio.create_task(self._watchlist_changed.wait())]
+            _, pending = await asyncio.wait(
+                waiters, timeout=settings.collect_interval_sec, return_when=asyncio.FIRST_COMPLETED
             )
-        except asyncio.TimeoutError:
-            continue
+            for task in pending:
+                task.cancel()
 
+    async def stop(self) -> None:
+        await asyncio.gather(self.futures_streams.stop(), self.spot_streams.stop(), self.books.stop())
+
+    async def watchlist(self) -> List[str]:
+        """The cached watchlist, reloaded from Redis only after a change notification."""
+        if self._watchlist is None or self._watchlist_changed.is_set():
+            self._watchlist_changed.clear()
+            self._watchlist = await get_watchlist()
+        return self._watchlist
+
+    async def refresh(self) -> None:
+        """Track the watchlist, resolve spot availability and refresh the slow REST inputs."""
+        with COLLECTOR_STAGE_SECONDS.time(stage="fetch"):
+            watchlist = await self.watchlist()
+            self._symbols = set(watchlist)
+            await self.windows.sync(watchlist)
+            if self.srs is not None:
+                await self.srs.sync(watchlist)
+            await self._resolve_has_spot(watchlist)
+            await self.books.ensure(watchlist)
+            synced = self.books.synced_symbols()
+            await self.scheduler.refresh_slow(
+                watchlist,
+                depth_symbols=[s for s in watchlist if s not in synced],
+                klines_symbols=[s for s in watchlist if self.has_spot.get(s) and not self.spot_vol24.get(s)],
+            )
+        for sym in list(self.premium):
+            if sym not in watchlist:
+                self.premium.pop(sym, None)
+                self.fut_vol24.pop(sym, None)
+                self.spot_vol24.pop(sym, None)
+                self.coalescer.forget(sym)
+        await self.futures_streams.set_streams(
+            stream for s in watchlist for stream in (f"{s.lower()}@markPrice@1s", f"{s.lower()}@ticker")
+        )
+        await self.spot_streams.set_streams(
+            f"{s.lower()}@ticker" for s in watchlist if self.has_spot.get(s) is not False
+        )
+
+    async def _resolve_has_spot(self, watchlist: List[str]) -> None:
+        cached = await get_cached_has_spot_many(watchlist)
+        unknown = []
+        for sym in watchlist:
+            has_spot = cached.get(sym)
+            if has_spot is None and sym in self.spot_vol24:
+                has_spot = True
+                await set_cached_has_spot(sym, True)
+            if has_spot is None:
+                unknown.append(sym)
+            self.has_spot[sym] = has_spot
+        probes = await asyncio.gather(*(self.client.spot_symbol_exists(s) for s in unknown), return_exceptions=True)
+        for sym, res in zip(unknown, probes):
+            if isinstance(res, Exception):
+                logger.warning("spot existence probe failed for %s: %s", sym, res)
+                continue
+            self.has_spot[sym] = bool(res)
+            await set_cached_has_spot(sym, bool(res))
+
+    def on_futures_event(self, payload: Dict[str, Any]) -> None:
+        sym = str(payload.get("s") or "").upper()
+        if sym not in self._symbols:
+            return  # in flight between removal and the UNSUBSCRIBE ack
+        event = payload.get("e")
+        if event == "markPriceUpdate":
+            self.on_mark_price(sym, payload)
+        elif event == "24hrTicker":
+            self.fut_vol24[sym] = float(payload.get("q") or 0.0)
+
+    def on_spot_event(self, payload: Dict[str, Any]) -> None:
+        sym = str(payload.get("s") or "").upper()
+        if sym in self._symbols:
+            # "q" is the 24h quote volume ("Q" is the last trade quantity)
+            self.spot_vol24[sym] = float(payload.get("q") or 0.0)
+
+    def on_mark_price(self, sym: str, event: Dict[str, Any]) -> None:
+        self.premium[sym] = premium_from_mark_price(event)
+        snapshot = self.build(sym, int(event.get("E") or time.time() * 1000))
+        if snapshot is None:
+            return
+        if self.srs is not None:
+            with COLLECTOR_STAGE_SECONDS.time(stage="srs"):
+                snapshot["srs"] = self.srs.score({sym: snapshot})[sym]
+        with COLLECTOR_STAGE_SECONDS.time(stage="rules"):
+            traffic, reasons = evaluate_batch({sym: snapshot}, self.windows)[sym]
+        snapshot["traffic_light"] = traffic
+        snapshot["rule_reasons"] = reasons
+        get_alert_dispatcher().observe({sym: snapshot})
+        self.coalescer.update(sym, snapshot)
+
+    def build(self, sym: str, now_ms: int) -> Optional[Dict[str, Any]]:
+        """Snapshot (with SRS, without rules) from the latest streamed and cached inputs, or None."""
+        premium = self.premium.get(sym)
+        oi_hist = self.scheduler.oi_hist.get(sym)
+        funding_interval_hours = self.scheduler.funding_interval.get(sym)
+        book = self.books.book(sym)
+        depth = self.scheduler.depth.get(sym)
+        if premium is None or oi_hist is None or funding_interval_hours is None or (book is None and depth is None):
+            return None
+        has_spot = bool(self.has_spot.get(sym))
+        spot_vol24 = self.spot_vol24.get(sym)
+        spot_data_ok = spot_vol24 is not None
+        if has_spot and not spot_vol24:
+            klines_vol = self.scheduler.spot_klines.get(sym)
+            if klines_vol is not None:
+                spot_vol24, spot_data_ok = float(klines_vol), True
+        with COLLECTOR_STAGE_SECONDS.time(stage="compute"):
+            return snapshot_from_inputs(
+                sym,
+                now_ms,
+                self.windows[sym],
+                premium=premium,
+                funding_interval_hours=funding_interval_hours,
+                oi_hist=oi_hist,
+                depth=book.to_arrays(max_levels=DEPTH_LIMIT) if book is not None else depth_arrays(depth),
+                fut_vol24=self.fut_vol24.get(sym, 0.0),
+                spot_vol24=spot_vol24 or 0.0,
+                spot_data_ok=spot_data_ok,
+                has_spot=has_spot,
+                depth_bands_pct=settings.depth_bands_pct,
+                slippage_sizes_usdt=settings.slippage_sizes_usdt,
+                orderbook_imbalance=book.imbalance() if book is not None else None,
+            )
+
+
+async def run_ws_collector(stop_event: asyncio.Event) -> None:
+    await ensure_default_watchlist()
+    collector = StreamingCollector(get_binance_client())
+    try:
+        await collector.run(stop_event)
+    finally:
+        await collector.stop()
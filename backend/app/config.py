@@ -22,14 +22,69 @@ class Settings:
         self.binance_spot_base_url: str = os.getenv("BINANCE_SPOT_BASE_URL", "https://api.binance.com")
         self.binance_api_key: str = os.getenv("BINANCE_API_KEY", "")
         self.binance_api_secret: str = os.getenv("BINANCE_API_SECRET", "")
+        # Request-weight budgets (per IP, per minute) and outbound concurrency
+        self.binance_fapi_weight_per_min: int = int(os.getenv("BINANCE_FAPI_WEIGHT_PER_MIN", "2400"))
+        self.binance_spot_weight_per_min: int = int(os.getenv("BINANCE_SPOT_WEIGHT_PER_MIN", "6000"))
+        self.binance_weight_headroom: float = float(os.getenv("BINANCE_WEIGHT_HEADROOM", "0.8"))
+        self.binance_max_in_flight: int = int(os.getenv("BINANCE_MAX_IN_FLIGHT", "16"))
 
         # Sampling intervals
         self.collect_interval_sec: int = int(os.getenv("COLLECT_INTERVAL_SEC", "10"))
         self.oi_refresh_sec: int = int(os.getenv("OI_REFRESH_SEC", "300"))
         self.funding_refresh_sec: int = int(os.getenv("FUNDING_REFRESH_SEC", "3600"))
+        self.ticker_refresh_sec: int = int(os.getenv("TICKER_REFRESH_SEC", "60"))
+        self.depth_refresh_sec: int = int(os.getenv("DEPTH_REFRESH_SEC", "30"))
+        self.spot_klines_refresh_sec: int = int(os.getenv("SPOT_KLINES_REFRESH_SEC", "900"))
+
+        # Depth analytics: bands (± % of mid) and order sizes (USDT) for slippage estimates
+        self.depth_bands_pct: list[float] = [
+            float(x) for x in os.getenv("DEPTH_BANDS_PCT", "0.25,0.5,1,2,5").split(",") if x.strip()
+        ]
+        self.slippage_sizes_usdt: list[float] = [
+            float(x) for x in os.getenv("SLIPPAGE_SIZES_USDT", "10000,100000,1000000").split(",") if x.strip()
+        ]
+
+        # Timeseries retention (raw points, then 1m/5m/1h rollups)
+        self.ts_raw_retention_sec: int = int(os.getenv("TS_RAW_RETENTION_SEC", str(6 * 3600)))
+        self.ts_1m_retention_sec: int = int(os.getenv("TS_1M_RETENTION_SEC", str(7 * 86400)))
+        self.ts_5m_retention_sec: int = int(os.getenv("TS_5M_RETENTION_SEC", str(30 * 86400)))
+        self.ts_1h_retention_sec: int = int(os.getenv("TS_1H_RETENTION_SEC", str(365 * 86400)))
+        self.ts_raw_chunk_sec: int = int(os.getenv("TS_RAW_CHUNK_SEC", "3600"))
+        self.ts_compact_interval_sec: int = int(os.getenv("TS_COMPACT_INTERVAL_SEC", "60"))
+
+        # SRS: z-scored against per-symbol rolling statistics (lookbacks in component order
+        # funding,basis,dominance,delta_oi,depth; a single value applies to all of them)
+        self.srs_zscore: bool = os.getenv("SRS_ZSCORE", "true").lower() in ("1", "true", "yes")
+        self.srs_lookbacks_sec: list[float] = [
+            float(x) for x in os.getenv("SRS_LOOKBACK_SEC", "86400").split(",") if x.strip()
+        ]
+        self.srs_min_samples: int = int(os.getenv("SRS_MIN_SAMPLES", "30"))
+        self.srs_z_cap: float = float(os.getenv("SRS_Z_CAP", "3.0"))
+
+        # Alert channels used until a configuration is stored through POST /alerts
+        self.alert_webhook_url: str = os.getenv("ALERT_WEBHOOK_URL", "")
+        self.telegram_bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
+        self.telegram_chat_id: str = os.getenv("TELEGRAM_CHAT_ID", "")
+
+        # TimescaleDB history sink: batched COPY of points and sampled snapshots; windows of
+        # at least TIMESCALE_QUERY_MIN_SEC on /timeseries are read from it instead of Redis
+        self.timescale_enabled: bool = os.getenv("TIMESCALE_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.timescale_flush_interval_sec: float = float(os.getenv("TIMESCALE_FLUSH_INTERVAL_SEC", "2"))
+        self.timescale_batch_rows: int = int(os.getenv("TIMESCALE_BATCH_ROWS", "20000"))
+        self.timescale_max_buffer_rows: int = int(os.getenv("TIMESCALE_MAX_BUFFER_ROWS", "200000"))
+        self.timescale_snapshot_interval_sec: float = float(os.getenv("TIMESCALE_SNAPSHOT_INTERVAL_SEC", "60"))
+        self.timescale_pool_size: int = int(os.getenv("TIMESCALE_POOL_SIZE", "4"))
+        self.timescale_query_min_sec: int = int(os.getenv("TIMESCALE_QUERY_MIN_SEC", str(86400)))
 
         # Feature flags
         self.use_ws: bool = os.getenv("USE_WS", "false").lower() in ("1", "true", "yes")
+        # WS mode: coalesced snapshot flush cadence and timeseries resolution
+        self.ws_flush_interval_ms: int = int(os.getenv("WS_FLUSH_INTERVAL_MS", "250"))
+        self.ws_timeseries_resolution_sec: int = int(
+            os.getenv("WS_TIMESERIES_RESOLUTION_SEC", os.getenv("COLLECT_INTERVAL_SEC", "10"))
+        )
+        # Maintain local order books from @depth diff streams instead of polling /fapi/v1/depth
+        self.use_depth_stream: bool = os.getenv("USE_DEPTH_STREAM", "false").lower() in ("1", "true", "yes")
 
 
 @lru_cache(maxsize=1)
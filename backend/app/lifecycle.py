@@ -4,27 +4,43 @@ from typing import Optional
 from .config import get_settings
 from .collectors.binance_collector import run_collector_loop
 from .collectors.ws_collector import run_ws_collector
+from .collectors.compactor import run_compactor_loop
+from .analytics.rule_engine import run_rules_watcher
+from .services.alerts import run_alert_dispatcher
+from .services.binance_client import close_binance_client
+from .services.timescale import run_history_writer
 
 _stop_event: Optional[asyncio.Event] = None
 _task: Optional[asyncio.Task] = None
+_compactor_task: Optional[asyncio.Task] = None
+_rules_task: Optional[asyncio.Task] = None
+_alerts_task: Optional[asyncio.Task] = None
+_history_task: Optional[asyncio.Task] = None
 
 
 async def on_startup():
-    global _stop_event, _task
+    global _stop_event, _task, _compactor_task, _rules_task, _alerts_task, _history_task
     _stop_event = asyncio.Event()
     settings = get_settings()
     if settings.use_ws:
         _task = asyncio.create_task(run_ws_collector(_stop_event))
     else:
         _task = asyncio.create_task(run_collector_loop(_stop_event))
+    _compactor_task = asyncio.create_task(run_compactor_loop(_stop_event))
+    _rules_task = asyncio.create_task(run_rules_watcher(_stop_event))
+    _alerts_task = asyncio.create_task(run_alert_dispatcher(_stop_event))
+    _history_task = asyncio.create_task(run_history_writer(_stop_event))
 
 
 async def on_shutdown():
-    global _stop_event, _task
+    global _stop_event, _task, _compactor_task, _rules_task, _alerts_task, _history_task
     if _stop_event is not None:
         _stop_event.set()
-    if _task is not None:
+    for task in (_task, _compactor_task, _rules_task, _alerts_task, _history_task):
+        if task is None:
+            continue
         try:
-            await asyncio.wait_for(_task, timeout=5)
+            await asyncio.wait_for(task, timeout=5)
         except asyncio.TimeoutError:
-            _task.cancel()
+            task.cancel()
+    await close_binance_client()
@@ -2,7 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import get_settings
-from .routers import health, symbols, metrics, timeseries, rules, alerts
+from .routers import health, symbols, instrumentation, metrics, timeseries, rules, alerts, stream
 from .lifecycle import on_startup, on_shutdown
 import os
 import logging
@@ -38,10 +38,13 @@ app.add_middleware(
 # Routers
 app.include_router(health.router)
 app.include_router(symbols.router)
+# Must precede the metrics router, whose /metrics/{symbol} would otherwise match "prometheus"
+app.include_router(instrumentation.router)
 app.include_router(metrics.router)
 app.include_router(timeseries.router)
 app.include_router(rules.router)
 app.include_router(alerts.router)
+app.include_router(stream.router)
 
 # Debug
 try:
@@ -20,6 +20,22 @@ class BorrowInfo(BaseModel):
     venues: List[BorrowVenue] = Field(default_factory=list)
 
 
+class DepthBand(BaseModel):
+    band_pct: float
+    bid_qty: float
+    ask_qty: float
+    bid_notional_usdt: float
+    ask_notional_usdt: float
+    imbalance: float
+
+
+class SlippageEstimate(BaseModel):
+    notional_usdt: float
+    # None when displayed depth cannot fill the order
+    buy_bps: Optional[float] = None
+    sell_bps: Optional[float] = None
+
+
 class Snapshot(BaseModel):
     symbol: str
     ts: int = Field(default_factory=lambda: int(time.time() * 1000))
@@ -45,6 +61,8 @@ class Snapshot(BaseModel):
     fut_vol24_usdt: Optional[float] = None
     spot_vol24_usdt: Optional[float] = None
     dominance_unknown: Optional[bool] = None
+    depth_bands: Optional[List[DepthBand]] = None
+    slippage: Optional[List[SlippageEstimate]] = None
 
 
 class TimeseriesPoint(BaseModel):
@@ -1,9 +1,38 @@
-from fastapi import APIRouter
+from typing import Any, Dict
+
+import orjson
+from fastapi import APIRouter, Body, HTTPException
+
+from ..services.alerts import AlertConfigError, get_alert_dispatcher, parse_alert_config, redact_alert_config
+from ..services.redis_store import put_alerts_raw
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
 
+@router.get("")
+async def get_alerts_config():
+    """The active alert configuration, bot tokens masked."""
+    dispatcher = get_alert_dispatcher()
+    pending = {name: sender.queue.qsize() for name, sender in dispatcher.channels.items()}
+    return {**redact_alert_config(dispatcher.config), "pending": pending}
+
+
 @router.post("")
-async def configure_alerts(payload: dict):
-    # Placeholder for configuring channels & thresholds
-    return {"ok": True, "config": payload}
+async def configure_alerts(payload: Dict[str, Any] = Body(...)):
+    """Validate, store and hot-reload channels and thresholds in every process."""
+    try:
+        config = parse_alert_config(payload)
+    except AlertConfigError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    raw = orjson.dumps(payload)
+    await put_alerts_raw(raw)
+    get_alert_dispatcher().load(raw)
+    return {"ok": True, "channels": [c["id"] for c in config["channels"]]}
+
+
+@router.delete("")
+async def reset_alerts():
+    """Drop the stored configuration and go back to the environment's channels."""
+    await put_alerts_raw(None)
+    get_alert_dispatcher().load(None)
+    return {"ok": True}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from ..config import get_settings
+from ..services.binance_client import get_binance_client, get_governor
 
 router = APIRouter(prefix="/debug", tags=["debug"])
 
@@ -24,3 +25,8 @@ async def capture_sentry_message():
 async def mode():
     s = get_settings()
     return {"use_ws": s.use_ws}
+
+
+@router.get("/binance")
+async def binance_budget():
+    return {"hosts": get_governor().stats(), **get_binance_client().stats()}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..services.instrumentation import render_prometheus
+
+router = APIRouter(prefix="/metrics", tags=["instrumentation"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from ..models import Snapshot
-from ..services.redis_store import get_snapshot
+from ..services.redis_store import get_snapshot, get_tiles_raw
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 
+@router.get("")
+async def get_tiles():
+    """Every watched symbol's tile as one document, `{"ts", "tiles": {symbol: tile}}`.
+
+    Served as the bytes the collector wrote: one Redis GET, no parsing or validation.
+    """
+    raw = await get_tiles_raw()
+    if not raw:
+        raise HTTPException(status_code=404, detail="No tiles yet")
+    return Response(content=raw, media_type="application/json")
+
+
 @router.get("/{symbol}", response_model=Snapshot)
 async def get_metrics(symbol: str):
     sym = symbol.upper()
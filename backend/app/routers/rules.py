@@ -1,10 +1,42 @@
-from fastapi import APIRouter
+from typing import Any, Dict
+
+import orjson
+from fastapi import APIRouter, Body, HTTPException
 from ..models import RulesExplanation
+from ..analytics.rule_engine import RuleSetError, compile_ruleset, get_rule_engine
 from ..analytics.rules import evaluate_rules
+from ..services.redis_store import put_rules_raw
 
 router = APIRouter(prefix="/rules", tags=["rules"])
 
 
+@router.get("")
+async def get_ruleset():
+    """The active rule set document (the built-in defaults unless one was stored)."""
+    return get_rule_engine().compiled.doc
+
+
+@router.put("")
+async def put_ruleset(doc: Dict[str, Any] = Body(...)):
+    """Validate, store and hot-reload a rule set in every process."""
+    try:
+        compiled = compile_ruleset(doc)
+    except RuleSetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    raw = orjson.dumps(doc)
+    await put_rules_raw(raw)
+    get_rule_engine().load(raw)
+    return {"ok": True, "rules": len(compiled.rules)}
+
+
+@router.delete("")
+async def reset_ruleset():
+    """Drop the stored rule set and go back to the built-in defaults."""
+    await put_rules_raw(None)
+    get_rule_engine().load(None)
+    return {"ok": True}
+
+
 @router.get("/{symbol}", response_model=RulesExplanation)
 async def get_rules(symbol: str):
     traffic, reasons = await evaluate_rules(symbol.upper())
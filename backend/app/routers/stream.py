@@ -0,0 +1,47 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+
+from ..services.redis_store import get_snapshots, get_watchlist
+from ..services.stream_hub import get_stream_hub, sse_frame
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+HEARTBEAT_SEC = 15.0
+
+
+@router.get("")
+async def stream_ticks(request: Request, symbols: Optional[str] = Query(None, description="Comma-separated; default: watchlist")):
+    """Server-sent events: `snapshot` (full, first), then `delta` and `points` per collector write."""
+    wanted = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else None
+    hub = get_stream_hub()
+    # Register before reading initial state so no tick falls between the two
+    sub = hub.subscribe(wanted)
+    initial = {s: hub.last(s) for s in (wanted or [])}
+
+    async def events():
+        try:
+            names = wanted if wanted is not None else await get_watchlist()
+            missing = [s for s in names if initial.get(s) is None]
+            stored = await get_snapshots(missing)
+            for sym in names:
+                snap = initial.get(sym) or stored.get(sym)
+                if snap is not None:
+                    yield sse_frame("snapshot", snap)
+            while not sub.overflowed:
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": ping\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
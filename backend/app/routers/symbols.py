@@ -12,7 +12,7 @@ from ..services.redis_store import (
     get_cached_has_spot,
     set_cached_has_spot,
 )
-from ..services.binance_client import BinanceClient
+from ..services.binance_client import get_binance_client
 
 router = APIRouter(prefix="/symbols", tags=["symbols"])
 
@@ -66,88 +66,88 @@ async def _fetch_available_symbols(
     verify: bool,
     include_spot: bool,
 ) -> Dict[str, Any]:
-    client = BinanceClient()
-    try:
-        info = await client.futures_exchange_info()
-        symbols = info.get("symbols", [])
-        out: List[Any] = []
-        spot_symbol_set: Set[str] = set()
-
-        if include_spot:
-            try:
-                spot_info = await client.spot_exchange_info()
-                spot_symbol_set = {
-                    str(s.get("symbol", "")).upper()
-                    for s in spot_info.get("symbols", [])
-                    if s.get("status") == "TRADING"
-                }
-            except Exception:
-                spot_symbol_set = set()
+    client = get_binance_client()
+    info = await client.futures_exchange_info()
+    symbols = info.get("symbols", [])
+    out: List[Any] = []
+    spot_symbol_set: Set[str] = set()
+
+    if include_spot:
+        try:
+            spot_info = await client.spot_exchange_info()
+            spot_symbol_set = {
+                str(s.get("symbol", "")).upper()
+                for s in spot_info.get("symbols", [])
+                if s.get("status") == "TRADING"
+            }
+        except Exception:
+            spot_symbol_set = set()
+
+    for s in symbols:
+        try:
+            if s.get("status") != "TRADING":
+                continue
+            if s.get("contractType") != contract_type:
+                continue
+            if s.get("quoteAsset") != quote:
+                continue
+            sym = str(s.get("symbol", "")).upper()
+            if not sym:
+                continue
 
-        for s in symbols:
-            try:
-                if s.get("status") != "TRADING":
-                    continue
-                if s.get("contractType") != contract_type:
-                    continue
-                if s.get("quoteAsset") != quote:
-                    continue
-                sym = str(s.get("symbol", "")).upper()
-                if not sym:
-                    continue
-
-                if include_spot:
-                    cached_spot = await get_cached_has_spot(sym)
-                    if cached_spot is not None:
-                        has_spot = bool(cached_spot)
-                    elif spot_symbol_set:
-                        has_spot = sym in spot_symbol_set
-                        await set_cached_has_spot(sym, has_spot)
-                    else:
-                        try:
-                            has_spot = await client.spot_symbol_exists(sym)
-                        except Exception:
-                            has_spot = False
-                        else:
-                            await set_cached_has_spot(sym, has_spot)
-                    out.append({"symbol": sym, "has_spot": has_spot})
+            if include_spot:
+                cached_spot = await get_cached_has_spot(sym)
+                if cached_spot is not None:
+                    has_spot = bool(cached_spot)
+                elif spot_symbol_set:
+                    has_spot = sym in spot_symbol_set
+                    await set_cached_has_spot(sym, has_spot)
                 else:
-                    out.append(sym)
+                    try:
+                        has_spot = await client.spot_symbol_exists(sym)
+                    except Exception:
+                        has_spot = False
+                    else:
+                        await set_cached_has_spot(sym, has_spot)
+                out.append({"symbol": sym, "has_spot": has_spot})
+            else:
+                out.append(sym)
+        except Exception:
+            continue
+
+    if include_spot:
+        out.sort(key=lambda x: x["symbol"])  # type: ignore[index]
+    else:
+        out.sort()
+
+    if not verify:
+        return {"quote": quote, "contract_type": contract_type, "symbols": out}
+
+    sem = asyncio.Semaphore(8)
+    syms_all = [x["symbol"] for x in out] if include_spot else list(out)  # type: ignore[index]
+    premium_map = await client.premium_index_batch(syms_all)
+
+    async def probe(sym: str) -> bool:
+        if sym not in premium_map:
+            return False
+        async with sem:
+            try:
+                await client.open_interest_hist(sym, period="5m", limit=1)
+                return True
             except Exception:
-                continue
-
-        if include_spot:
-            out.sort(key=lambda x: x["symbol"])  # type: ignore[index]
-        else:
-            out.sort()
-
-        if not verify:
-            return {"quote": quote, "contract_type": contract_type, "symbols": out}
-
-        sem = asyncio.Semaphore(8)
-
-        async def probe(sym: str) -> bool:
-            async with sem:
-                try:
-                    await client.premium_index(sym)
-                    await client.open_interest_hist(sym, period="5m", limit=1)
-                    return True
-                except Exception:
-                    return False
-
-        if include_spot:
-            syms_only = [x["symbol"] for x in out]  # type: ignore[index]
-            checks = await asyncio.gather(*(probe(s) for s in syms_only))
-            live = [o for o, ok in zip(out, checks) if ok]
-            missing = [o for o, ok in zip(out, checks) if not ok]
-        else:
-            checks = await asyncio.gather(*(probe(s) for s in out))
-            live = [s for s, ok in zip(out, checks) if ok]
-            missing = [s for s, ok in zip(out, checks) if not ok]
-
-        return {"quote": quote, "contract_type": contract_type, "symbols": live, "unavailable": missing}
-    finally:
-        await client.close()
+                return False
+
+    if include_spot:
+        syms_only = [x["symbol"] for x in out]  # type: ignore[index]
+        checks = await asyncio.gather(*(probe(s) for s in syms_only))
+        live = [o for o, ok in zip(out, checks) if ok]
+        missing = [o for o, ok in zip(out, checks) if not ok]
+    else:
+        checks = await asyncio.gather(*(probe(s) for s in out))
+        live = [s for s, ok in zip(out, checks) if ok]
+        missing = [s for s, ok in zip(out, checks) if not ok]
+
+    return {"quote": quote, "contract_type": contract_type, "symbols": live, "unavailable": missing}
 
 
 @router.get("/available")
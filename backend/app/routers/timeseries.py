@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Query
-from typing import List
-from ..models import TimeseriesPoint
-from ..services.redis_store import get_timeseries
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from typing import Optional
+import hashlib
 import time
 
+import numpy as np
+import orjson
+
+from ..services.downsample import BUCKET_AGGS, as_of, bucket_for_max_points, lttb, ohlc, parse_duration_ms
+from ..services.redis_store import get_timeseries_rows, get_timeseries_rows_many
+from ..services.retention import ROLLUP_METRICS, aggregate_rows, max_retention_ms, project
+from ..services.timescale import get_history_rows_many
+
 router = APIRouter(prefix="/timeseries", tags=["timeseries"])
 
 
@@ -11,18 +18,150 @@ router = APIRouter(prefix="/timeseries", tags=["timeseries"])
 async def get_timeseries_route(
     symbol: str,
     metric: str = Query("basis"),
+    interval: str = Query("1m", description='Bucket size ("30s", "1m", "1h"...) or "raw"'),
+    window: str = Query("48h"),
+    agg: Optional[str] = Query(None, description="mean | last | min | max | ohlc | lttb; default ohlc for mark, else mean"),
+    max_points: int = Query(1500, ge=10, le=10000),
+    since: Optional[int] = Query(None, description="`next_cursor` of a previous response: only points at or after it"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Downsampled series for one metric; never more than `max_points` points.
+
+    Bucketed aggregations widen `interval` when the window would need more buckets.
+    `lttb` (and `interval=raw`) keeps actual points, picked by LTTB decimation.
+
+    Incremental refresh: pass the previous `next_cursor` as `since` with otherwise
+    identical parameters. Points at or after it come back; the first one may replace
+    the client's last point (a bucket still filling). Unchanged responses are 304.
+    """
+    window_ms = _window_ms(window)
+    agg = (agg or ("ohlc" if metric == "mark" else "mean")).lower()
+    bucket_ms = None if interval == "raw" else parse_duration_ms(interval)
+    if interval != "raw" and bucket_ms is None:
+        raise HTTPException(status_code=400, detail=f"Invalid interval {interval!r}")
+    if agg not in BUCKET_AGGS + ("ohlc", "lttb"):
+        raise HTTPException(status_code=400, detail=f"Invalid agg {agg!r}")
+    if bucket_ms is None and agg != "ohlc":
+        agg = "lttb"
+    if agg != "lttb":
+        # From the window, not the data, so full and incremental responses share buckets
+        bucket_ms = bucket_for_max_points(bucket_ms or 60 * 1000, window_ms, max_points)
+
+    now = int(time.time() * 1000)
+    start = now - window_ms
+    if since is not None:
+        start = max(start, since - since % bucket_ms if bucket_ms else since)
+    # Long windows come from the TimescaleDB rollups when enabled, else Redis
+    resolution_ms = bucket_ms if agg != "lttb" else window_ms // max_points
+    series = await get_history_rows_many(symbol.upper(), [metric], start, now, resolution_ms, window_ms)
+    if series is not None:
+        ts, rows = series[metric]
+    else:
+        ts, rows = await get_timeseries_rows(symbol.upper(), metric, start, now)
+    payload = {
+        "symbol": symbol.upper(),
+        "metric": metric,
+        "interval": interval,
+        "window": window,
+        "agg": agg,
+        "bucket_ms": bucket_ms if agg != "lttb" else None,
+    }
+    if agg == "lttb":
+        values = project(rows, "mean")
+        keep = lttb(ts, values, max_points)
+        ts = ts[keep]
+        payload["points"] = [{"ts": t, "value": v} for t, v in zip(ts.tolist(), values[keep].tolist())]
+    elif agg == "ohlc":
+        ts, candles = ohlc(ts, rows, bucket_ms)
+        payload["points"] = [
+            {"ts": t, "open": o, "high": h, "low": lo, "close": c}
+            for t, (o, h, lo, c) in zip(ts.tolist(), candles.tolist())
+        ]
+    else:
+        ts, agg_rows = aggregate_rows(ts, rows, bucket_ms)
+        values = project(agg_rows, agg)
+        payload["points"] = [{"ts": t, "value": v} for t, v in zip(ts.tolist(), values.tolist())]
+    payload["next_cursor"] = int(ts[-1]) if ts.size else since
+
+    return _etag_response(payload, if_none_match)
+
+
+@router.get("/{symbol}/aligned")
+async def get_aligned_timeseries(
+    symbol: str,
+    metrics: str = Query(",".join(ROLLUP_METRICS), description="Comma-separated metric names"),
     interval: str = Query("1m"),
     window: str = Query("48h"),
+    agg: str = Query("last", description="mean | last | min | max, applied per bucket before the join"),
+    tolerance: str = Query("5m", description="Oldest value carried forward onto a grid timestamp"),
+    max_points: int = Query(1500, ge=10, le=10000),
+    since: Optional[int] = Query(None, description="`next_cursor` of a previous response: only rows at or after it"),
+    if_none_match: Optional[str] = Header(None),
 ):
-    # Basic parse of window (e.g., 48h, 72h)
-    ms = 48 * 3600 * 1000
-    if window.endswith("h"):
-        try:
-            hours = int(window[:-1])
-            ms = hours * 3600 * 1000
-        except Exception:
-            pass
-    since = int(time.time() * 1000) - ms
-    points_raw = await get_timeseries(symbol.upper(), metric, since)
-    points = [TimeseriesPoint(ts=p[0], value=p[1]).model_dump() for p in points_raw]
-    return {"symbol": symbol.upper(), "metric": metric, "interval": interval, "window": window, "points": points}
+    """Several metrics on one time grid, as columns: `ts` plus one value array per metric.
+
+    All series are read in one pipelined round trip, bucketed on `agg`, then as-of joined
+    onto the grid: each row holds each metric's latest bucket at or before it, or null
+    when that is older than `tolerance`. `since` / ETag behave as on `/timeseries/{symbol}`.
+    """
+    names = [m.strip() for m in metrics.split(",") if m.strip()]
+    window_ms = _window_ms(window)
+    bucket_ms = parse_duration_ms(interval)
+    tolerance_ms = parse_duration_ms(tolerance)
+    if not names:
+        raise HTTPException(status_code=400, detail="No metrics requested")
+    if bucket_ms is None or tolerance_ms is None:
+        raise HTTPException(status_code=400, detail="Invalid interval or tolerance")
+    if agg not in BUCKET_AGGS:
+        raise HTTPException(status_code=400, detail=f"Invalid agg {agg!r}")
+    bucket_ms = bucket_for_max_points(bucket_ms, window_ms, max_points)
+    tolerance_ms = max(tolerance_ms, bucket_ms)
+
+    now = int(time.time() * 1000)
+    start = now - window_ms
+    if since is not None:
+        start = max(start, since)
+    start -= start % bucket_ms
+    # Read back far enough that the first grid row can carry a value forward
+    series = await get_history_rows_many(symbol.upper(), names, start - tolerance_ms, now, bucket_ms, window_ms)
+    if series is None:
+        series = await get_timeseries_rows_many(symbol.upper(), names, start - tolerance_ms, now)
+    grid = np.arange(start, now - now % bucket_ms + 1, bucket_ms, dtype=np.int64)
+    columns = {}
+    for name in names:
+        ts, rows = series[name]
+        bucket_ts, bucket_rows = aggregate_rows(ts, rows, bucket_ms)
+        columns[name] = as_of(grid, bucket_ts, project(bucket_rows, agg), tolerance_ms).tolist()
+    payload = {
+        "symbol": symbol.upper(),
+        "interval": interval,
+        "window": window,
+        "agg": agg,
+        "bucket_ms": bucket_ms,
+        "ts": grid.tolist(),
+        "series": columns,
+        "next_cursor": int(grid[-1]) if grid.size else since,
+    }
+    return _etag_response(payload, if_none_match)
+
+
+def _window_ms(window: str) -> int:
+    window_ms = parse_duration_ms(window)
+    if window_ms is None:
+        raise HTTPException(status_code=400, detail=f"Invalid window {window!r}")
+    limit_ms = max_retention_ms()
+    if window_ms > limit_ms:
+        raise HTTPException(
+            status_code=400, detail=f"window {window!r} is longer than the stored history ({limit_ms // 86_400_000}d)"
+        )
+    return window_ms
+
+
+def _etag_response(payload: dict, if_none_match: Optional[str]) -> Response:
+    # NaN (missing) values serialize as null
+    body = orjson.dumps(payload)
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
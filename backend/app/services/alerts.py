@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import orjson
+
+from ..config import get_settings
+from .instrumentation import ALERT_BATCHES, ALERT_DELIVERY_SECONDS, ALERT_DROPPED, ALERT_QUEUE_DEPTH, ALERTS_TOTAL
+from .redis_store import alerts_events, get_alerts_raw
+
+logger = logging.getLogger("srr.alerts")
+
+STATES = ("RED", "YELLOW", "GREEN")
+CHANNEL_TYPES = ("webhook", "telegram")
+TELEGRAM_API_BASE = "https://api.telegram.org"
+ALERT_QUEUE_SIZE = 1024
+CHANNEL_QUEUE_SIZE = 256
+RETRY_MAX_SEC = 60.0
+
+DEFAULT_ALERT_CONFIG: Dict[str, Any] = {
+    "channels": [],
+    "states": ["RED", "GREEN"],  # alert on transitions into these traffic lights
+    "debounce_sec": 30,  # a new state must hold this long before it counts
+    "cooldown_sec": 900,  # at most one alert per symbol per cooldown
+    "batch_window_sec": 5,  # alerts arriving within this window go out as one notification
+    "batch_max": 20,
+    "retries": 4,
+    "retry_base_sec": 1.0,  # doubled per attempt, unless the endpoint says how long to wait
+}
+
+# (detected at, monotonic; alert payload)
+QueuedAlert = Tuple[float, Dict[str, Any]]
+
+
+class AlertConfigError(ValueError):
+    """An alert configuration document that does not validate."""
+
+
+def parse_alert_config(doc: Any) -> Dict[str, Any]:
+    """Validate an alert configuration and fill in defaults."""
+    if not isinstance(doc, dict):
+        raise AlertConfigError("alert configuration must be a JSON object")
+    unknown = set(doc) - set(DEFAULT_ALERT_CONFIG)
+    if unknown:
+        raise AlertConfigError(f"unknown keys {sorted(unknown)}")
+    config = copy.deepcopy(DEFAULT_ALERT_CONFIG)
+    config.update(copy.deepcopy(doc))
+    for key in ("debounce_sec", "cooldown_sec", "batch_window_sec", "retry_base_sec"):
+        value = config[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise AlertConfigError(f"{key} must be a non-negative number")
+    for key in ("batch_max", "retries"):
+        value = config[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value < (1 if key == "batch_max" else 0):
+            raise AlertConfigError(f"{key} must be an integer ({'>= 1' if key == 'batch_max' else '>= 0'})")
+    states = config["states"]
+    if not isinstance(states, list) or not set(states) <= set(STATES):
+        raise AlertConfigError(f"states must be a list drawn from {STATES}")
+    channels = config["channels"]
+    if not isinstance(channels, list) or not all(isinstance(c, dict) for c in channels):
+        raise AlertConfigError("channels must be a list of objects")
+    ids = set()
+    for i, channel in enumerate(channels):
+        channel.setdefault("id", f"{channel.get('type')}{i}")
+        name = channel["id"]
+        if name in ids:
+            raise AlertConfigError(f"duplicate channel id {name!r}")
+        ids.add(name)
+        kind = channel.get("type")
+        if kind not in CHANNEL_TYPES:
+            raise AlertConfigError(f"{name}: type must be one of {CHANNEL_TYPES}")
+        required = ("url",) if kind == "webhook" else ("token", "chat_id")
+        missing = [k for k in required if not channel.get(k)]
+        if missing:
+            raise AlertConfigError(f"{name}: missing {missing}")
+        for key in ("url", "api_base"):
+            if key in channel and not _is_http_url(channel[key]):
+                raise AlertConfigError(f"{name}: {key} must be an http(s) URL with a host")
+    return config
+
+
+def _is_http_url(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        parts = urlsplit(value)
+        return parts.scheme in ("http", "https") and bool(parts.hostname)
+    except ValueError:
+        return False
+
+
+def default_alert_config() -> Dict[str, Any]:
+    """Channels from the environment (ALERT_WEBHOOK_URL, TELEGRAM_BOT_TOKEN/TELEGRAM_CHAT_ID)."""
+    settings = get_settings()
+    channels: List[Dict[str, Any]] = []
+    if settings.alert_webhook_url:
+        channels.append({"id": "webhook", "type": "webhook", "url": settings.alert_webhook_url})
+    if settings.telegram_bot_token and settings.telegram_chat_id:
+        channels.append(
+            {
+                "id": "telegram",
+                "type": "telegram",
+                "token": settings.telegram_bot_token,
+                "chat_id": settings.telegram_chat_id,
+            }
+        )
+    return parse_alert_config({"channels": channels})
+
+
+def redact_alert_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """The configuration with secrets masked, for display: bot tokens, every header
+    value, and webhook URL paths and queries (which often embed a secret)."""
+    out = copy.deepcopy(config)
+    for channel in out["channels"]:
+        if channel.get("token"):
+            channel["token"] = "***" + str(channel["token"])[-4:]
+        if channel.get("headers"):
+            channel["headers"] = {name: "***" for name in channel["headers"]}
+        if channel.get("url"):
+            parts = urlsplit(str(channel["url"]))
+            hidden = parts.path not in ("", "/") or parts.query
+            channel["url"] = urlunsplit((parts.scheme, parts.netloc, "/***" if hidden else parts.path, "", ""))
+    return out
+
+
+def format_text(alerts: List[Dict[str, Any]]) -> str:
+    lines = []
+    for alert in alerts:
+        lines.append(f"{alert['symbol']}: {alert['from']} -> {alert['to']} (SRS {alert.get('srs', '-')})")
+        lines.extend(f"  - {reason}" for reason in alert.get("reasons") or [])
+    return "\n".join(lines)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    header = response.headers.get("Retry-After")
+    if header is not None:
+        try:
+            return float(header)
+        except ValueError:
+            return None
+    try:
+        # Telegram: {"ok": false, "parameters": {"retry_after": 5}}
+        return float(orjson.loads(response.content)["parameters"]["retry_after"])
+    except Exception:
+        return None
+
+
+class ChannelSender:
+    """One notification channel: a bounded queue drained in batches, with retries.
+
+    While the endpoint is slow or retrying, new alerts wait in the queue; when it is full
+    the oldest alert is dropped, so a dead channel costs bounded memory and never holds
+    up the dispatcher or the other channels.
+    """
+
+    def __init__(self, spec: Dict[str, Any], config: Dict[str, Any], client: httpx.AsyncClient) -> None:
+        self.spec = spec
+        self.id: str = spec["id"]
+        self.config = config
+        self.client = client
+        self.queue: asyncio.Queue[QueuedAlert] = asyncio.Queue(maxsize=CHANNEL_QUEUE_SIZE)
+        # The batch being collected or delivered, so a reconfigure can hand it on
+        self.batch: List[QueuedAlert] = []
+
+    def pending(self) -> List[QueuedAlert]:
+        """Alerts not yet delivered, in-flight batch first; empties the sender."""
+        items, self.batch = self.batch, []
+        while not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+    def offer(self, item: QueuedAlert) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            ALERT_DROPPED.inc(channel=self.id)
+        self.queue.put_nowait(item)
+        ALERT_QUEUE_DEPTH.set(self.queue.qsize(), queue=self.id)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self.batch = [await self.queue.get()]
+            deadline = loop.time() + float(self.config["batch_window_sec"])
+            while len(batch) < self.config["batch_max"]:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            ALERT_QUEUE_DEPTH.set(self.queue.qsize(), queue=self.id)
+            try:
+                await self.deliver(batch)
+            except Exception:
+                # Anything deliver() does not handle itself must not end the channel's task
+                logger.exception("alert channel %s failed a batch of %d", self.id, len(batch))
+                ALERT_BATCHES.inc(channel=self.id, outcome="failed")
+            self.batch = []
+
+    def request(self, alerts: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any], Dict[str, str]]:
+        """(url, JSON body, headers) of one notification."""
+        if self.spec["type"] == "telegram":
+            base = str(self.spec.get("api_base") or TELEGRAM_API_BASE).rstrip("/")
+            body = {"chat_id": self.spec["chat_id"], "text": format_text(alerts), "disable_web_page_preview": True}
+            return f"{base}/bot{self.spec['token']}/sendMessage", body, {}
+        return self.spec["url"], {"alerts": alerts}, dict(self.spec.get("headers") or {})
+
+    async def deliver(self, batch: List[QueuedAlert]) -> bool:
+        url, body, headers = self.request([alert for _, alert in batch])
+        retries = int(self.config["retries"])
+        for attempt in range(retries + 1):
+            wait = min(RETRY_MAX_SEC, float(self.config["retry_base_sec"]) * 2**attempt)
+            try:
+                response = await self.client.post(url, json=body, headers=headers)
+            except httpx.HTTPError as e:
+                logger.warning("alert channel %s: %s (attempt %d)", self.id, e, attempt + 1)
+            else:
+                if response.status_code < 300:
+                    now = time.monotonic()
+                    for detected, _ in batch:
+                        ALERT_DELIVERY_SECONDS.observe(now - detected, channel=self.id)
+                    ALERT_BATCHES.inc(channel=self.id, outcome="sent")
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    logger.warning("alert channel %s rejected a batch: %s", self.id, response.status_code)
+                    break
+                wait = min(RETRY_MAX_SEC, _retry_after(response) or wait)
+                logger.warning("alert channel %s returned %s (attempt %d)", self.id, response.status_code, attempt + 1)
+            if attempt < retries:
+                await asyncio.sleep(wait)
+        ALERT_BATCHES.inc(channel=self.id, outcome="failed")
+        return False
+
+
+class AlertDispatcher:
+    """Traffic-light transitions from the collector, debounced and fanned out to channels.
+
+    `observe` runs inside the collector tick and never awaits: it tracks each symbol's
+    confirmed state, confirms a new one only after it has held for `debounce_sec` (by
+    snapshot time), applies the per-symbol cooldown and puts the alert on a bounded
+    queue, dropping it if the queue is full. `run` drains that queue into one
+    ChannelSender per configured channel.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.config = default_alert_config()
+        self._transport = transport
+        self._queue: asyncio.Queue[QueuedAlert] = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+        self._state: Dict[str, str] = {}
+        self._pending: Dict[str, Tuple[str, int]] = {}
+        self._last_alert: Dict[str, int] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._channels: Dict[str, ChannelSender] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._source: Optional[bytes] = None
+
+    @property
+    def channels(self) -> Dict[str, ChannelSender]:
+        return self._channels
+
+    def observe(self, snapshots: Mapping[str, Mapping[str, Any]]) -> None:
+        detected = time.monotonic()
+        debounce_ms = float(self.config["debounce_sec"]) * 1000
+        cooldown_ms = float(self.config["cooldown_sec"]) * 1000
+        for sym, snap in snapshots.items():
+            state = snap.get("traffic_light")
+            if state is None:
+                continue
+            ts = int(snap.get("ts") or time.time() * 1000)
+            current = self._state.get(sym)
+            if current is None or state == current:
+                # First sight of a symbol only sets its baseline
+                self._state[sym] = state
+                self._pending.pop(sym, None)
+                continue
+            pending = self._pending.get(sym)
+            if pending is None or pending[0] != state:
+                pending = self._pending[sym] = (state, ts)
+            if ts - pending[1] < debounce_ms:
+                continue
+            del self._pending[sym]
+            self._state[sym] = state
+            if state not in self.config["states"]:
+                continue
+            last = self._last_alert.get(sym)
+            if last is not None and ts - last < cooldown_ms:
+                ALERTS_TOTAL.inc(outcome="cooldown")
+                continue
+            self._last_alert[sym] = ts
+            alert = {
+                "symbol": sym,
+                "from": current,
+                "to": state,
+                "ts": ts,
+                "srs": snap.get("srs"),
+                "reasons": list(snap.get("rule_reasons") or []),
+            }
+            try:
+                self._queue.put_nowait((detected, alert))
+            except asyncio.QueueFull:
+                ALERTS_TOTAL.inc(outcome="dropped")
+            else:
+                ALERTS_TOTAL.inc(outcome="queued")
+        ALERT_QUEUE_DEPTH.set(self._queue.qsize(), queue="dispatch")
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Switch to a validated configuration.
+
+        Channels kept by id keep their queued alerts and the batch their sender was
+        collecting or delivering, which is sent again by the new sender (a batch cut off
+        mid-request may arrive twice rather than not at all).
+        """
+        self.config = config
+        if self._client is None:
+            return  # channels start with `run`
+        for name, task in list(self._tasks.items()):
+            task.cancel()
+            del self._tasks[name]
+        old = self._channels
+        self._channels = {}
+        for spec in config["channels"]:
+            sender = ChannelSender(spec, config, self._client)
+            previous = old.pop(spec["id"], None)
+            if previous is not None:
+                for item in previous.pending():
+                    sender.offer(item)
+            self._channels[sender.id] = sender
+        for name, previous in old.items():
+            dropped = len(previous.pending())
+            if dropped:
+                ALERT_DROPPED.inc(dropped, channel=name)
+                logger.warning("alert channel %s removed with %d undelivered alerts", name, dropped)
+        for name, sender in self._channels.items():
+            self._tasks[name] = asyncio.create_task(sender.run())
+
+    def load(self, raw: Optional[bytes]) -> None:
+        if raw == self._source:
+            return
+        self.configure(parse_alert_config(orjson.loads(raw)) if raw else default_alert_config())
+        self._source = raw
+        logger.info("alert configuration loaded (%d channels)", len(self.config["channels"]))
+
+    async def reload(self) -> None:
+        try:
+            self.load(await get_alerts_raw())
+        except Exception as e:
+            logger.warning("alert configuration reload failed, keeping the previous one: %s", e)
+
+    async def watch(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                async for _ in alerts_events():
+                    await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("alert configuration subscription failed: %s", e)
+                await asyncio.sleep(2)
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """Deliver queued alerts until `stop_event` is set."""
+        self._client = httpx.AsyncClient(timeout=10.0, transport=self._transport)
+        self.configure(self.config)
+        stopper = asyncio.create_task(stop_event.wait())
+        try:
+            while not stop_event.is_set():
+                getter = asyncio.create_task(self._queue.get())
+                await asyncio.wait({getter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                item = getter.result()
+                for sender in self._channels.values():
+                    sender.offer(item)
+                ALERT_QUEUE_DEPTH.set(self._queue.qsize(), queue="dispatch")
+        finally:
+            stopper.cancel()
+            tasks = list(self._tasks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._tasks.clear()
+            await self._client.aclose()
+            self._client = None
+
+
+_dispatcher: Optional[AlertDispatcher] = None
+
+
+def get_alert_dispatcher() -> AlertDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = AlertDispatcher()
+    return _dispatcher
+
+
+async def run_alert_dispatcher(stop_event: asyncio.Event) -> None:
+    dispatcher = get_alert_dispatcher()
+    watcher = asyncio.create_task(dispatcher.watch(stop_event))
+    try:
+        await dispatcher.run(stop_event)
+    finally:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
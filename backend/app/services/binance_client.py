@@ -1,14 +1,227 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
 import httpx
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import json
 import logging
 
 from ..config import get_settings
+from .host_pool import HostPool, make_http_client
+from .instrumentation import BINANCE_QUEUE_SECONDS, BINANCE_REQUEST_ERRORS, BINANCE_REQUEST_SECONDS
 
 _settings = get_settings()
 
+# Request priorities for the governor queue (lower is served first)
+PRIORITY_TICK = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+# Longest 429/418 pause a non-tick request waits out before giving up; tick requests never wait
+MAX_PAUSE_WAIT_SEC = 5.0
+
+_FUTURES_DEPTH_WEIGHTS = ((50, 2), (100, 5), (500, 10), (1000, 20))
+
+
+def endpoint_weight(path: str, params: Optional[Dict[str, Any]] = None) -> int:
+    """Request weight Binance charges for `path` with `params` (REST docs, per IP)."""
+    params = params or {}
+    if path == "/fapi/v1/premiumIndex":
+        return 1 if "symbol" in params else 10
+    if path == "/fapi/v1/ticker/24hr":
+        return 1 if "symbol" in params else 40
+    if path == "/fapi/v1/depth":
+        limit = int(params.get("limit", 500))
+        for max_limit, weight in _FUTURES_DEPTH_WEIGHTS:
+            if limit <= max_limit:
+                return weight
+        return 20
+    if path == "/api/v3/ticker/24hr":
+        if "symbol" in params:
+            return 2
+        if "symbols" in params:
+            n = len(json.loads(params["symbols"]))
+            return 2 if n <= 20 else 40 if n <= 100 else 80
+        return 80
+    if path == "/api/v3/klines":
+        return 2
+    if path == "/api/v3/exchangeInfo":
+        return 2 if "symbol" in params else 20
+    return 1
+
+
+class _HostBudget:
+    """Token bucket, in-flight cap and priority wait queue for one API host."""
+
+    def __init__(self, weight_per_min: int, max_in_flight: int) -> None:
+        self.capacity = float(weight_per_min)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.last_used_weight: Optional[int] = None
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self.pump: Optional[asyncio.Task] = None
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, weight: int) -> bool:
+        if time.monotonic() < self.paused_until:
+            return False
+        self.refill()
+        if self.tokens >= weight:
+            self.tokens -= weight
+            return True
+        return False
+
+    def wait_hint(self, weight: int) -> float:
+        paused = self.paused_until - time.monotonic()
+        if paused > 0:
+            return paused
+        return max(0.01, (weight - self.tokens) / self.rate)
+
+
+class RequestGovernor:
+    """Keeps outbound Binance traffic inside each API family's request-weight budget.
+
+    Binance counts weight per IP and API family, not per hostname, so every spot host
+    (api, api1..api3) draws from one "spot" bucket and futures from one "fapi" bucket.
+    Every request reserves its endpoint weight from its family's token bucket sized
+    to `weight_per_min * headroom`, then takes one of `max_in_flight` slots. When the
+    bucket is short, requests queue by priority (tick-critical calls first) instead
+    of being sent and rejected. `X-MBX-USED-WEIGHT-*` response headers pull our
+    estimate down to the server's count, and 429/418 pause the whole family for
+    Retry-After.
+    """
+
+    def __init__(self, max_in_flight: int, headroom: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.headroom = headroom
+        self._budgets: Dict[str, _HostBudget] = {}
+        self._seq = itertools.count()
+        self.logger = logging.getLogger("srr.binance.governor")
+
+    def budget(self, host: str) -> _HostBudget:
+        family = api_family(host)
+        b = self._budgets.get(family)
+        if b is None:
+            limit = _settings.binance_fapi_weight_per_min if family == "fapi" else _settings.binance_spot_weight_per_min
+            b = _HostBudget(int(limit * self.headroom), self.max_in_flight)
+            self._budgets[family] = b
+        return b
+
+    async def acquire(self, host: str, weight: int, priority: int = PRIORITY_NORMAL) -> None:
+        b = self.budget(host)
+        weight = min(weight, int(b.capacity))
+        if not b.waiters and b.try_take(weight):
+            return
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(b.waiters, (priority, next(self._seq), weight, fut))
+        if b.pump is None or b.pump.done():
+            b.pump = asyncio.create_task(self._pump(host, b))
+        await fut
+
+    async def _pump(self, host: str, b: _HostBudget) -> None:
+        while b.waiters:
+            _, _, weight, fut = b.waiters[0]
+            if fut.done():
+                heapq.heappop(b.waiters)
+                continue
+            if b.try_take(weight):
+                heapq.heappop(b.waiters)
+                fut.set_result(None)
+                continue
+            await asyncio.sleep(b.wait_hint(weight))
+
+    @asynccontextmanager
+    async def slot(self, host: str, weight: int, priority: int = PRIORITY_NORMAL) -> AsyncIterator[None]:
+        await self.acquire(host, weight, priority)
+        b = self.budget(host)
+        async with b.in_flight:
+            yield
+
+    def observe(self, host: str, response: httpx.Response) -> None:
+        b = self.budget(host)
+        for name, value in response.headers.items():
+            if name.lower().startswith("x-mbx-used-weight-") and name.lower().endswith("1m"):
+                try:
+                    used = int(value)
+                except ValueError:
+                    continue
+                b.last_used_weight = used
+                b.refill()
+                b.tokens = min(b.tokens, b.capacity - used)
+        if response.status_code in (418, 429):
+            retry_after = _retry_after(response)
+            if retry_after is None:
+                retry_after = 60.0 if response.status_code == 429 else 120.0
+            b.paused_until = max(b.paused_until, time.monotonic() + retry_after)
+            self.logger.warning(
+                "%s returned %s; pausing %s requests for %.0fs",
+                host,
+                response.status_code,
+                api_family(host),
+                retry_after,
+            )
+
+    def paused_for(self, host: str) -> float:
+        """Seconds left on the host family's 429/418 pause (0 when not paused)."""
+        return max(0.0, self.budget(host).paused_until - time.monotonic())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for family, b in self._budgets.items():
+            b.refill()
+            out[family] = {
+                "tokens": round(b.tokens, 1),
+                "capacity": b.capacity,
+                "used_weight_1m": b.last_used_weight,
+                "paused_for_sec": round(max(0.0, b.paused_until - time.monotonic()), 1),
+                "queued": len(b.waiters),
+            }
+        return out
+
+
+class RateLimited(Exception):
+    """The API family is paused after a 429/418; callers keep their cached value."""
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    if isinstance(exc, RateLimited):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in (418, 429)
+
+
+def api_family(host: str) -> str:
+    """Budget key for a base URL: "fapi" for USD-M futures, "spot" for every spot host."""
+    return "fapi" if "fapi" in host else "spot"
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+_governor: Optional[RequestGovernor] = None
+
+
+def get_governor() -> RequestGovernor:
+    """Process-wide governor: Binance limits are per IP, so every client shares it."""
+    global _governor
+    if _governor is None:
+        _governor = RequestGovernor(_settings.binance_max_in_flight, _settings.binance_weight_headroom)
+    return _governor
+
 
 class BinanceClient:
     def __init__(self, base_url: Optional[str] = None) -> None:
@@ -16,49 +229,153 @@ class BinanceClient:
         headers = {"User-Agent": "short-risk-radar/0.1"}
         if _settings.binance_api_key:
             headers["X-MBX-APIKEY"] = _settings.binance_api_key
-        self._client = httpx.AsyncClient(base_url=self.base_url, timeout=10, headers=headers)
-        self._spot_client = httpx.AsyncClient(base_url=_settings.binance_spot_base_url, timeout=10, headers=headers)
+        self._client = make_http_client(self.base_url, headers)
+        # Equivalent spot hosts, each with its own persistent connection pool
+        self._spot_pool = HostPool(
+            [
+                _settings.binance_spot_base_url,
+                "https://api1.binance.com",
+                "https://api2.binance.com",
+                "https://api3.binance.com",
+            ],
+            headers,
+        )
         self.logger = logging.getLogger("srr.binance")
-        self._spot_hosts = [
-            str(self._spot_client.base_url),
-            "https://api1.binance.com",
-            "https://api2.binance.com",
-            "https://api3.binance.com",
-        ]
-
-    async def _spot_request(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        self._governor = get_governor()
+
+    async def _get(
+        self,
+        client: httpx.AsyncClient,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_NORMAL,
+        retries_on_429: Optional[int] = None,
+    ) -> httpx.Response:
+        """GET through the governor: reserve endpoint weight, cap in-flight, learn from headers.
+
+        While the API family is paused after a 429/418, tick-priority requests raise
+        `RateLimited` at once and others wait at most `MAX_PAUSE_WAIT_SEC`, so a collector
+        tick fails fast and keeps its cached inputs. Only non-tick requests retry a 429
+        (twice by default).
+        """
+        host = str(client.base_url)
+        host_label = client.base_url.host
+        weight = endpoint_weight(path, params)
+        if retries_on_429 is None:
+            retries_on_429 = 0 if priority == PRIORITY_TICK else 2
+        max_wait = 0.0 if priority == PRIORITY_TICK else MAX_PAUSE_WAIT_SEC
+        for attempt in range(retries_on_429 + 1):
+            paused = self._governor.paused_for(host)
+            if paused > max_wait:
+                raise RateLimited(f"{api_family(host)} requests paused for {paused:.0f}s after a 429/418")
+            queued = time.perf_counter()
+            async with self._governor.slot(host, weight, priority):
+                started = time.perf_counter()
+                BINANCE_QUEUE_SECONDS.observe(started - queued, host=host_label)
+                try:
+                    r = await client.get(path, params=params)
+                except Exception:
+                    BINANCE_REQUEST_ERRORS.inc(endpoint=path, host=host_label, status="network")
+                    raise
+                finally:
+                    BINANCE_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=path, host=host_label)
+            if r.status_code >= 400:
+                BINANCE_REQUEST_ERRORS.inc(endpoint=path, host=host_label, status=str(r.status_code))
+            self._governor.observe(host, r)
+            if r.status_code == 429 and attempt < retries_on_429:
+                # The host is now paused; the next slot() waits it out
+                continue
+            return r
+        return r
+
+    async def _spot_request(
+        self, path: str, params: Optional[Dict[str, Any]] = None, priority: int = PRIORITY_NORMAL
+    ) -> httpx.Response:
+        """GET from the best available spot host, failing over on 451, 5xx and network errors.
+
+        418/429 are not failed over: the limit is per IP, so another host would spend the
+        same budget. The governor has already paused every spot host and the response is
+        raised. Other 4xx responses are the request's fault, not the host's, and are raised as-is.
+        """
         last_exc: Optional[Exception] = None
-        for idx, host in enumerate(self._spot_hosts):
+        for host in self._spot_pool.ranked() or [self._spot_pool.primary()]:
+            started = time.monotonic()
             try:
-                if idx == 0:
-                    r = await self._spot_client.get(path, params=params)
-                else:
-                    async with httpx.AsyncClient(base_url=host, timeout=10, headers=self._spot_client.headers) as c:
-                        r = await c.get(path, params=params)
-                if r.status_code in (418, 451):
-                    self.logger.warning("spot host %s returned %s for %s", host, r.status_code, path)
-                    last_exc = httpx.HTTPStatusError("spot banned", request=r.request, response=r)
-                    continue
-                r.raise_for_status()
-                return r
+                r = await self._get(host.client, path, params, priority, retries_on_429=0)
+            except RateLimited:
+                raise
             except Exception as e:
+                self._spot_pool.record_failure(host)
                 last_exc = e
-                self.logger.warning("spot request failed on host %s for %s: %s", host, path, e)
+                self.logger.warning("spot request failed on host %s for %s: %s", host.base_url, path, e)
                 continue
+            if r.status_code in (418, 429):
+                self.logger.warning("spot host %s returned %s for %s (no failover)", host.base_url, r.status_code, path)
+                r.raise_for_status()
+            if r.status_code == 451 or r.status_code >= 500:
+                self._spot_pool.record_failure(host, r.status_code, _retry_after(r))
+                self.logger.warning("spot host %s returned %s for %s", host.base_url, r.status_code, path)
+                last_exc = httpx.HTTPStatusError("spot host unavailable", request=r.request, response=r)
+                continue
+            try:
+                latency_ms = r.elapsed.total_seconds() * 1000
+            except RuntimeError:
+                latency_ms = (time.monotonic() - started) * 1000
+            self._spot_pool.record_success(host, latency_ms)
+            r.raise_for_status()
+            return r
         assert last_exc is not None
         raise last_exc
 
+    def stats(self) -> Dict[str, Any]:
+        return {"spot_hosts": self._spot_pool.stats()}
+
     async def close(self) -> None:
         await self._client.aclose()
-        await self._spot_client.aclose()
+        await self._spot_pool.aclose()
 
     async def premium_index(self, symbol: str) -> Dict[str, Any]:
-        r = await self._client.get("/fapi/v1/premiumIndex", params={"symbol": symbol})
+        r = await self._get(self._client, "/fapi/v1/premiumIndex", {"symbol": symbol}, PRIORITY_TICK)
         r.raise_for_status()
         return r.json()
 
+    async def premium_index_batch(self, symbols: list[str]) -> Dict[str, Dict[str, Any]]:
+        """Premium index for many symbols from one bulk request.
+
+        Without a symbol the endpoint returns every contract; we keep the requested ones
+        and fall back to per-symbol calls only for entries missing from the bulk payload.
+        Returns a map symbol -> payload.
+        """
+        if not symbols:
+            return {}
+        wanted = set(symbols)
+        out: Dict[str, Dict[str, Any]] = {}
+        try:
+            r = await self._get(self._client, "/fapi/v1/premiumIndex", None, PRIORITY_TICK)
+            r.raise_for_status()
+            for item in r.json() or []:
+                sym = item.get("symbol")
+                if sym in wanted:
+                    out[str(sym)] = item
+        except Exception as e:
+            if is_rate_limited(e):
+                raise
+            self.logger.warning("futures bulk premiumIndex failed, falling back per-symbol: %s", e)
+        missing = [s for s in symbols if s not in out]
+        if missing:
+            results = await asyncio.gather(*(self.premium_index(s) for s in missing), return_exceptions=True)
+            for s, res in zip(missing, results):
+                if isinstance(res, Exception):
+                    self.logger.warning("premiumIndex single failed for %s: %s", s, res)
+                    continue
+                out[s] = res
+        self.logger.debug("premiumIndex batch symbols=%d fallback=%d", len(out), len(missing))
+        return out
+
     async def funding_rate(self, symbol: str, limit: int = 20) -> List[Dict[str, Any]]:
-        r = await self._client.get("/fapi/v1/fundingRate", params={"symbol": symbol, "limit": limit})
+        r = await self._get(
+            self._client, "/fapi/v1/fundingRate", {"symbol": symbol, "limit": limit}, PRIORITY_BACKGROUND
+        )
         r.raise_for_status()
         return r.json()
 
@@ -76,21 +393,22 @@ class BinanceClient:
         return 8
 
     async def open_interest(self, symbol: str) -> Dict[str, Any]:
-        r = await self._client.get("/fapi/v1/openInterest", params={"symbol": symbol})
+        r = await self._get(self._client, "/fapi/v1/openInterest", {"symbol": symbol})
         r.raise_for_status()
         return r.json()
 
     async def open_interest_hist(self, symbol: str, period: str = "5m", limit: int = 12) -> List[Dict[str, Any]]:
         # Returns list with sumOpenInterestValue (USDT) at 5m intervals
-        r = await self._client.get(
+        r = await self._get(
+            self._client,
             "/futures/data/openInterestHist",
-            params={"symbol": symbol, "period": period, "limit": limit},
+            {"symbol": symbol, "period": period, "limit": limit},
         )
         r.raise_for_status()
         return r.json()
 
     async def ticker_24h(self, symbol: str) -> Dict[str, Any]:
-        r = await self._client.get("/fapi/v1/ticker/24hr", params={"symbol": symbol})
+        r = await self._get(self._client, "/fapi/v1/ticker/24hr", {"symbol": symbol})
         r.raise_for_status()
         return r.json()
 
@@ -102,10 +420,12 @@ class BinanceClient:
         if not symbols:
             return {}
         try:
-            r = await self._client.get("/fapi/v1/ticker/24hr", params={"symbols": json.dumps(symbols)})
+            r = await self._get(self._client, "/fapi/v1/ticker/24hr", {"symbols": json.dumps(symbols)})
             r.raise_for_status()
             arr = r.json() or []
         except Exception as e:
+            if is_rate_limited(e):
+                raise
             self.logger.warning("futures batch 24h failed, falling back per-symbol: %s | symbols=%s", e, symbols)
             out_fallback: Dict[str, Dict[str, Any]] = {}
             for s in symbols:
@@ -135,6 +455,8 @@ class BinanceClient:
             r = await self._spot_request("/api/v3/ticker/24hr", params={"symbols": json.dumps(symbols)})
             arr = r.json() or []
         except Exception as e:
+            if is_rate_limited(e):
+                raise
             self.logger.warning("spot batch 24h failed, falling back per-symbol: %s | symbols=%s", e, symbols)
             out_fallback: Dict[str, Dict[str, Any]] = {}
             for s in symbols:
@@ -153,7 +475,9 @@ class BinanceClient:
         return out
 
     async def spot_klines(self, symbol: str, interval: str = "1h", limit: int = 24) -> List[List[Any]]:
-        r = await self._spot_request("/api/v3/klines", params={"symbol": symbol, "interval": interval, "limit": limit})
+        r = await self._spot_request(
+            "/api/v3/klines", {"symbol": symbol, "interval": interval, "limit": limit}, PRIORITY_BACKGROUND
+        )
         r.raise_for_status()
         return r.json()
 
@@ -172,7 +496,7 @@ class BinanceClient:
 
     async def depth(self, symbol: str, limit: int = 100) -> Dict[str, Any]:
         # Limit 5/10/20/50/100/500/1000
-        r = await self._client.get("/fapi/v1/depth", params={"symbol": symbol, "limit": limit})
+        r = await self._get(self._client, "/fapi/v1/depth", {"symbol": symbol, "limit": limit}, PRIORITY_TICK)
         r.raise_for_status()
         return r.json()
 
@@ -181,12 +505,12 @@ class BinanceClient:
 
         Useful to list USDT-M perpetual trading symbols to avoid 404s for unsupported pairs.
         """
-        r = await self._client.get("/fapi/v1/exchangeInfo")
+        r = await self._get(self._client, "/fapi/v1/exchangeInfo", None, PRIORITY_BACKGROUND)
         r.raise_for_status()
         return r.json()
 
     async def spot_exchange_info(self) -> Dict[str, Any]:
-        r = await self._spot_client.get("/api/v3/exchangeInfo")
+        r = await self._spot_request("/api/v3/exchangeInfo", None, PRIORITY_BACKGROUND)
         r.raise_for_status()
         return r.json()
 
@@ -197,8 +521,7 @@ class BinanceClient:
         a 24h ticker that may fail during maintenance or if trading is halted.
         """
         try:
-            r = await self._spot_client.get("/api/v3/exchangeInfo", params={"symbol": symbol})
-            r.raise_for_status()
+            r = await self._spot_request("/api/v3/exchangeInfo", {"symbol": symbol}, PRIORITY_BACKGROUND)
         except httpx.HTTPStatusError as exc:
             status = exc.response.status_code
             if status in (400, 404):
@@ -206,4 +529,22 @@ class BinanceClient:
             raise
         data = r.json()
         symbols = data.get("symbols") or []
-        return len(symbols) > 0
\ No newline at end of file
+        return len(symbols) > 0
+
+
+_shared_client: Optional[BinanceClient] = None
+
+
+def get_binance_client() -> BinanceClient:
+    """App-wide client so collectors and routers reuse the same keep-alive pools."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = BinanceClient()
+    return _shared_client
+
+
+async def close_binance_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.close()
+        _shared_client = None
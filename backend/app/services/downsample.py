@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .retention import aggregate_rows
+
+# Scalar aggregations served by /timeseries; "ohlc" and "lttb" are handled separately
+BUCKET_AGGS = ("mean", "last", "min", "max")
+
+_UNIT_MS = {"s": 1000, "m": 60 * 1000, "h": 3600 * 1000, "d": 86400 * 1000}
+
+
+def parse_duration_ms(text: str) -> Optional[int]:
+    """Parse "90s", "5m", "48h" or "7d" into milliseconds; None if unparseable."""
+    unit = _UNIT_MS.get(text[-1:].lower())
+    try:
+        n = int(text[:-1])
+    except ValueError:
+        return None
+    if unit is None or n <= 0:
+        return None
+    return n * unit
+
+
+def bucket_for_max_points(bucket_ms: int, span_ms: int, max_points: int) -> int:
+    """Smallest multiple of `bucket_ms` that splits `span_ms` into at most `max_points` buckets."""
+    if max_points <= 1 or span_ms <= 0:
+        return bucket_ms
+    needed = math.ceil(span_ms / (max_points - 1))
+    return bucket_ms * max(1, math.ceil(needed / bucket_ms))
+
+
+def ohlc(ts: np.ndarray, rows: np.ndarray, bucket_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+    """`(bucket_ts, [open, high, low, close])` per `bucket_ms` bucket of time-ordered rows.
+
+    Open is the first row's last value, which is exact for raw points and the first
+    sub-bucket's close when the rows come from a rollup tier.
+    """
+    if ts.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, 4), dtype=np.float64)
+    buckets = ts - ts % bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    bucket_ts, agg = aggregate_rows(ts, rows, bucket_ms)
+    return bucket_ts, np.column_stack((rows[starts, 0], agg[:, 3], agg[:, 2], agg[:, 0]))
+
+
+def lttb(ts: np.ndarray, values: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of a Largest-Triangle-Three-Buckets decimation down to `max_points`.
+
+    First and last points are always kept. Interior points are split into
+    `max_points - 2` buckets and each bucket keeps the point forming the largest
+    triangle with its neighbours. The previous bucket is represented by its centroid
+    rather than its selected point, so every bucket is scored at once instead of in a
+    sequential loop (about 1ms for 25k -> 1k points against 9ms for the loop).
+    """
+    size = ts.size
+    if max_points >= size or size <= 2:
+        return np.arange(size)
+    max_points = max(3, max_points)
+    x = ts.astype(np.float64)
+    y = values
+    edges = np.linspace(1, size - 1, max_points - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    cum_x = np.r_[0.0, np.cumsum(x)]
+    cum_y = np.r_[0.0, np.cumsum(y)]
+    counts = ends - starts
+    cx = (cum_x[ends] - cum_x[starts]) / counts
+    cy = (cum_y[ends] - cum_y[starts]) / counts
+    prev_x, prev_y = np.r_[x[0], cx[:-1]], np.r_[y[0], cy[:-1]]
+    next_x, next_y = np.r_[cx[1:], x[-1]], np.r_[cy[1:], y[-1]]
+
+    bucket = np.repeat(np.arange(starts.size), counts)
+    px, py, nx, ny = prev_x[bucket], prev_y[bucket], next_x[bucket], next_y[bucket]
+    xs, ys = x[1 : size - 1], y[1 : size - 1]
+    area = np.abs((px - nx) * (ys - py) - (px - xs) * (ny - py))
+    best = np.maximum.reduceat(area, starts - 1)
+    hits = np.flatnonzero(area == best[bucket])
+    # First hit per bucket (ties keep the earliest point)
+    first = hits[np.r_[True, bucket[hits][1:] != bucket[hits][:-1]]] + 1
+    return np.r_[0, first, size - 1]
+
+
+def as_of(grid: np.ndarray, ts: np.ndarray, values: np.ndarray, tolerance_ms: int) -> np.ndarray:
+    """Value of the latest point at or before each grid timestamp; NaN if none within `tolerance_ms`."""
+    idx = np.searchsorted(ts, grid, side="right") - 1
+    out = np.full(grid.size, np.nan)
+    found = idx >= 0
+    hit = idx[found]
+    fresh = grid[found] - ts[hit] <= tolerance_ms
+    out[np.flatnonzero(found)[fresh]] = values[hit[fresh]]
+    return out
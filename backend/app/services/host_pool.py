@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Dict, List, Mapping, Optional
+
+import httpx
+
+try:  # HTTP/2 needs the optional `h2` package (httpx[http2])
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# Cooldowns applied when a host answers with a ban/limit status and no Retry-After
+BAN_COOLDOWN_SEC = {418: 120.0, 429: 60.0, 451: 3600.0}
+FAILURE_COOLDOWN_SEC = 30.0
+MAX_CONSECUTIVE_FAILURES = 3
+LATENCY_EWMA_ALPHA = 0.2
+
+
+def make_http_client(base_url: str, headers: Mapping[str, str], timeout: float = 10) -> httpx.AsyncClient:
+    """Long-lived keep-alive client for one host (HTTP/2 when available)."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        timeout=timeout,
+        headers=dict(headers),
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60),
+    )
+
+
+class HostState:
+    def __init__(self, base_url: str, client: httpx.AsyncClient) -> None:
+        self.base_url = base_url
+        self.client = client
+        self.latency_ms: Optional[float] = None
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def score(self) -> float:
+        # Unmeasured hosts sort after measured fast ones but before slow or failing ones
+        latency = self.latency_ms if self.latency_ms is not None else 250.0
+        return latency * (1 + self.consecutive_failures)
+
+
+class HostPool:
+    """Persistent clients for a set of equivalent hosts, ordered by health and latency.
+
+    `ranked()` returns hosts that are not cooling down, best score first. A host that
+    answered 418/429/451 or failed repeatedly is skipped until its cooldown expires.
+    """
+
+    def __init__(self, base_urls: List[str], headers: Mapping[str, str], timeout: float = 10) -> None:
+        self.logger = logging.getLogger("srr.hostpool")
+        self._hosts: Dict[str, HostState] = {}
+        for url in base_urls:
+            url = url.rstrip("/")
+            if url not in self._hosts:
+                self._hosts[url] = HostState(url, make_http_client(url, headers, timeout))
+
+    def ranked(self) -> List[HostState]:
+        now = time.monotonic()
+        return sorted((h for h in self._hosts.values() if h.available(now)), key=lambda h: h.score())
+
+    def primary(self) -> HostState:
+        ranked = self.ranked()
+        if ranked:
+            return ranked[0]
+        # Everything is cooling down: use the host that recovers first
+        return min(self._hosts.values(), key=lambda h: h.cooldown_until)
+
+    def record_success(self, host: HostState, latency_ms: float) -> None:
+        host.requests += 1
+        host.consecutive_failures = 0
+        if host.latency_ms is None:
+            host.latency_ms = latency_ms
+        else:
+            host.latency_ms += LATENCY_EWMA_ALPHA * (latency_ms - host.latency_ms)
+
+    def record_failure(self, host: HostState, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        host.requests += 1
+        host.failures += 1
+        host.consecutive_failures += 1
+        cooldown = 0.0
+        if status in BAN_COOLDOWN_SEC:
+            cooldown = retry_after if retry_after is not None else BAN_COOLDOWN_SEC[status]
+        elif host.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            cooldown = FAILURE_COOLDOWN_SEC
+        if cooldown:
+            host.cooldown_until = max(host.cooldown_until, time.monotonic() + cooldown)
+            self.logger.warning("host %s cooling down for %.0fs (status=%s)", host.base_url, cooldown, status)
+
+    def stats(self) -> List[Dict[str, object]]:
+        now = time.monotonic()
+        return [
+            {
+                "host": h.base_url,
+                "latency_ms": round(h.latency_ms, 1) if h.latency_ms is not None else None,
+                "consecutive_failures": h.consecutive_failures,
+                "cooldown_for_sec": round(max(0.0, h.cooldown_until - now), 1),
+                "requests": h.requests,
+                "failures": h.failures,
+            }
+            for h in self._hosts.values()
+        ]
+
+    async def aclose(self) -> None:
+        for h in self._hosts.values():
+            await h.client.aclose()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: sub-ms Redis/compute up to multi-second upstream stalls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels: str) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [non-cumulative bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[i] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(c), self._sums[k]) for k, c in self._counts.items())
+        lines = self.header()
+        for key, counts, total in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+class Registry:
+    """In-process metric registry rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+
+# Upstream (Binance REST)
+BINANCE_REQUEST_SECONDS = histogram(
+    "srr_binance_request_seconds", "Binance REST round-trip time, excluding governor wait", ("endpoint", "host")
+)
+BINANCE_QUEUE_SECONDS = histogram(
+    "srr_binance_queue_seconds", "Time spent waiting for the request governor", ("host",)
+)
+BINANCE_REQUEST_ERRORS = counter(
+    "srr_binance_request_errors_total", "Binance REST failures by status (or 'network')", ("endpoint", "host", "status")
+)
+
+# Collector
+COLLECTOR_TICK_SECONDS = histogram(
+    "srr_collector_tick_seconds", "Wall time of one collector tick, excluding the idle wait", ("mode",)
+)
+COLLECTOR_STAGE_SECONDS = histogram(
+    "srr_collector_stage_seconds", "Collector stage duration (fetch/compute/srs/rules/persist)", ("stage",)
+)
+COLLECTOR_SYMBOL_FAILURES = counter(
+    "srr_collector_symbol_failures_total", "Symbols dropped from a tick, by reason", ("symbol", "reason")
+)
+COLLECTOR_SYMBOLS = gauge("srr_collector_symbols", "Symbols in the last tick by outcome", ("outcome",))
+SOURCE_REFRESH_FAILURES = counter(
+    "srr_source_refresh_failures_total", "Scheduler source refresh failures", ("source",)
+)
+
+# Alerts
+ALERTS_TOTAL = counter(
+    "srr_alerts_total", "Confirmed traffic-light transitions by outcome (queued/cooldown/dropped)", ("outcome",)
+)
+ALERT_BATCHES = counter(
+    "srr_alert_batches_total", "Notification batches per channel by outcome (sent/failed)", ("channel", "outcome")
+)
+ALERT_DROPPED = counter("srr_alert_dropped_total", "Alerts dropped by a full channel queue", ("channel",))
+ALERT_DELIVERY_SECONDS = histogram(
+    "srr_alert_delivery_seconds",
+    "Transition detected to notification accepted by the channel",
+    ("channel",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+ALERT_QUEUE_DEPTH = gauge("srr_alert_queue_depth", "Alerts waiting per queue (dispatch or channel id)", ("queue",))
+
+# TimescaleDB history sink
+HISTORY_ROWS = counter(
+    "srr_history_rows_total", "History rows by outcome (points/snapshots written, retried, dropped)", ("outcome",)
+)
+HISTORY_FLUSH_SECONDS = histogram("srr_history_flush_seconds", "One COPY batch into TimescaleDB")
+HISTORY_BUFFER_ROWS = gauge("srr_history_buffer_rows", "Rows waiting for the next TimescaleDB flush")
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
@@ -1,12 +1,36 @@
 from __future__ import annotations
 
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import orjson
 from redis.asyncio import Redis
 
 from ..config import get_settings
+from .retention import (
+    ROLLUP_METRICS,
+    ROLLUP_WIDTH,
+    Tier,
+    aggregate_rows,
+    get_tiers,
+    project,
+    raw_chunk_ms,
+    raw_retention_ms,
+    raw_to_rows,
+    select_tier,
+    tier_by_name,
+)
+from .ts_codec import (
+    ROW_MAGIC,
+    chunk_start,
+    chunk_starts,
+    decode_chunks,
+    encode_row,
+    encode_rows,
+    is_sealed,
+    seal,
+)
 
 
 _settings = get_settings()
@@ -27,9 +51,25 @@ def get_redis() -> Redis:
 # Keys
 KEY_WATCHLIST = "srr:watchlist"
 KEY_SNAPSHOT = "srr:snapshot:{symbol}"
-KEY_TS = "srr:ts:{symbol}:{metric}"
+# Timeseries chunks (see ts_codec): raw points and rollup rows, bucketed by chunk start
+KEY_TS_CHUNK = "srr:tsc:{symbol}:{metric}:{chunk}"
+KEY_TS_ROLLUP_CHUNK = "srr:tsrc:{tier}:{symbol}:{metric}:{chunk}"
+KEY_TS_WATERMARK = "srr:tsr_wm:{tier}:{symbol}:{metric}"
+# Pre-chunk ZSET series, moved into chunks once by migrate_legacy_timeseries
+KEY_TS_LEGACY_PATTERN = "srr:ts:*"
+KEY_TS_ROLLUP_LEGACY_PATTERN = "srr:tsr:*"
+KEY_TS_MIGRATED = "srr:ts_migrated"
 KEY_FUNDING_INTERVAL = "srr:funding_interval:{symbol}"
 KEY_HAS_SPOT = "srr:has_spot:{symbol}"
+# Pub/sub channel announcing watchlist changes ("add:SYM" / "remove:SYM")
+CHANNEL_WATCHLIST = "srr:watchlist:events"
+# Pub/sub channel carrying every persisted tick: {"snapshots": {...}, "points": [[sym, metric, ts, v], ...]}
+CHANNEL_TICKS = "srr:ticks"
+KEY_TILES = "srr:tiles"
+KEY_RULES = "srr:rules"
+CHANNEL_RULES = "srr:rules:events"
+KEY_ALERTS = "srr:alerts"
+CHANNEL_ALERTS = "srr:alerts:events"
 
 
 async def ensure_default_watchlist() -> List[str]:
@@ -51,16 +91,84 @@ async def get_watchlist() -> List[str]:
 
 async def add_symbol(symbol: str) -> List[str]:
     redis = get_redis()
-    await redis.sadd(KEY_WATCHLIST, symbol.upper())
+    if await redis.sadd(KEY_WATCHLIST, symbol.upper()):
+        await redis.publish(CHANNEL_WATCHLIST, f"add:{symbol.upper()}")
     return await get_watchlist()
 
 
 async def remove_symbol(symbol: str) -> List[str]:
     redis = get_redis()
-    await redis.srem(KEY_WATCHLIST, symbol.upper())
+    if await redis.srem(KEY_WATCHLIST, symbol.upper()):
+        await redis.publish(CHANNEL_WATCHLIST, f"remove:{symbol.upper()}")
     return await get_watchlist()
 
 
+async def _channel_events(channel: str) -> AsyncIterator[str]:
+    pubsub = get_redis().pubsub()
+    try:
+        await pubsub.subscribe(channel)
+        yield "subscribed"
+        async for message in pubsub.listen():
+            if message.get("type") == "message":
+                data = message.get("data")
+                yield data.decode() if isinstance(data, bytes) else str(data)
+    finally:
+        await pubsub.aclose()
+
+
+def watchlist_events() -> AsyncIterator[str]:
+    """Yield watchlist change notifications.
+
+    Yields "subscribed" first (and the caller should reload the full watchlist then),
+    so changes made while the subscription was down are never missed.
+    """
+    return _channel_events(CHANNEL_WATCHLIST)
+
+
+async def get_rules_raw() -> Optional[bytes]:
+    """The stored rule set document (JSON), or None when the built-in defaults apply."""
+    return await get_redis().get(KEY_RULES)
+
+
+async def put_rules_raw(raw: Optional[bytes]) -> None:
+    """Store (or with None, delete) the rule set document and notify every process."""
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    if raw is None:
+        pipe.delete(KEY_RULES)
+    else:
+        pipe.set(KEY_RULES, raw)
+    pipe.publish(CHANNEL_RULES, "updated")
+    await pipe.execute()
+
+
+def rules_events() -> AsyncIterator[str]:
+    """Yield "subscribed", then one notification per rule set change."""
+    return _channel_events(CHANNEL_RULES)
+
+
+async def get_alerts_raw() -> Optional[bytes]:
+    """The stored alert configuration (JSON), or None when the environment defaults apply."""
+    return await get_redis().get(KEY_ALERTS)
+
+
+async def put_alerts_raw(raw: Optional[bytes]) -> None:
+    """Store (or with None, delete) the alert configuration and notify every process."""
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    if raw is None:
+        pipe.delete(KEY_ALERTS)
+    else:
+        pipe.set(KEY_ALERTS, raw)
+    pipe.publish(CHANNEL_ALERTS, "updated")
+    await pipe.execute()
+
+
+def alerts_events() -> AsyncIterator[str]:
+    """Yield "subscribed", then one notification per alert configuration change."""
+    return _channel_events(CHANNEL_ALERTS)
+
+
 async def put_snapshot(symbol: str, snapshot: Dict[str, Any]) -> None:
     redis = get_redis()
     key = KEY_SNAPSHOT.format(symbol=symbol.upper())
@@ -74,27 +182,374 @@ async def get_snapshot(symbol: str) -> Optional[Dict[str, Any]]:
     return orjson.loads(raw) if raw else None
 
 
+async def get_tiles_raw() -> Optional[bytes]:
+    """The serialized watchlist tiles document, exactly as the collector wrote it."""
+    return await get_redis().get(KEY_TILES)
+
+
+async def get_snapshots(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Latest snapshots for many symbols with one MGET; symbols without one are omitted."""
+    if not symbols:
+        return {}
+    raws = await get_redis().mget([KEY_SNAPSHOT.format(symbol=s.upper()) for s in symbols])
+    return {s.upper(): orjson.loads(raw) for s, raw in zip(symbols, raws) if raw}
+
+
+# Replace a chunk with its sealed form only if nothing was APPENDed since it was read;
+# chunks only ever grow, so an unchanged length means unchanged content
+_SEAL_SCRIPT = """
+if redis.call('STRLEN', KEYS[1]) == tonumber(ARGV[1]) then
+    return redis.call('SET', KEYS[1], ARGV[2], 'XX', 'KEEPTTL') and 1 or 0
+end
+return 0
+"""
+
+
+def _queue_seal(pipe: Any, key: str, buf: bytes, width: int) -> None:
+    pipe.eval(_SEAL_SCRIPT, 1, key, len(buf), seal(buf, width))
+
+
+def _queue_append(pipe: Any, key: str, ttl_ms: int, payload: bytes) -> None:
+    # Create the chunk with its header and TTL once; APPEND keeps the TTL
+    pipe.set(key, ROW_MAGIC, nx=True, px=ttl_ms)
+    pipe.append(key, payload)
+
+
+def _raw_chunk_key(symbol: str, metric: str, chunk: int) -> str:
+    return KEY_TS_CHUNK.format(symbol=symbol, metric=metric, chunk=chunk)
+
+
+def _live_range(lo_ms: int, hi_ms: int, retention_ms: int, span_ms: int) -> Tuple[int, int]:
+    """Clamp [lo_ms, hi_ms] to chunks that can still exist: older ones have expired and
+    none are written ahead of now, so a huge window never turns into millions of keys."""
+    now = _now_ms()
+    return max(lo_ms, now - retention_ms - span_ms), min(hi_ms, now + span_ms)
+
+
+def _raw_chunk_keys(symbol: str, metric: str, lo_ms: int, hi_ms: int) -> List[str]:
+    span = raw_chunk_ms()
+    lo_ms, hi_ms = _live_range(lo_ms, hi_ms, raw_retention_ms(), span)
+    return [_raw_chunk_key(symbol, metric, c) for c in chunk_starts(lo_ms, hi_ms, span)]
+
+
+def _rollup_chunk_keys(tier: Tier, symbol: str, metric: str, lo_ms: int, hi_ms: int) -> List[str]:
+    lo_ms, hi_ms = _live_range(lo_ms, hi_ms, tier.retention_ms, tier.chunk_ms)
+    return [
+        KEY_TS_ROLLUP_CHUNK.format(tier=tier.name, symbol=symbol, metric=metric, chunk=c)
+        for c in chunk_starts(lo_ms, hi_ms, tier.chunk_ms)
+    ]
+
+
+def _queue_raw_point(pipe: Any, symbol: str, metric: str, ts_ms: int, value: float) -> None:
+    span = raw_chunk_ms()
+    key = _raw_chunk_key(symbol.upper(), metric, chunk_start(ts_ms, span))
+    _queue_append(pipe, key, raw_retention_ms() + span, encode_row(ts_ms, (float(value),)))
+
+
+def _queue_rollup_rows(pipe: Any, tier: Tier, symbol: str, metric: str, ts: np.ndarray, rows: np.ndarray) -> None:
+    chunks = ts - ts % tier.chunk_ms
+    ttl_ms = tier.retention_ms + tier.chunk_ms
+    for chunk in np.unique(chunks):
+        mask = chunks == chunk
+        key = KEY_TS_ROLLUP_CHUNK.format(tier=tier.name, symbol=symbol, metric=metric, chunk=int(chunk))
+        _queue_append(pipe, key, ttl_ms, encode_rows(ts[mask], rows[mask]))
+
+
 async def push_timeseries_point(symbol: str, metric: str, ts_ms: int, value: float) -> None:
     redis = get_redis()
-    key = KEY_TS.format(symbol=symbol.upper(), metric=metric)
-    member = orjson.dumps([ts_ms, value])
-    await redis.zadd(key, {member: ts_ms})
+    pipe = redis.pipeline(transaction=False)
+    _queue_raw_point(pipe, symbol, metric, ts_ms, value)
+    await pipe.execute()
+
 
+def _tail_lag_ms(tier: Tier) -> int:
+    """How far a tier's watermark normally trails "now": one bucket plus compactor slack."""
+    return tier.bucket_ms + (2 * _settings.ts_compact_interval_sec + _settings.collect_interval_sec) * 1000
 
-async def get_timeseries(symbol: str, metric: str, since_ms: int) -> List[Tuple[int, float]]:
+
+async def get_timeseries_rows_many(
+    symbol: str,
+    metrics: List[str],
+    since_ms: int,
+    until_ms: Optional[int] = None,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """`{metric: (ts int64[n], rows float64[n, ROLLUP_WIDTH])}` for the window, each from the tier that covers it.
+
+    Windows inside the raw horizon come back at full resolution (as single-point rows).
+    Longer windows are served from the finest rollup tier still holding `since_ms`, with
+    the not-yet-compacted raw tail bucketed on the fly so the series reaches "now".
+
+    Every metric's chunks, watermark and raw tail go out on one pipeline. The tail is
+    read speculatively from where the watermark normally is; only a metric whose
+    compaction is further behind than that costs a second round trip.
+    """
+    redis = get_redis()
+    sym = symbol.upper()
+    now = until_ms if until_ms is not None else _now_ms()
+    pipe = redis.pipeline(transaction=False)
+    plans: List[Tuple[str, Optional[Tier], int]] = []
+    for metric in metrics:
+        tier = select_tier(since_ms, now) if metric in ROLLUP_METRICS else None
+        if tier is None:
+            pipe.mget(_raw_chunk_keys(sym, metric, since_ms, now))
+            plans.append((metric, None, since_ms))
+            continue
+        tail_guess = max(since_ms, now - _tail_lag_ms(tier))
+        pipe.get(KEY_TS_WATERMARK.format(tier=tier.name, symbol=sym, metric=metric))
+        pipe.mget(_rollup_chunk_keys(tier, sym, metric, since_ms, now))
+        pipe.mget(_raw_chunk_keys(sym, metric, tail_guess, now))
+        plans.append((metric, tier, tail_guess))
+    replies = iter(await pipe.execute())
+
+    out: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    late: List[Tuple[str, Tier, np.ndarray, np.ndarray, int]] = []
+    for metric, tier, tail_guess in plans:
+        if tier is None:
+            ts, values = decode_chunks(next(replies), 1, since_ms, now)
+            out[metric] = (ts, raw_to_rows(values[:, 0]))
+            continue
+        wm_raw, bufs, tail_bufs = next(replies), next(replies), next(replies)
+        ts, rows = decode_chunks(bufs, ROLLUP_WIDTH, since_ms, now)
+        tail_since = max(int(wm_raw) if wm_raw else since_ms, since_ms)
+        if tail_since < tail_guess:
+            late.append((metric, tier, ts, rows, tail_since))
+            continue
+        out[metric] = _with_tail(tier, ts, rows, tail_since, tail_bufs, now)
+
+    if late:
+        pipe = redis.pipeline(transaction=False)
+        for metric, _, _, _, tail_since in late:
+            pipe.mget(_raw_chunk_keys(sym, metric, tail_since, now))
+        for (metric, tier, ts, rows, tail_since), tail_bufs in zip(late, await pipe.execute()):
+            out[metric] = _with_tail(tier, ts, rows, tail_since, tail_bufs, now)
+    return out
+
+
+def _with_tail(
+    tier: Tier, ts: np.ndarray, rows: np.ndarray, tail_since: int, tail_bufs: List[Optional[bytes]], now: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    tail_ts, tail_values = decode_chunks(tail_bufs, 1, tail_since, now)
+    tail_ts, tail_rows = aggregate_rows(tail_ts, raw_to_rows(tail_values[:, 0]), tier.bucket_ms)
+    keep = ts < tail_since
+    return np.concatenate((ts[keep], tail_ts)), np.concatenate((rows[keep], tail_rows))
+
+
+async def get_timeseries_rows(
+    symbol: str,
+    metric: str,
+    since_ms: int,
+    until_ms: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return `(ts int64[n], rows float64[n, ROLLUP_WIDTH])` for one metric; see `get_timeseries_rows_many`."""
+    return (await get_timeseries_rows_many(symbol, [metric], since_ms, until_ms))[metric]
+
+
+async def get_timeseries_arrays(
+    symbol: str,
+    metric: str,
+    since_ms: int,
+    agg: str = "mean",
+    until_ms: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return `(ts int64[n], value float64[n])`; rollup rows are projected on `agg` (last/mean/min/max)."""
+    ts, rows = await get_timeseries_rows(symbol, metric, since_ms, until_ms)
+    return ts, project(rows, agg)
+
+
+async def get_timeseries(
+    symbol: str, metric: str, since_ms: int, agg: str = "mean"
+) -> List[Tuple[int, float]]:
+    ts, values = await get_timeseries_arrays(symbol, metric, since_ms, agg)
+    return list(zip(ts.tolist(), values.tolist()))
+
+
+async def compact_timeseries(symbols: List[str], now_ms: Optional[int] = None, grace_ms: int = 0) -> int:
+    """Roll raw points into the 1m/5m/1h tiers and seal closed chunks.
+
+    Only complete buckets (ending before `now_ms - grace_ms`) are rolled up; a per-tier
+    watermark records how far each series has been compacted so every bucket is written
+    exactly once. Source chunks that can no longer receive writes are rewritten in the
+    sealed columnar format on the way, atomically and only if no late row was appended
+    since they were read (such a chunk just stays in row format, which reads the same).
+    Retention itself is enforced by chunk TTLs.
+    Each tier costs two pipelined round trips for the whole watchlist.
+    Returns the number of rollup buckets written.
+    """
+    redis = get_redis()
+    now = now_ms if now_ms is not None else _now_ms()
+    horizon = now - grace_ms
+    tiers = tier_by_name()
+    pairs = [(s.upper(), m) for s in symbols for m in ROLLUP_METRICS]
+    written = 0
+    for tier in get_tiers():
+        if not pairs:
+            break
+        upper = horizon - horizon % tier.bucket_ms
+        if tier.source is None:
+            src_tier = None
+            src_span, src_retention, src_width = raw_chunk_ms(), raw_retention_ms(), 1
+        else:
+            src_tier = tiers[tier.source]
+            src_span, src_retention, src_width = src_tier.chunk_ms, src_tier.retention_ms, ROLLUP_WIDTH
+        wm_keys = [KEY_TS_WATERMARK.format(tier=tier.name, symbol=s, metric=m) for s, m in pairs]
+        wms = await redis.mget(wm_keys)
+
+        plans: List[Tuple[int, List[int], List[str]]] = []
+        pipe = redis.pipeline(transaction=False)
+        for (sym, metric), wm in zip(pairs, wms):
+            lo = int(wm) if wm else now - src_retention
+            starts = chunk_starts(lo, upper - 1, src_span)
+            if src_tier is None:
+                keys = [_raw_chunk_key(sym, metric, c) for c in starts]
+            else:
+                keys = _rollup_chunk_keys(src_tier, sym, metric, lo, upper - 1)
+            plans.append((lo, starts, keys))
+            if keys:
+                pipe.mget(keys)
+        fetched = iter(await pipe.execute())
+
+        pipe = redis.pipeline(transaction=False)
+        for (sym, metric), wm_key, (lo, starts, keys) in zip(pairs, wm_keys, plans):
+            if keys:
+                bufs = next(fetched)
+                ts, values = decode_chunks(bufs, src_width, lo, upper - 1)
+                rows = raw_to_rows(values[:, 0]) if src_tier is None else values
+                bucket_ts, bucket_rows = aggregate_rows(ts, rows, tier.bucket_ms)
+                if bucket_ts.size:
+                    _queue_rollup_rows(pipe, tier, sym, metric, bucket_ts, bucket_rows)
+                    written += int(bucket_ts.size)
+                for start, key, buf in zip(starts, keys, bufs):
+                    if buf and not is_sealed(buf) and start + src_span <= horizon:
+                        _queue_seal(pipe, key, buf, src_width)
+            pipe.set(wm_key, str(upper).encode())
+        await pipe.execute()
+    return written
+
+
+async def migrate_legacy_timeseries(batch: int = 200) -> int:
+    """Move the old `srr:ts:{symbol}:{metric}` / `srr:tsr:{tier}:{symbol}:{metric}` ZSETs into chunks.
+
+    Those keys never had a TTL, so without this they would hold memory forever and their
+    history would vanish from charts. Rows still inside their retention are appended to
+    the matching raw or rollup chunks (reads sort and de-duplicate, so mixing with newer
+    rows is safe); every legacy key is then deleted. A marker key makes it run once.
+    Returns the number of legacy keys removed.
+    """
+    redis = get_redis()
+    if await redis.exists(KEY_TS_MIGRATED):
+        return 0
+    now = _now_ms()
+    tiers = tier_by_name()
+    removed = 0
+    for pattern in (KEY_TS_LEGACY_PATTERN, KEY_TS_ROLLUP_LEGACY_PATTERN):
+        keys: List[bytes] = []
+        async for key in redis.scan_iter(match=pattern, count=1000):
+            keys.append(key)
+            if len(keys) >= batch:
+                removed += await _migrate_legacy_keys(keys, tiers, now)
+                keys = []
+        if keys:
+            removed += await _migrate_legacy_keys(keys, tiers, now)
+    await redis.set(KEY_TS_MIGRATED, str(now).encode())
+    return removed
+
+
+async def _migrate_legacy_keys(keys: List[bytes], tiers: Dict[str, Tier], now: int) -> int:
+    redis = get_redis()
+    plans: List[Tuple[bytes, Optional[Tier], str, str]] = []
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        parts = key.decode().split(":")
+        if parts[1] == "ts" and len(parts) == 4:
+            tier, sym, metric = None, parts[2], parts[3]
+            since = now - raw_retention_ms()
+        elif parts[1] == "tsr" and len(parts) == 5 and parts[2] in tiers:
+            tier, sym, metric = tiers[parts[2]], parts[3], parts[4]
+            since = now - tier.retention_ms
+        else:
+            continue
+        plans.append((key, tier, sym, metric))
+        pipe.zrangebyscore(key, since, now)
+    if not plans:
+        return 0
+    replies = await pipe.execute()
+
+    pipe = redis.pipeline(transaction=False)
+    for (key, tier, sym, metric), members in zip(plans, replies):
+        records = [orjson.loads(m) for m in members]
+        if records:
+            ts = np.array([r[0] for r in records], dtype=np.int64)
+            if tier is None:
+                span = raw_chunk_ms()
+                values = np.array([r[1] for r in records], dtype=np.float64)
+                chunks = ts - ts % span
+                for chunk in np.unique(chunks):
+                    mask = chunks == chunk
+                    _queue_append(
+                        pipe,
+                        _raw_chunk_key(sym, metric, int(chunk)),
+                        raw_retention_ms() + span,
+                        encode_rows(ts[mask], values[mask]),
+                    )
+            else:
+                rows = np.array([r[1:] for r in records], dtype=np.float64).reshape(-1, ROLLUP_WIDTH)
+                _queue_rollup_rows(pipe, tier, sym, metric, ts, rows)
+        pipe.delete(key)
+    await pipe.execute()
+    return len(plans)
+
+
+async def write_tick(
+    snapshots: Dict[str, Dict[str, Any]],
+    points: Iterable[Tuple[str, str, int, float]],
+    tiles: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> None:
+    """Persist every snapshot and timeseries point of a collector tick in one flush.
+
+    `points` are `(symbol, metric, ts_ms, value)` tuples. All commands are queued on a
+    single non-transactional pipeline so the cost is one Redis round trip regardless
+    of watchlist size. The tick is also published on CHANNEL_TICKS for live streams.
+    `tiles` (every watched symbol's tile, not only this tick's) replaces the
+    pre-serialized document served by `GET /metrics`.
+    """
     redis = get_redis()
-    key = KEY_TS.format(symbol=symbol.upper(), metric=metric)
-    members = await redis.zrangebyscore(key, since_ms, _now_ms())
-    points: List[Tuple[int, float]] = []
-    for m in members:
-        ts, val = orjson.loads(m)
-        points.append((int(ts), float(val)))
-    return points
+    pipe = redis.pipeline(transaction=False)
+    points = list(points)
+    for symbol, snapshot in snapshots.items():
+        pipe.set(KEY_SNAPSHOT.format(symbol=symbol.upper()), orjson.dumps(snapshot))
+    for symbol, metric, ts_ms, value in points:
+        _queue_raw_point(pipe, symbol, metric, ts_ms, value)
+    if tiles is not None:
+        pipe.set(KEY_TILES, orjson.dumps({"ts": _now_ms(), "tiles": tiles}))
+    if snapshots or points:
+        # Live subscribers (see services/stream_hub.py) get the tick in the same round trip
+        pipe.publish(CHANNEL_TICKS, orjson.dumps({"snapshots": snapshots, "points": points}))
+    if len(pipe):
+        await pipe.execute()
+
+
+async def get_timeseries_many(
+    symbols: List[str], metric: str, since_ms: int
+) -> Dict[str, List[Tuple[int, float]]]:
+    """Range-read one raw metric for many symbols in a single pipelined round trip."""
+    if not symbols:
+        return {}
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    now = _now_ms()
+    for symbol in symbols:
+        pipe.mget(_raw_chunk_keys(symbol.upper(), metric, since_ms, now))
+    results = await pipe.execute()
+    out: Dict[str, List[Tuple[int, float]]] = {}
+    for symbol, bufs in zip(symbols, results):
+        ts, values = decode_chunks(bufs, 1, since_ms, now)
+        out[symbol] = list(zip(ts.tolist(), values[:, 0].tolist()))
+    return out
 
 
 async def get_metric_values_since(symbol: str, metric: str, since_ms: int) -> List[float]:
-    points = await get_timeseries(symbol, metric, since_ms)
-    return [float(v) for _, v in points]
+    _, values = await get_timeseries_arrays(symbol, metric, since_ms)
+    return values.tolist()
 
 
 async def get_cached_funding_interval_hours(symbol: str) -> Optional[int]:
@@ -132,3 +587,18 @@ async def set_cached_has_spot(symbol: str, has_spot: bool, ttl_seconds: Optional
     if ttl_seconds is None:
         ttl_seconds = 7 * 24 * 3600 if has_spot else 3600
     await redis.setex(key, ttl_seconds, b"1" if has_spot else b"0")
+
+
+async def get_cached_has_spot_many(symbols: List[str]) -> Dict[str, Optional[bool]]:
+    if not symbols:
+        return {}
+    redis = get_redis()
+    vals = await redis.mget([KEY_HAS_SPOT.format(symbol=s.upper()) for s in symbols])
+    out: Dict[str, Optional[bool]] = {}
+    for symbol, val in zip(symbols, vals):
+        if not val:
+            out[symbol] = None
+            continue
+        raw = val.decode() if isinstance(val, (bytes, bytearray)) else val
+        out[symbol] = raw == "1"
+    return out
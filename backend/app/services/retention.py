@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import get_settings
+
+_settings = get_settings()
+
+# Rollup row columns: last, mean, min, max, count (bucket start is the row timestamp)
+ROLLUP_WIDTH = 5
+AGG_FIELDS = {"last": 0, "mean": 1, "min": 2, "max": 3}
+
+# Metrics rolled up into coarser tiers; every other metric only lives at raw horizon
+ROLLUP_METRICS = ("mark", "basis", "funding", "oi", "dominance", "imbalance")
+RAW_ONLY_METRICS = ("basis_1m",)
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    bucket_ms: int
+    retention_ms: int
+    chunk_ms: int
+    source: Optional[str]  # None -> built from raw points
+
+
+def raw_retention_ms() -> int:
+    return _settings.ts_raw_retention_sec * 1000
+
+
+def raw_chunk_ms() -> int:
+    return _settings.ts_raw_chunk_sec * 1000
+
+
+def get_tiers() -> List[Tier]:
+    """Rollup tiers ordered finest -> coarsest; each one is built from the previous."""
+    return [
+        Tier("1m", 60 * 1000, _settings.ts_1m_retention_sec * 1000, 86400 * 1000, None),
+        Tier("5m", 5 * 60 * 1000, _settings.ts_5m_retention_sec * 1000, 7 * 86400 * 1000, "1m"),
+        Tier("1h", 60 * 60 * 1000, _settings.ts_1h_retention_sec * 1000, 30 * 86400 * 1000, "5m"),
+    ]
+
+
+def max_retention_ms() -> int:
+    """The oldest point any tier still holds; longer windows cannot return more data."""
+    return max([raw_retention_ms()] + [t.retention_ms for t in get_tiers()])
+
+
+def select_tier(since_ms: int, now_ms: int) -> Optional[Tier]:
+    """Pick the finest tier that still holds `since_ms`; None means raw covers it."""
+    if since_ms >= now_ms - raw_retention_ms():
+        return None
+    tiers = get_tiers()
+    for tier in tiers:
+        if since_ms >= now_ms - tier.retention_ms:
+            return tier
+    return tiers[-1]
+
+
+def raw_to_rows(values: np.ndarray) -> np.ndarray:
+    v = np.asarray(values, dtype=np.float64).reshape(-1)
+    return np.column_stack((v, v, v, v, np.ones_like(v)))
+
+
+def aggregate_rows(ts: np.ndarray, rows: np.ndarray, bucket_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge time-ordered rows (raw or finer rollups) into `bucket_ms` buckets.
+
+    The mean is count-weighted so rolling 1m -> 5m -> 1h keeps the exact mean of
+    the underlying raw points.
+    """
+    if ts.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, ROLLUP_WIDTH), dtype=np.float64)
+    buckets = ts - ts % bucket_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], ts.size] - 1
+    counts = np.add.reduceat(rows[:, 4], starts)
+    sums = np.add.reduceat(rows[:, 1] * rows[:, 4], starts)
+    out = np.column_stack(
+        (
+            rows[ends, 0],
+            sums / np.maximum(counts, 1.0),
+            np.minimum.reduceat(rows[:, 2], starts),
+            np.maximum.reduceat(rows[:, 3], starts),
+            counts,
+        )
+    )
+    return buckets[starts], out
+
+
+def project(rows: np.ndarray, agg: str = "mean") -> np.ndarray:
+    return rows[:, AGG_FIELDS.get(agg, AGG_FIELDS["mean"])]
+
+
+def tier_by_name() -> Dict[str, Tier]:
+    return {t.name: t for t in get_tiers()}
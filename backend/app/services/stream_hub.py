@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from .redis_store import CHANNEL_TICKS, get_redis
+
+logger = logging.getLogger("srr.stream_hub")
+
+SUBSCRIBER_QUEUE_SIZE = 1024
+
+
+def sse_frame(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    """One live client: the symbols it follows and its bounded frame queue."""
+
+    def __init__(self, symbols: Optional[Set[str]], maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        self.symbols = symbols
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def wants(self, symbol: str) -> bool:
+        return self.symbols is None or symbol in self.symbols
+
+    def offer(self, frame: bytes) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too slow to keep up: the stream ends and the client resyncs on reconnect
+            self.overflowed = True
+
+
+class StreamHub:
+    """Per-process fan-out of collector ticks to live stream subscribers.
+
+    One Redis subscription to CHANNEL_TICKS per API process, however many clients are
+    connected. Each tick is diffed against the last snapshot seen per symbol and every
+    SSE frame is encoded once, then the same bytes are queued for each interested
+    subscriber, so a hundred viewers cost about as much as one.
+    """
+
+    def __init__(self, listen: bool = True) -> None:
+        self._listen = listen
+        self._subscribers: Set[Subscriber] = set()
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def last(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self._last.get(symbol)
+
+    def subscribe(self, symbols: Optional[Iterable[str]] = None) -> Subscriber:
+        sub = Subscriber({s.upper() for s in symbols} if symbols is not None else None)
+        self._subscribers.add(sub)
+        if self._listen and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+        if not self._subscribers and self._task is not None:
+            # Nobody is listening: stop consuming ticks and forget state that would go stale
+            self._task.cancel()
+            self._task = None
+            self._last.clear()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish_tick(self, snapshots: Dict[str, Dict[str, Any]], points: List[List[Any]]) -> None:
+        frames: Dict[str, List[bytes]] = {}
+        for sym, snap in snapshots.items():
+            prev = self._last.get(sym)
+            self._last[sym] = snap
+            if prev is None:
+                frames.setdefault(sym, []).append(sse_frame("snapshot", snap))
+                continue
+            delta = {k: v for k, v in snap.items() if prev.get(k) != v}
+            if delta:
+                delta["symbol"] = sym
+                delta["ts"] = snap.get("ts")
+                frames.setdefault(sym, []).append(sse_frame("delta", delta))
+        by_symbol: Dict[str, List[List[Any]]] = {}
+        for sym, metric, ts, value in points:
+            by_symbol.setdefault(sym, []).append([metric, ts, value])
+        for sym, rows in by_symbol.items():
+            frames.setdefault(sym, []).append(sse_frame("points", {"symbol": sym, "points": rows}))
+        if not frames:
+            return
+        for sub in list(self._subscribers):
+            for sym, sym_frames in frames.items():
+                if sub.wants(sym):
+                    for frame in sym_frames:
+                        sub.offer(frame)
+
+    async def _run(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL_TICKS)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    tick = orjson.loads(message["data"])
+                    self.publish_tick(tick.get("snapshots") or {}, tick.get("points") or [])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("tick subscription failed: %s", e)
+                await asyncio.sleep(2)
+            finally:
+                await pubsub.aclose()
+
+
+_hub: Optional[StreamHub] = None
+
+
+def get_stream_hub() -> StreamHub:
+    global _hub
+    if _hub is None:
+        _hub = StreamHub()
+    return _hub
@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+
+from ..config import get_settings
+from .instrumentation import HISTORY_BUFFER_ROWS, HISTORY_FLUSH_SECONDS, HISTORY_ROWS
+from .retention import ROLLUP_WIDTH
+
+logger = logging.getLogger("srr.timescale")
+
+Point = Tuple[str, str, int, float]
+SnapshotRow = Tuple[int, str, Mapping[str, Any]]
+
+RETRY_MAX_SEC = 30.0
+
+# Hypertables for raw points and sampled snapshots, plus 1m and 1h continuous aggregates.
+# Each statement runs on its own in autocommit: continuous aggregates cannot be created
+# inside a transaction block. Every statement is idempotent so startup can always run them.
+SCHEMA_STATEMENTS: Tuple[str, ...] = (
+    "CREATE EXTENSION IF NOT EXISTS timescaledb",
+    """CREATE TABLE IF NOT EXISTS srr_points (
+        ts timestamptz NOT NULL,
+        symbol text NOT NULL,
+        metric text NOT NULL,
+        value double precision
+    )""",
+    "SELECT create_hypertable('srr_points', 'ts', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE)",
+    "CREATE INDEX IF NOT EXISTS srr_points_symbol_metric_ts ON srr_points (symbol, metric, ts DESC)",
+    """CREATE TABLE IF NOT EXISTS srr_snapshots (
+        ts timestamptz NOT NULL,
+        symbol text NOT NULL,
+        snapshot jsonb NOT NULL
+    )""",
+    "SELECT create_hypertable('srr_snapshots', 'ts', chunk_time_interval => INTERVAL '1 day', if_not_exists => TRUE)",
+    "CREATE INDEX IF NOT EXISTS srr_snapshots_symbol_ts ON srr_snapshots (symbol, ts DESC)",
+    # Columns mirror the Redis rollup rows: last, mean, min, max, count
+    """CREATE MATERIALIZED VIEW IF NOT EXISTS srr_points_1m
+        WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+        SELECT time_bucket(INTERVAL '1 minute', ts) AS bucket, symbol, metric,
+               last(value, ts) AS value_last, avg(value) AS value_mean,
+               min(value) AS value_min, max(value) AS value_max, count(value) AS n
+        FROM srr_points GROUP BY bucket, symbol, metric WITH NO DATA""",
+    """SELECT add_continuous_aggregate_policy('srr_points_1m',
+        start_offset => INTERVAL '3 hours', end_offset => INTERVAL '1 minute',
+        schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE)""",
+    # Rolled up from the 1m aggregate; the mean is count-weighted as in retention.aggregate_rows
+    """CREATE MATERIALIZED VIEW IF NOT EXISTS srr_points_1h
+        WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+        SELECT time_bucket(INTERVAL '1 hour', bucket) AS bucket, symbol, metric,
+               last(value_last, bucket) AS value_last,
+               sum(value_mean * n) / NULLIF(sum(n), 0) AS value_mean,
+               min(value_min) AS value_min, max(value_max) AS value_max, sum(n) AS n
+        FROM srr_points_1m GROUP BY 1, symbol, metric WITH NO DATA""",
+    """SELECT add_continuous_aggregate_policy('srr_points_1h',
+        start_offset => INTERVAL '1 day', end_offset => INTERVAL '1 hour',
+        schedule_interval => INTERVAL '15 minutes', if_not_exists => TRUE)""",
+)
+
+# (source, bucket_ms): the coarsest source no wider than the requested resolution
+HISTORY_SOURCES: Tuple[Tuple[str, int], ...] = (
+    ("srr_points_1h", 3600 * 1000),
+    ("srr_points_1m", 60 * 1000),
+    ("srr_points", 0),
+)
+
+_RAW_QUERY = """SELECT metric, (extract(epoch FROM ts) * 1000)::bigint, value, value, value, value, 1
+    FROM srr_points
+    WHERE symbol = %s AND metric = ANY(%s) AND ts >= to_timestamp(%s / 1000.0) AND ts <= to_timestamp(%s / 1000.0)
+    ORDER BY metric, ts"""
+_ROLLUP_QUERY = """SELECT metric, (extract(epoch FROM bucket) * 1000)::bigint,
+        value_last, value_mean, value_min, value_max, n
+    FROM {source}
+    WHERE symbol = %s AND metric = ANY(%s) AND bucket >= to_timestamp(%s / 1000.0) AND bucket <= to_timestamp(%s / 1000.0)
+    ORDER BY metric, bucket"""
+
+
+def libpq_dsn(dsn: str) -> str:
+    """`Settings.postgres_dsn` is SQLAlchemy-style; psycopg2 wants the plain URL."""
+    return dsn.replace("postgresql+psycopg2://", "postgresql://", 1)
+
+
+def history_source(resolution_ms: Optional[int]) -> str:
+    resolution_ms = resolution_ms or 0
+    for source, bucket_ms in HISTORY_SOURCES:
+        if resolution_ms >= bucket_ms:
+            return source
+    return HISTORY_SOURCES[-1][0]
+
+
+def _timestamps(ts_ms: Sequence[int]) -> List[str]:
+    stamps = np.datetime_as_string(np.asarray(ts_ms, dtype="datetime64[ms]"), unit="ms", timezone="UTC")
+    return stamps.tolist()
+
+
+def encode_points(points: Sequence[Point]) -> bytes:
+    """COPY text rows `ts, symbol, metric, value`; non-finite values become NULL."""
+    if not points:
+        return b""
+    syms, metrics, ts, values = zip(*points)
+    lines = [
+        f"{t}\t{s}\t{m}\t{v!r}\n" if math.isfinite(v) else f"{t}\t{s}\t{m}\t\\N\n"
+        for t, s, m, v in zip(_timestamps(ts), syms, metrics, values)
+    ]
+    return "".join(lines).encode()
+
+
+def encode_snapshots(rows: Sequence[SnapshotRow]) -> bytes:
+    """COPY text rows `ts, symbol, snapshot`.
+
+    orjson already escapes control characters inside strings, so doubling backslashes
+    is the only escaping COPY's text format needs.
+    """
+    if not rows:
+        return b""
+    ts, syms, snaps = zip(*rows)
+    out = io.BytesIO()
+    for t, s, snap in zip(_timestamps(ts), syms, snaps):
+        out.write(f"{t}\t{s}\t".encode())
+        out.write(orjson.dumps(snap).replace(b"\\", b"\\\\"))
+        out.write(b"\n")
+    return out.getvalue()
+
+
+def rows_by_metric(metrics: Sequence[str], records: Iterable[Sequence[Any]]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Query records `(metric, ts_ms, last, mean, min, max, count)` as per-metric `(ts, rows)` arrays."""
+    grouped: Dict[str, List[Sequence[Any]]] = {m: [] for m in metrics}
+    for rec in records:
+        grouped.setdefault(rec[0], []).append(rec[1:])
+    out: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    for metric in metrics:
+        recs = grouped[metric]
+        if not recs:
+            out[metric] = (np.empty(0, dtype=np.int64), np.empty((0, ROLLUP_WIDTH), dtype=np.float64))
+            continue
+        arr = np.array(recs, dtype=np.float64)
+        out[metric] = (arr[:, 0].astype(np.int64), np.ascontiguousarray(arr[:, 1:]))
+    return out
+
+
+class HistoryWriter:
+    """Buffers collector output in memory and streams it into TimescaleDB with COPY.
+
+    `offer` runs inside the collector tick and never awaits or touches the database: it
+    appends references to the tick's points and (sampled every `snapshot_interval_sec`
+    per symbol) snapshots. Once the buffer holds `max_buffer_rows` further ticks are
+    dropped and counted, so a slow or unreachable database costs bounded memory and never
+    slows the tick. `run` flushes every `flush_interval_sec`, or as soon as `batch_rows`
+    are waiting; encoding and COPY happen on a worker thread. A failed batch is put back
+    when it still fits and retried with backoff.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        flush_interval_sec: float = 2.0,
+        batch_rows: int = 20_000,
+        max_buffer_rows: int = 200_000,
+        snapshot_interval_sec: float = 60.0,
+        pool_size: int = 4,
+        connect: Optional[Callable[[str], Any]] = None,
+    ) -> None:
+        self.dsn = dsn
+        self.flush_interval_sec = flush_interval_sec
+        self.batch_rows = max(1, batch_rows)
+        self.max_buffer_rows = max(self.batch_rows, max_buffer_rows)
+        self.snapshot_interval_ms = int(snapshot_interval_sec * 1000)
+        self.pool_size = max(1, pool_size)
+        self._connect = connect
+        self._points: List[Point] = []
+        self._snapshots: List[SnapshotRow] = []
+        self._last_snapshot: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._idle: List[Any] = []
+        self._open = 0
+        self._lock = threading.Lock()
+        self._available = threading.Semaphore(self.pool_size)
+        self.ready = False
+
+    @property
+    def buffered(self) -> int:
+        return len(self._points) + len(self._snapshots)
+
+    def offer(self, snapshots: Mapping[str, Mapping[str, Any]], points: Sequence[Point]) -> bool:
+        """Queue one tick for the next flush; False when the buffer is full and it was dropped."""
+        sampled: List[SnapshotRow] = []
+        now = int(time.time() * 1000)
+        for sym, snap in snapshots.items():
+            ts = int(snap["ts"]) if snap.get("ts") is not None else now
+            last = self._last_snapshot.get(sym)
+            if last is None or ts - last >= self.snapshot_interval_ms:
+                sampled.append((ts, sym, snap))
+        rows = len(points) + len(sampled)
+        if self.buffered + rows > self.max_buffer_rows:
+            HISTORY_ROWS.inc(rows, outcome="dropped")
+            return False
+        for ts, sym, _ in sampled:
+            self._last_snapshot[sym] = ts
+        self._points.extend(points)
+        self._snapshots.extend(sampled)
+        HISTORY_BUFFER_ROWS.set(self.buffered)
+        if self.buffered >= self.batch_rows:
+            self._wake.set()
+        return True
+
+    def _acquire(self) -> Any:
+        self._available.acquire()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            connect = self._connect
+            if connect is None:
+                import psycopg2
+
+                connect = psycopg2.connect
+            return connect(self.dsn)
+        except BaseException:
+            self._available.release()
+            raise
+
+    def _release(self, conn: Any, broken: bool = False) -> None:
+        try:
+            if broken:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            self._available.release()
+
+    def _run_sync(self, fn: Callable[[Any], Any]) -> Any:
+        conn = self._acquire()
+        try:
+            result = fn(conn)
+        except BaseException:
+            self._release(conn, broken=True)
+            raise
+        self._release(conn)
+        return result
+
+    def _ensure_schema(self, conn: Any) -> None:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            for statement in SCHEMA_STATEMENTS:
+                cur.execute(statement)
+        conn.autocommit = False
+
+    def _copy(self, conn: Any, points: Sequence[Point], snapshots: Sequence[SnapshotRow]) -> None:
+        with conn.cursor() as cur:
+            if points:
+                cur.copy_expert(
+                    "COPY srr_points (ts, symbol, metric, value) FROM STDIN", io.BytesIO(encode_points(points))
+                )
+            if snapshots:
+                cur.copy_expert(
+                    "COPY srr_snapshots (ts, symbol, snapshot) FROM STDIN", io.BytesIO(encode_snapshots(snapshots))
+                )
+        conn.commit()
+
+    def _query(
+        self, conn: Any, symbol: str, metrics: Sequence[str], since_ms: int, until_ms: int, source: str
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        sql = _RAW_QUERY if source == "srr_points" else _ROLLUP_QUERY.format(source=source)
+        with conn.cursor() as cur:
+            cur.execute(sql, (symbol, list(metrics), since_ms, until_ms))
+            records = cur.fetchall()
+        conn.rollback()
+        return rows_by_metric(metrics, records)
+
+    async def ensure_schema(self) -> None:
+        await asyncio.to_thread(self._run_sync, self._ensure_schema)
+        self.ready = True
+
+    async def flush(self) -> int:
+        """Write everything buffered in one transaction; returns the rows written."""
+        points, snapshots = self._points, self._snapshots
+        if not points and not snapshots:
+            return 0
+        self._points, self._snapshots = [], []
+        self._wake.clear()
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._run_sync, lambda conn: self._copy(conn, points, snapshots))
+        except Exception:
+            rows = len(points) + len(snapshots)
+            if self.buffered + rows <= self.max_buffer_rows:
+                # Put the batch back ahead of anything offered meanwhile
+                self._points[:0] = points
+                self._snapshots[:0] = snapshots
+                HISTORY_ROWS.inc(rows, outcome="retried")
+            else:
+                HISTORY_ROWS.inc(rows, outcome="dropped")
+            HISTORY_BUFFER_ROWS.set(self.buffered)
+            raise
+        HISTORY_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        HISTORY_ROWS.inc(len(points), outcome="points")
+        HISTORY_ROWS.inc(len(snapshots), outcome="snapshots")
+        HISTORY_BUFFER_ROWS.set(self.buffered)
+        return len(points) + len(snapshots)
+
+    async def rows_many(
+        self, symbol: str, metrics: Sequence[str], since_ms: int, until_ms: int, resolution_ms: Optional[int] = None
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Per-metric `(ts, rows)` like `get_timeseries_rows_many`, from the coarsest source
+        (1h or 1m continuous aggregate, else raw points) that still resolves `resolution_ms`."""
+        source = history_source(resolution_ms)
+        return await asyncio.to_thread(
+            self._run_sync, lambda conn: self._query(conn, symbol, metrics, since_ms, until_ms, source)
+        )
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """Create the schema, then flush until `stop_event` is set, with a final drain."""
+        backoff = 1.0
+        while not stop_event.is_set():
+            waiters = [asyncio.create_task(stop_event.wait())]
+            try:
+                if not self.ready:
+                    await self.ensure_schema()
+                else:
+                    await self.flush()
+                backoff = 1.0
+                timeout = self.flush_interval_sec
+                # A full batch wakes the loop early, but never during a retry backoff
+                waiters.append(asyncio.create_task(self._wake.wait()))
+            except Exception as e:
+                logger.warning("history write failed (retrying in %.0fs): %s", backoff, e)
+                timeout, backoff = backoff, min(backoff * 2, RETRY_MAX_SEC)
+            _, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+        if self.ready:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("final history flush failed, %d rows lost: %s", self.buffered, e)
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_writer: Optional[HistoryWriter] = None
+
+
+def get_history_writer() -> Optional[HistoryWriter]:
+    """The process-wide writer, or None when TIMESCALE_ENABLED is off."""
+    global _writer
+    settings = get_settings()
+    if _writer is None and settings.timescale_enabled:
+        _writer = HistoryWriter(
+            libpq_dsn(settings.postgres_dsn),
+            flush_interval_sec=settings.timescale_flush_interval_sec,
+            batch_rows=settings.timescale_batch_rows,
+            max_buffer_rows=settings.timescale_max_buffer_rows,
+            snapshot_interval_sec=settings.timescale_snapshot_interval_sec,
+            pool_size=settings.timescale_pool_size,
+        )
+    return _writer
+
+
+def offer_history(snapshots: Mapping[str, Mapping[str, Any]], points: Sequence[Point]) -> None:
+    writer = get_history_writer()
+    if writer is not None:
+        writer.offer(snapshots, points)
+
+
+async def get_history_rows_many(
+    symbol: str,
+    metrics: List[str],
+    since_ms: int,
+    until_ms: int,
+    resolution_ms: Optional[int] = None,
+    window_ms: Optional[int] = None,
+) -> Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """Rows as from `get_timeseries_rows_many`, read from TimescaleDB for windows of at least
+    TIMESCALE_QUERY_MIN_SEC; None when the caller should read Redis instead (sink disabled
+    or not ready, a short window, or a failed query). Pass the request's full `window_ms`
+    so incremental reads (a later `since_ms`) stay on the same source."""
+    writer = get_history_writer()
+    window_ms = window_ms if window_ms is not None else until_ms - since_ms
+    if writer is None or not writer.ready or window_ms < get_settings().timescale_query_min_sec * 1000:
+        return None
+    try:
+        return await writer.rows_many(symbol.upper(), metrics, since_ms, until_ms, resolution_ms)
+    except Exception as e:
+        logger.warning("history query failed for %s, reading Redis instead: %s", symbol, e)
+        return None
+
+
+async def run_history_writer(stop_event: asyncio.Event) -> None:
+    writer = get_history_writer()
+    if writer is None:
+        return
+    await writer.run(stop_event)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import struct
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Chunk formats for timeseries storage. Every chunk holds rows of one int64 timestamp
+# plus `width` float64 columns (width=1 for raw points, 5 for rollups).
+#
+# Row chunk (open, appendable):  ROW_MAGIC | n * (<i8 ts, width * <f8)
+# Sealed chunk (closed, columnar): SEALED header | ts column | width value columns
+#   ts column is either n * <i8, or with FLAG_DELTA32 one <i8 base + (n-1) * <i4 deltas.
+# Rows appended to a chunk after it was sealed are kept as trailing row records.
+ROW_MAGIC = b"SRR\x00"
+SEALED_MAGIC = b"SRC\x01"
+FLAG_DELTA32 = 1
+
+_SEALED_HEADER = struct.Struct("<4sIBB")  # magic, n, width, flags
+_I32_MAX = np.iinfo(np.int32).max
+
+
+def row_dtype(width: int) -> np.dtype:
+    return np.dtype([("ts", "<i8"), ("v", "<f8", (width,))])
+
+
+def chunk_start(ts_ms: int, span_ms: int) -> int:
+    return ts_ms - ts_ms % span_ms
+
+
+def chunk_starts(lo_ms: int, hi_ms: int, span_ms: int) -> List[int]:
+    """Start of every chunk overlapping [lo_ms, hi_ms]."""
+    if hi_ms < lo_ms:
+        return []
+    return list(range(chunk_start(lo_ms, span_ms), hi_ms + 1, span_ms))
+
+
+def encode_row(ts_ms: int, values: Sequence[float]) -> bytes:
+    return struct.pack(f"<q{len(values)}d", ts_ms, *values)
+
+
+def encode_rows(ts: np.ndarray, values: np.ndarray) -> bytes:
+    values = values.reshape(len(ts), -1)
+    arr = np.empty(len(ts), dtype=row_dtype(values.shape[1]))
+    arr["ts"] = ts
+    arr["v"] = values
+    return arr.tobytes()
+
+
+def is_sealed(buf: bytes) -> bool:
+    return buf[:4] == SEALED_MAGIC
+
+
+def _decode_row_records(buf: bytes, width: int, offset: int) -> Tuple[np.ndarray, np.ndarray]:
+    dtype = row_dtype(width)
+    count = (len(buf) - offset) // dtype.itemsize
+    arr = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+    return arr["ts"], arr["v"]
+
+
+def seal(buf: bytes, width: int) -> bytes:
+    """Rewrite a row chunk as a columnar chunk with delta-encoded timestamps."""
+    ts, values = decode_chunk(buf, width)
+    order = np.argsort(ts, kind="stable")
+    ts, values = ts[order], values[order]
+    n = len(ts)
+    flags = 0
+    deltas = np.diff(ts)
+    if n and (deltas.size == 0 or (deltas.min() >= 0 and deltas.max() <= _I32_MAX)):
+        flags |= FLAG_DELTA32
+        ts_payload = ts[:1].astype("<i8").tobytes() + deltas.astype("<i4").tobytes()
+    else:
+        ts_payload = ts.astype("<i8").tobytes()
+    cols = np.ascontiguousarray(values.T, dtype="<f8").tobytes()
+    return _SEALED_HEADER.pack(SEALED_MAGIC, n, width, flags) + ts_payload + cols
+
+
+def decode_chunk(buf: bytes, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode one chunk into (ts int64[n], values float64[n, width]) without copying rows."""
+    if not buf:
+        return np.empty(0, dtype=np.int64), np.empty((0, width), dtype=np.float64)
+    magic = buf[:4]
+    if magic == ROW_MAGIC:
+        return _decode_row_records(buf, width, 4)
+    if magic != SEALED_MAGIC:
+        raise ValueError("unknown timeseries chunk format")
+    _, n, stored_width, flags = _SEALED_HEADER.unpack_from(buf)
+    if stored_width != width:
+        raise ValueError(f"chunk width {stored_width} != expected {width}")
+    pos = _SEALED_HEADER.size
+    if n == 0:
+        ts = np.empty(0, dtype=np.int64)
+    elif flags & FLAG_DELTA32:
+        base = np.frombuffer(buf, dtype="<i8", count=1, offset=pos)
+        deltas = np.frombuffer(buf, dtype="<i4", count=n - 1, offset=pos + 8)
+        ts = np.cumsum(np.concatenate((base, deltas.astype(np.int64))))
+        pos += 8 + 4 * (n - 1)
+    else:
+        ts = np.frombuffer(buf, dtype="<i8", count=n, offset=pos)
+        pos += 8 * n
+    values = np.frombuffer(buf, dtype="<f8", count=n * width, offset=pos).reshape(width, n).T
+    pos += 8 * n * width
+    if pos < len(buf):
+        late_ts, late_values = _decode_row_records(buf, width, pos)
+        ts = np.concatenate((ts, late_ts))
+        values = np.concatenate((values, late_values))
+    return ts, values
+
+
+def decode_chunks(
+    bufs: Iterable[bytes], width: int, lo_ms: int, hi_ms: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Decode and concatenate chunks, keep rows within [lo_ms, hi_ms], sorted by ts.
+
+    When a timestamp occurs more than once the last written row wins.
+    """
+    parts = [decode_chunk(b, width) for b in bufs if b]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, width), dtype=np.float64)
+    ts = np.concatenate([p[0] for p in parts])
+    values = np.concatenate([p[1] for p in parts])
+    mask = (ts >= lo_ms) & (ts <= hi_ms)
+    ts, values = ts[mask], values[mask]
+    if ts.size > 1 and (np.any(np.diff(ts) <= 0)):
+        # Reverse so np.unique's first-occurrence index picks the last written row
+        rev_ts = ts[::-1]
+        uniq, idx = np.unique(rev_ts, return_index=True)
+        ts, values = uniq, values[::-1][idx]
+    return ts, values
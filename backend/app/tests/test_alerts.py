@@ -0,0 +1,223 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from app.services.alerts import (
+    AlertConfigError,
+    AlertDispatcher,
+    ChannelSender,
+    parse_alert_config,
+    redact_alert_config,
+)
+from app.services.instrumentation import ALERT_BATCHES, ALERT_DELIVERY_SECONDS, ALERTS_TOTAL
+
+
+def _snap(state, ts, srs=50):
+    return {"traffic_light": state, "ts": ts, "srs": srs, "rule_reasons": [f"{state.lower()} reason"]}
+
+
+def _queued(dispatcher):
+    items = []
+    while not dispatcher._queue.empty():
+        items.append(dispatcher._queue.get_nowait()[1])
+    return items
+
+
+def test_debounce_and_cooldown():
+    async def scenario():
+        d = AlertDispatcher()
+        d.configure(parse_alert_config({"debounce_sec": 20, "cooldown_sec": 600}))
+        d.observe({"BTCUSDT": _snap("YELLOW", 0)})  # baseline, no alert
+        d.observe({"BTCUSDT": _snap("RED", 10_000)})
+        d.observe({"BTCUSDT": _snap("YELLOW", 20_000)})  # flicker resets the debounce
+        d.observe({"BTCUSDT": _snap("RED", 30_000)})
+        assert _queued(d) == []
+        d.observe({"BTCUSDT": _snap("RED", 50_000)})
+        [alert] = _queued(d)
+        assert alert["from"] == "YELLOW" and alert["to"] == "RED" and alert["reasons"] == ["red reason"]
+
+        cooled = ALERTS_TOTAL.value(outcome="cooldown")
+        d.observe({"BTCUSDT": _snap("GREEN", 100_000)})
+        d.observe({"BTCUSDT": _snap("GREEN", 120_000)})
+        assert _queued(d) == [] and ALERTS_TOTAL.value(outcome="cooldown") == cooled + 1
+        d.observe({"BTCUSDT": _snap("YELLOW", 700_000)})  # not an alerting state
+        d.observe({"BTCUSDT": _snap("YELLOW", 720_000)})
+        d.observe({"BTCUSDT": _snap("RED", 800_000)})
+        d.observe({"BTCUSDT": _snap("RED", 820_000)})
+        assert [a["to"] for a in _queued(d)] == ["RED"]
+
+    asyncio.run(scenario())
+
+
+def test_batches_with_retries_against_stand_in():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.url.host == "hooks.test" and len([c for c in calls if c.url.host == "hooks.test"]) == 1:
+            return httpx.Response(503)
+        if request.url.host == "tg.test" and len([c for c in calls if c.url.host == "tg.test"]) == 1:
+            return httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 0.01}})
+        return httpx.Response(200, json={"ok": True})
+
+    config = {
+        "channels": [
+            {"id": "hook", "type": "webhook", "url": "http://hooks.test/alerts"},
+            {"id": "tg", "type": "telegram", "token": "T0K", "chat_id": "42", "api_base": "http://tg.test"},
+        ],
+        "debounce_sec": 0,
+        "batch_window_sec": 0.05,
+        "retry_base_sec": 0.01,
+    }
+
+    async def scenario():
+        d = AlertDispatcher(transport=httpx.MockTransport(handler))
+        d.load(orjson.dumps(config))
+        stop = asyncio.Event()
+        task = asyncio.create_task(d.run(stop))
+        d.observe({s: _snap("YELLOW", 0) for s in ("A", "B", "C")})
+        d.observe({s: _snap("RED", 1_000) for s in ("A", "B", "C")})
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(calls) >= 4:
+                break
+        stop.set()
+        await task
+
+    sent = ALERT_BATCHES.value(channel="hook", outcome="sent")
+    observed = ALERT_DELIVERY_SECONDS.count(channel="hook")
+    asyncio.run(scenario())
+    hook = [c for c in calls if c.url.host == "hooks.test"]
+    tg = [c for c in calls if c.url.host == "tg.test"]
+    assert len(hook) == 2 and len(tg) == 2  # one retry each, one batch each
+    assert [a["symbol"] for a in orjson.loads(hook[-1].content)["alerts"]] == ["A", "B", "C"]
+    body = orjson.loads(tg[-1].content)
+    assert tg[-1].url.path == "/botT0K/sendMessage" and body["chat_id"] == "42"
+    assert "A: YELLOW -> RED" in body["text"]
+    assert ALERT_BATCHES.value(channel="hook", outcome="sent") == sent + 1
+    assert ALERT_DELIVERY_SECONDS.count(channel="hook") == observed + 3
+
+
+def test_full_channel_queue_drops_oldest():
+    async def scenario():
+        sender = ChannelSender({"id": "x", "type": "webhook", "url": "http://x"}, parse_alert_config({}), None)
+        for i in range(sender.queue.maxsize + 5):
+            sender.offer((0.0, {"n": i}))
+        assert sender.queue.qsize() == sender.queue.maxsize
+        assert sender.queue.get_nowait()[1]["n"] == 5
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        {"channels": [{"type": "sms"}]},
+        {"channels": [{"type": "webhook"}]},
+        {
+            "channels": [
+                {"id": "a", "type": "webhook", "url": "http://u"},
+                {"id": "a", "type": "webhook", "url": "http://v"},
+            ]
+        },
+        {"channels": [{"type": "webhook", "url": "hooks.test/alerts"}]},
+        {"channels": [{"type": "webhook", "url": "ftp://hooks.test/alerts"}]},
+        {"channels": [{"type": "webhook", "url": "http:///alerts"}]},
+        {"channels": [{"type": "telegram", "token": "T", "chat_id": "1", "api_base": "tg.test"}]},
+        {"states": ["PURPLE"]},
+        {"batch_max": 0},
+        {"cooldown": 5},
+    ],
+)
+def test_invalid_alert_configs_are_rejected(doc):
+    with pytest.raises(AlertConfigError):
+        parse_alert_config(doc)
+
+
+def test_unexpected_delivery_errors_do_not_stop_the_channel(monkeypatch):
+    async def scenario():
+        sender = ChannelSender(
+            {"id": "crash", "type": "webhook", "url": "http://x"}, parse_alert_config({"batch_window_sec": 0}), None
+        )
+        delivered = []
+
+        async def deliver(batch):
+            if not delivered:
+                delivered.append(None)
+                raise KeyError("symbol")
+            delivered.append([alert["n"] for _, alert in batch])
+            return True
+
+        monkeypatch.setattr(sender, "deliver", deliver)
+        task = asyncio.create_task(sender.run())
+        sender.offer((0.0, {"n": 1}))
+        await asyncio.sleep(0.01)
+        sender.offer((0.0, {"n": 2}))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(delivered) == 2:
+                break
+        task.cancel()
+        return delivered
+
+    failed = ALERT_BATCHES.value(channel="crash", outcome="failed")
+    assert asyncio.run(scenario()) == [None, [2]]
+    assert ALERT_BATCHES.value(channel="crash", outcome="failed") == failed + 1
+
+
+def test_reconfigure_keeps_the_in_flight_batch():
+    calls = []
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) == 1:
+            await release.wait()  # first delivery hangs until the reconfigure cancels it
+        return httpx.Response(200)
+
+    hook = {"id": "hook", "type": "webhook", "url": "http://hooks.test/alerts"}
+    config = {"channels": [hook], "debounce_sec": 0, "batch_window_sec": 0}
+
+    async def scenario():
+        d = AlertDispatcher(transport=httpx.MockTransport(handler))
+        d.load(orjson.dumps(config))
+        stop = asyncio.Event()
+        task = asyncio.create_task(d.run(stop))
+        d.observe({"A": _snap("YELLOW", 0)})
+        d.observe({"A": _snap("RED", 1_000)})
+        while not calls:
+            await asyncio.sleep(0.01)
+        d.load(orjson.dumps({**config, "cooldown_sec": 1}))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(calls) >= 2:
+                break
+        stop.set()
+        await task
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert [a["symbol"] for a in orjson.loads(calls[-1].content)["alerts"]] == ["A"]
+
+
+def test_redaction_masks_tokens_headers_and_webhook_paths():
+    config = parse_alert_config(
+        {
+            "channels": [
+                {
+                    "id": "hook",
+                    "type": "webhook",
+                    "url": "https://hooks.example/services/T000/B000/secret?key=abc",
+                    "headers": {"Authorization": "Bearer s3cret"},
+                },
+                {"id": "tg", "type": "telegram", "token": "123:ABCDEF", "chat_id": "42"},
+            ]
+        }
+    )
+    hook, tg = redact_alert_config(config)["channels"]
+    assert hook["url"] == "https://hooks.example/***"
+    assert hook["headers"] == {"Authorization": "***"}
+    assert tg["token"] == "***CDEF"
+    assert config["channels"][0]["headers"]["Authorization"] == "Bearer s3cret"
@@ -0,0 +1,74 @@
+import asyncio
+
+from app.collectors.coalescer import WriteCoalescer
+
+
+def test_updates_merge_and_flush_once_with_downsampled_points():
+    writes = []
+
+    async def writer(snapshots, points, tiles):
+        writes.append((snapshots, list(points), tiles))
+
+    async def run():
+        c = WriteCoalescer(flush_ms=250, resolution_ms=10_000, writer=writer)
+        c.update("BTCUSDT", {"ts": 1_000, "mark": 100.0, "fut_vol24_usdt": 5.0})
+        c.update("BTCUSDT", {"ts": 2_000, "mark": 101.0})
+        c.update("ETHUSDT", {"ts": 2_000, "mark": 10.0})
+        assert await c.flush() == 2
+        c.update("BTCUSDT", {"ts": 3_000, "mark": 102.0})  # same 10s bucket: snapshot only
+        await c.flush()
+        c.update("BTCUSDT", {"ts": 11_000, "mark": 103.0})  # next bucket: points again
+        await c.flush()
+        assert await c.flush() == 0  # nothing dirty
+
+    asyncio.run(run())
+    assert len(writes) == 3
+    first, points, _ = writes[0]
+    assert first["BTCUSDT"] == {"ts": 2_000, "mark": 101.0, "fut_vol24_usdt": 5.0}
+    assert {p[0] for p in points} == {"BTCUSDT", "ETHUSDT"}
+    assert writes[1][1] == []
+    assert ("BTCUSDT", "mark", 11_000, 103.0) in writes[2][1]
+
+
+def test_failed_flush_is_retried_with_latest_state():
+    calls = []
+
+    async def writer(snapshots, points, tiles):
+        calls.append(dict(snapshots))
+        if len(calls) == 1:
+            raise ConnectionError("redis down")
+
+    async def run():
+        c = WriteCoalescer(flush_ms=250, resolution_ms=1_000, writer=writer)
+        c.update("BTCUSDT", {"ts": 1_000, "mark": 100.0})
+        assert await c.flush() == 0
+        c.update("BTCUSDT", {"ts": 1_500, "mark": 100.5})
+        assert await c.flush() == 1
+
+    asyncio.run(run())
+    assert calls[1]["BTCUSDT"]["mark"] == 100.5
+
+
+def test_tiles_cover_every_known_symbol_and_drop_forgotten_ones():
+    writes = []
+
+    async def writer(snapshots, points, tiles):
+        writes.append((set(snapshots), tiles))
+
+    async def run():
+        c = WriteCoalescer(flush_ms=250, resolution_ms=1_000, writer=writer)
+        c.update("BTCUSDT", {"symbol": "BTCUSDT", "ts": 1_000, "srs": 40, "depth_bands": []})
+        c.update("ETHUSDT", {"symbol": "ETHUSDT", "ts": 1_000, "srs": 20})
+        await c.flush()
+        c.update("BTCUSDT", {"ts": 2_000, "srs": 45})
+        await c.flush()
+        c.forget("ETHUSDT")
+        c.update("BTCUSDT", {"ts": 3_000})
+        await c.flush()
+
+    asyncio.run(run())
+    dirty, tiles = writes[1]
+    assert dirty == {"BTCUSDT"}
+    assert set(tiles) == {"BTCUSDT", "ETHUSDT"}
+    assert tiles["BTCUSDT"]["srs"] == 45 and "depth_bands" not in tiles["BTCUSDT"]
+    assert set(writes[2][1]) == {"BTCUSDT"}
@@ -0,0 +1,48 @@
+import numpy as np
+
+from app.analytics.depth import depth_arrays, depth_metrics
+from app.analytics.metrics import calc_orderbook_imbalance
+
+
+def _loop_band(depth, mid, pct):
+    lo, hi = mid * (1 - pct / 100), mid * (1 + pct / 100)
+    bids = sum(float(q) for p, q in depth["bids"] if lo <= float(p) <= hi)
+    asks = sum(float(q) for p, q in depth["asks"] if lo <= float(p) <= hi)
+    return bids, asks
+
+
+def test_bands_match_reference_loop():
+    rng = np.random.default_rng(1)
+    bid_px = 100 - np.cumsum(rng.uniform(0.01, 0.2, 300))
+    ask_px = 100.1 + np.cumsum(rng.uniform(0.01, 0.2, 300))
+    depth = {
+        "bids": [[f"{p:.4f}", f"{q:.3f}"] for p, q in zip(bid_px, rng.uniform(0.1, 5, 300))],
+        "asks": [[f"{p:.4f}", f"{q:.3f}"] for p, q in zip(ask_px, rng.uniform(0.1, 5, 300))],
+    }
+    out = depth_metrics(depth_arrays(depth), 100.0)
+    mid = (float(depth["bids"][0][0]) + float(depth["asks"][0][0])) / 2
+    for band in out["depth_bands"]:
+        bids, asks = _loop_band(depth, mid, band["band_pct"])
+        assert abs(band["bid_qty"] - bids) < 1e-6
+        assert abs(band["ask_qty"] - asks) < 1e-6
+        assert abs(band["imbalance"] - calc_orderbook_imbalance(bids, asks)) < 1e-9
+    two = next(b for b in out["depth_bands"] if b["band_pct"] == 2.0)
+    assert out["orderbook_imbalance"] == two["imbalance"]
+
+
+def test_slippage_walks_the_book():
+    depth = {"bids": [["99", "10"], ["98", "10"]], "asks": [["101", "10"], ["102", "10"]]}
+    out = depth_metrics(depth_arrays(depth), 100.0, bands_pct=(1.0,), slippage_sizes_usdt=(505.0, 1520.0, 1e6))
+    small, large, huge = out["slippage"]
+    # 505 USDT fills at 101 only: +100 bps vs mid 100
+    assert abs(small["buy_bps"] - 100.0) < 1e-9
+    assert abs(small["sell_bps"] - 100.0) < 1e-9
+    # 1520 USDT buys 10 @101 then 5 @102 -> avg 101.333
+    assert abs(large["buy_bps"] - (1520 / 15 / 100 - 1) * 1e4) < 1e-9
+    assert huge["buy_bps"] is None and huge["sell_bps"] is None
+
+
+def test_empty_book():
+    out = depth_metrics(depth_arrays({"bids": [], "asks": []}), 100.0)
+    assert out["orderbook_imbalance"] == 0.0
+    assert all(s["buy_bps"] is None for s in out["slippage"])
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.services.downsample import as_of, bucket_for_max_points, lttb, ohlc, parse_duration_ms
+from app.services.retention import aggregate_rows, raw_to_rows
+
+
+def test_ohlc_from_raw_points():
+    ts = np.array([0, 10_000, 20_000, 60_000, 70_000], dtype=np.int64)
+    rows = raw_to_rows(np.array([5.0, 7.0, 4.0, 6.0, 8.0]))
+    bucket_ts, candles = ohlc(ts, rows, 60_000)
+    assert bucket_ts.tolist() == [0, 60_000]
+    assert candles.tolist() == [[5.0, 7.0, 4.0, 4.0], [6.0, 8.0, 6.0, 8.0]]
+
+
+def test_ohlc_from_rollup_rows_keeps_extremes():
+    ts = np.arange(0, 120_000, 1_000, dtype=np.int64)
+    values = np.sin(ts / 7_000.0)
+    minutes = aggregate_rows(ts, raw_to_rows(values), 10_000)
+    _, candles = ohlc(*minutes, 60_000)
+    assert np.allclose(candles[:, 1], [values[:60].max(), values[60:].max()])
+    assert np.allclose(candles[:, 2], [values[:60].min(), values[60:].min()])
+    assert np.allclose(candles[:, 3], [values[59], values[119]])
+
+
+def test_bucket_widens_to_respect_max_points():
+    span = 72 * 3600 * 1000
+    bucket = bucket_for_max_points(60_000, span, 1000)
+    assert bucket % 60_000 == 0
+    assert span // bucket + 1 <= 1000
+    assert bucket_for_max_points(60_000, 3600 * 1000, 1000) == 60_000
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    ts = np.arange(10_000, dtype=np.int64) * 1_000
+    values = np.zeros(10_000)
+    values[4_321] = 50.0
+    keep = lttb(ts, values, 200)
+    assert keep.size == 200
+    assert keep[0] == 0 and keep[-1] == 9_999
+    assert 4_321 in keep.tolist()
+    assert np.all(np.diff(keep) > 0)
+    assert lttb(ts[:50], values[:50], 200).tolist() == list(range(50))
+
+
+def test_parse_duration():
+    assert parse_duration_ms("90s") == 90_000
+    assert parse_duration_ms("48h") == 48 * 3600 * 1000
+    assert parse_duration_ms("7d") == 7 * 86400 * 1000
+    assert parse_duration_ms("1x") is None and parse_duration_ms("") is None
+
+
+def _route(monkeypatch, ts, values, **params):
+    import asyncio
+
+    import orjson
+
+    from app.routers import timeseries
+
+    async def rows(symbol, metric, since_ms, until_ms=None):
+        mask = ts >= since_ms
+        return ts[mask], raw_to_rows(values[mask])
+
+    monkeypatch.setattr(timeseries, "get_timeseries_rows", rows)
+    monkeypatch.setattr(timeseries.time, "time", lambda: float(ts[-1]) / 1000)
+    defaults = dict(metric="basis", interval="1m", window="1h", agg=None, max_points=1500, since=None, if_none_match=None)
+    resp = asyncio.run(timeseries.get_timeseries_route("btcusdt", **{**defaults, **params}))
+    return resp, orjson.loads(resp.body) if resp.body else None
+
+
+def test_since_cursor_returns_only_the_tail_and_etag_revalidates(monkeypatch):
+    ts = np.arange(0, 3_600_000, 10_000, dtype=np.int64)
+    values = np.arange(ts.size, dtype=np.float64)
+    full_resp, full = _route(monkeypatch, ts, values)
+    assert full["next_cursor"] == full["points"][-1]["ts"]
+
+    resp, tail = _route(monkeypatch, ts, values, since=full["next_cursor"])
+    assert tail["points"] == full["points"][-1:]
+
+    etag = resp.headers["etag"]
+    not_modified, _ = _route(monkeypatch, ts, values, since=full["next_cursor"], if_none_match=etag)
+    assert not_modified.status_code == 304
+    assert full_resp.headers["etag"] != etag
+
+
+def test_as_of_carries_latest_value_within_tolerance():
+    ts = np.array([0, 60_000, 300_000], dtype=np.int64)
+    values = np.array([1.0, 2.0, 3.0])
+    grid = np.arange(-60_000, 420_000, 60_000, dtype=np.int64)
+    out = as_of(grid, ts, values, 120_000)
+    assert np.isnan(out[0])
+    assert out[1:].tolist()[:4] == [1.0, 2.0, 2.0, 2.0]
+    assert np.isnan(out[5]) and out[6:].tolist() == [3.0, 3.0]
+
+
+def test_aligned_route_returns_one_grid_for_all_metrics(monkeypatch):
+    import asyncio
+
+    import orjson
+
+    from app.routers import timeseries
+
+    now = 3_600_000
+    seen = []
+
+    async def rows_many(symbol, metrics, since_ms, until_ms=None):
+        seen.append(list(metrics))
+        fast = np.arange(0, now, 10_000, dtype=np.int64)
+        slow = np.arange(0, now, 300_000, dtype=np.int64)
+        return {
+            "mark": (fast, raw_to_rows(fast / 1000.0)),
+            "oi": (slow, raw_to_rows(np.ones(slow.size))),
+        }
+
+    monkeypatch.setattr(timeseries, "get_timeseries_rows_many", rows_many)
+    monkeypatch.setattr(timeseries.time, "time", lambda: now / 1000)
+    resp = asyncio.run(
+        timeseries.get_aligned_timeseries(
+            "btcusdt", metrics="mark,oi", interval="1m", window="1h", agg="last",
+            tolerance="5m", max_points=1500, since=None, if_none_match=None,
+        )
+    )
+    body = orjson.loads(resp.body)
+    assert seen == [["mark", "oi"]]
+    assert len(body["ts"]) == len(body["series"]["mark"]) == len(body["series"]["oi"]) == 61
+    assert body["series"]["mark"][1] == 110.0  # last point of the 60s bucket
+    assert body["series"]["oi"][:7] == [1.0] * 7  # 5m series carried forward
+    assert body["next_cursor"] == body["ts"][-1] == now
+
+
+@pytest.mark.parametrize("window", ["100000d", "2 days", "48", "0h"])
+def test_window_beyond_retention_or_malformed_is_rejected(monkeypatch, window):
+    ts = np.arange(0, 3600_000, 10_000, dtype=np.int64)
+    with pytest.raises(HTTPException) as exc:
+        _route(monkeypatch, ts, np.ones(ts.size), window=window)
+    assert exc.value.status_code == 400
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.collectors.scheduler import Source
+from app.services.binance_client import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_TICK,
+    BinanceClient,
+    RateLimited,
+    RequestGovernor,
+    endpoint_weight,
+)
+
+HOST = "https://fapi.example"
+
+
+def test_endpoint_weights():
+    assert endpoint_weight("/fapi/v1/premiumIndex", {"symbol": "BTCUSDT"}) == 1
+    assert endpoint_weight("/fapi/v1/premiumIndex") == 10
+    assert endpoint_weight("/fapi/v1/depth", {"limit": 100}) == 5
+    assert endpoint_weight("/api/v3/ticker/24hr", {"symbols": '["A","B"]'}) == 2
+
+
+def test_low_budget_queues_by_priority():
+    async def run():
+        gov = RequestGovernor(max_in_flight=4, headroom=1.0)
+        b = gov.budget(HOST)
+        b.capacity = 600.0  # 10 weight/sec
+        b.rate = 10.0
+        b.tokens = 0.0
+        order = []
+
+        async def call(name, prio):
+            await gov.acquire(HOST, 1, prio)
+            order.append(name)
+
+        tasks = [asyncio.create_task(call("bg", PRIORITY_BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("tick", PRIORITY_TICK)))
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["tick", "bg"]
+
+
+def test_headers_and_429_tighten_budget():
+    gov = RequestGovernor(max_in_flight=4, headroom=1.0)
+    b = gov.budget(HOST)
+    gov.observe(HOST, httpx.Response(200, headers={"X-MBX-USED-WEIGHT-1M": str(int(b.capacity) - 5)}))
+    assert b.tokens <= 5
+    gov.observe(HOST, httpx.Response(429, headers={"Retry-After": "30"}))
+    assert gov.stats()["fapi"]["paused_for_sec"] > 25
+    assert not b.try_take(1)
+
+
+def test_spot_hosts_share_one_budget_and_429_does_not_fail_over():
+    gov = RequestGovernor(max_in_flight=4, headroom=1.0)
+    assert gov.budget("https://api.binance.com") is gov.budget("https://api2.binance.com")
+    assert gov.budget("https://api.binance.com") is not gov.budget("https://fapi.binance.com")
+
+    async def run():
+        client = BinanceClient()
+        client._governor = gov
+        hits = []
+
+        def handler(request):
+            hits.append(request.url.host)
+            return httpx.Response(429, headers={"Retry-After": "30"})
+
+        for host in client._spot_pool.ranked():
+            await host.client.aclose()
+            host.client = httpx.AsyncClient(base_url=host.base_url, transport=httpx.MockTransport(handler))
+        try:
+            await client._spot_request("/api/v3/ticker/24hr", {"symbol": "BTCUSDT"})
+        except httpx.HTTPStatusError as e:
+            assert e.response.status_code == 429
+        else:
+            raise AssertionError("429 should be raised")
+        await client.close()
+        return hits
+
+    assert len(asyncio.run(run())) == 1
+    assert gov.stats()["spot"]["paused_for_sec"] > 25
+
+
+def test_tick_requests_fail_fast_while_rate_limited():
+    gov = RequestGovernor(max_in_flight=4, headroom=1.0)
+
+    async def run():
+        client = BinanceClient("https://fapi.example")
+        client._governor = gov
+        hits = []
+
+        def handler(request):
+            hits.append(request.url.path)
+            return httpx.Response(429, headers={"Retry-After": "60"})
+
+        await client._client.aclose()
+        client._client = httpx.AsyncClient(base_url="https://fapi.example", transport=httpx.MockTransport(handler))
+        premium = Source("premium_index", 1, fetch_batch=client.premium_index_batch)
+        premium.put("BTCUSDT", {"markPrice": "1"}, now=0)
+
+        started = time.monotonic()
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.premium_index_batch(["BTCUSDT"])  # no per-symbol fan-out, no retry
+        assert hits == ["/fapi/v1/premiumIndex"]
+        with pytest.raises(RateLimited):
+            await client.depth("BTCUSDT")
+        with pytest.raises(RateLimited):
+            await client.open_interest("BTCUSDT")  # non-tick: the pause is longer than it waits
+        assert await premium.refresh(["BTCUSDT"], now=10) == []
+        elapsed = time.monotonic() - started
+        await client.close()
+        return hits, premium.get("BTCUSDT"), elapsed
+
+    hits, cached, elapsed = asyncio.run(run())
+    assert len(hits) == 1 and cached == {"markPrice": "1"} and elapsed < 1.0
@@ -0,0 +1,23 @@
+import asyncio
+
+from app.services.host_pool import HostPool
+
+
+def test_ranking_prefers_fast_hosts_and_skips_banned():
+    pool = HostPool(["https://a.example", "https://b.example", "https://c.example"], {})
+    a, b, c = pool.ranked()
+    pool.record_success(a, 120.0)
+    pool.record_success(b, 30.0)
+    pool.record_failure(c, status=418, retry_after=60)
+    assert [h.base_url for h in pool.ranked()] == ["https://b.example", "https://a.example"]
+    assert pool.primary().base_url == "https://b.example"
+    asyncio.run(pool.aclose())
+
+
+def test_repeated_failures_put_host_on_cooldown():
+    pool = HostPool(["https://a.example", "https://b.example"], {})
+    a = pool.ranked()[0]
+    for _ in range(3):
+        pool.record_failure(a)
+    assert [h.base_url for h in pool.ranked()] == ["https://b.example"]
+    asyncio.run(pool.aclose())
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+
+from app.services.binance_client import BinanceClient
+from app.services.instrumentation import (
+    BINANCE_REQUEST_ERRORS,
+    BINANCE_REQUEST_SECONDS,
+    Counter,
+    Histogram,
+    Registry,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = Registry()
+    h = reg.register(Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0)))
+    c = reg.register(Counter("t_total", "test", ("reason",)))
+    h.observe(0.05, stage="fetch")
+    h.observe(0.5, stage="fetch")
+    h.observe(5.0, stage="fetch")
+    c.inc(reason='bad "quote"')
+    text = reg.render()
+    assert 't_seconds_bucket{stage="fetch",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="fetch",le="1.0"} 2' in text
+    assert 't_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="fetch"} 3' in text
+    assert 't_total{reason="bad \\"quote\\""} 1.0' in text
+    assert "# TYPE t_seconds histogram" in text
+
+
+def test_client_records_latency_and_errors_per_endpoint():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/fapi/v1/depth":
+            return httpx.Response(503, json={})
+        return httpx.Response(200, json={"symbol": "BTCUSDT"})
+
+    async def run():
+        client = BinanceClient("https://fapi.instr.example")
+        await client._client.aclose()
+        client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler))
+        await client.premium_index("BTCUSDT")
+        try:
+            await client.depth("BTCUSDT")
+        except httpx.HTTPStatusError:
+            pass
+        await client.close()
+
+    host = "fapi.instr.example"
+    before = BINANCE_REQUEST_SECONDS.count(endpoint="/fapi/v1/premiumIndex", host=host)
+    asyncio.run(run())
+    assert BINANCE_REQUEST_SECONDS.count(endpoint="/fapi/v1/premiumIndex", host=host) == before + 1
+    assert BINANCE_REQUEST_ERRORS.value(endpoint="/fapi/v1/depth", host=host, status="503") == 1
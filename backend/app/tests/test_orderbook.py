@@ -0,0 +1,62 @@
+import asyncio
+import math
+
+from app.analytics.orderbook import OrderBook
+from app.collectors.depth_stream import OrderBookManager
+
+
+def _book():
+    b = OrderBook("BTCUSDT", band_pct=0.02)
+    b.load_snapshot(100, bids=[["100.0", "1"], ["99.0", "2"], ["90.0", "5"]], asks=[["101.0", "1"], ["102.0", "3"]])
+    return b
+
+
+def test_snapshot_band_sums_exclude_far_levels():
+    b = _book()
+    assert math.isclose(b.band_bid_qty, 3.0)
+    assert math.isclose(b.band_ask_qty, 4.0)
+    assert math.isclose(b.imbalance(), 0.75)
+    bid_px, bid_qty, ask_px, _ = b.to_arrays(max_levels=2)
+    assert bid_px.tolist() == [100.0, 99.0] and bid_qty.tolist() == [1.0, 2.0] and ask_px.tolist() == [101.0, 102.0]
+
+
+def test_sequencing_and_incremental_updates():
+    b = _book()
+    assert b.apply_event({"U": 90, "u": 99, "pu": 89, "b": [["100.0", "9"]], "a": []})  # stale: dropped
+    assert not b.synced
+    assert not b.apply_event({"U": 102, "u": 105, "pu": 101, "b": [], "a": []})  # does not straddle 100
+    assert b.apply_event({"U": 98, "u": 103, "pu": 97, "b": [["100.0", "4"], ["99.0", "0"]], "a": [["101.5", "1"]]})
+    assert b.synced and b.last_update_id == 103
+    assert math.isclose(b.band_bid_qty, 4.0)
+    assert math.isclose(b.band_ask_qty, 5.0)
+    assert b.best_bid() == 100.0
+    assert not b.apply_event({"U": 110, "u": 111, "pu": 109, "b": [], "a": []})  # gap
+
+
+def test_reanchor_when_mid_moves():
+    b = _book()
+    b.apply_event({"U": 100, "u": 101, "pu": 99, "b": [["100.0", "0"], ["99.0", "0"], ["91.0", "2"]], "a": [["101.0", "0"], ["102.0", "0"], ["92.0", "1"]]})
+    # Mid is now ~91.5: the 90.0 bid is back inside the ±2% band
+    assert math.isclose(b.band_bid_qty, 7.0)
+    bid_px, bid_qty, ask_px, ask_qty = b.to_arrays()
+    assert bid_px.tolist() == [91.0, 90.0] and ask_px.tolist() == [92.0]
+
+
+class _FakeClient:
+    async def depth(self, symbol, limit=1000):
+        return {"lastUpdateId": 100, "bids": [["100.0", "1"]], "asks": [["101.0", "1"]]}
+
+
+def test_manager_buffers_until_snapshot_then_replays():
+    async def run():
+        mgr = OrderBookManager(_FakeClient())
+        mgr.on_event("BTCUSDT", {"U": 95, "u": 99, "pu": 94, "b": [], "a": []})
+        mgr.on_event("BTCUSDT", {"U": 100, "u": 102, "pu": 99, "b": [["100.0", "3"]], "a": []})
+        assert mgr.book("BTCUSDT") is None
+        await asyncio.sleep(0.01)
+        book = mgr.book("BTCUSDT")
+        assert book is not None and book.last_update_id == 102
+        assert math.isclose(book.imbalance(), 3.0)
+        await mgr.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+import math
+
+import numpy as np
+
+from app.services.redis_store import _now_ms, _raw_chunk_keys
+from app.services.retention import aggregate_rows, project, raw_chunk_ms, raw_to_rows, select_tier, raw_retention_ms
+
+
+def _raw(points):
+    ts = np.array([p[0] for p in points], dtype=np.int64)
+    return ts, raw_to_rows(np.array([p[1] for p in points]))
+
+
+def test_aggregate_raw_into_minutes():
+    ts, rows = aggregate_rows(*_raw([(0, 1.0), (10_000, 3.0), (59_000, 2.0), (60_000, 5.0)]), 60_000)
+    assert ts.tolist() == [0, 60_000]
+    assert rows[0].tolist() == [2.0, 2.0, 1.0, 3.0, 3.0]
+    assert rows[1].tolist() == [5.0, 5.0, 5.0, 5.0, 1.0]
+
+
+def test_rollup_of_rollups_keeps_weighted_mean():
+    minutes = aggregate_rows(*_raw([(0, 1.0), (1_000, 1.0), (60_000, 4.0)]), 60_000)
+    ts, five = aggregate_rows(*minutes, 300_000)
+    assert ts.tolist() == [0]
+    assert math.isclose(five[0][1], 2.0)
+    assert five[0][0] == 4.0 and five[0][4] == 3
+    assert project(five, "max").tolist() == [4.0]
+
+
+def test_select_tier_by_window():
+    now = 10 * 86400 * 1000
+    assert select_tier(now - 3600 * 1000, now) is None
+    assert select_tier(now - raw_retention_ms() - 1, now).name == "1m"
+    assert select_tier(now - 9 * 86400 * 1000, now).name == "5m"
+
+
+def test_raw_chunk_keys_stop_at_retention():
+    now = _now_ms()
+    keys = _raw_chunk_keys("BTCUSDT", "basis", now - 100_000 * 86400 * 1000, now)
+    assert len(keys) <= raw_retention_ms() // raw_chunk_ms() + 3
@@ -0,0 +1,162 @@
+import copy
+import random
+
+import numpy as np
+import orjson
+import pytest
+
+from app.analytics.rule_engine import (
+    DEFAULT_RULESET,
+    SERIES_STATES,
+    SNAPSHOT_FIELDS,
+    RuleEngine,
+    RuleSetError,
+    compile_ruleset,
+    snapshot_columns,
+)
+
+
+def _snap(sym, **over):
+    snap = {
+        "symbol": sym,
+        "funding_1h_pct": 0.01,
+        "basis_twap15_pct": 0.2,
+        "perp_dominance_pct": 65.0,
+        "delta_oi_1h_usdt": -1.0,
+        "oi_usdt": 1e6,
+        "fut_vol24_usdt": 1e8,
+        "has_spot": True,
+        "borrow": {"shortable": True, "venues": []},
+    }
+    snap.update(over)
+    return snap
+
+
+def _ruleset(**over):
+    doc = copy.deepcopy(DEFAULT_RULESET)
+    doc.update(over)
+    return doc
+
+
+def test_default_reasons_render_thresholds():
+    out = compile_ruleset(_ruleset()).evaluate(
+        {"A": _snap("A", perp_dominance_pct=80.0, oi_usdt=1e8), "B": _snap("B", perp_dominance_pct=10.0)},
+        [False, False],
+        [True, True],
+    )
+    assert out["A"] == ("RED", ["perp_dominance ≥ 70% and oi/usdt_vol24 ≥ 0.25"])
+    assert out["B"] == (
+        "GREEN",
+        ["funding_1h ≥ 0 for ≥3h", "basis_twap15 ≥ +0.10%", "ΔOI 1h ≤ 0", "perp_dominance < 60%"],
+    )
+
+
+def test_profile_and_symbol_overrides():
+    rules = compile_ruleset(
+        _ruleset(
+            profiles={"majors": {"params": {"green_dominance_max": 70.0}}},
+            symbols={
+                "btcusdt": {"profile": "majors"},
+                "ETHUSDT": {"profile": "majors", "disabled": ["basis_positive"], "green_min": 3},
+            },
+        )
+    )
+    snaps = {s: _snap(s, basis_twap15_pct=0.05) for s in ("BTCUSDT", "ETHUSDT", "XRPUSDT")}
+    out = rules.evaluate(snaps, [False] * 3, [True] * 3)
+    assert out["BTCUSDT"] == ("YELLOW", ["default state"])  # basis below the green minimum
+    assert out["ETHUSDT"][0] == "GREEN" and "perp_dominance < 70%" in out["ETHUSDT"][1]
+    assert out["XRPUSDT"] == ("YELLOW", ["default state"])  # 65% dominance is too high by default
+
+
+def test_vectorized_and_closure_paths_agree():
+    rules = compile_ruleset(_ruleset(symbols={"S3": {"params": {"red_dominance_pct": 50.0}}}))
+    rng = random.Random(7)
+    snaps = {
+        f"S{i}": _snap(
+            f"S{i}",
+            funding_1h_pct=rng.choice([-0.2, -0.01, 0.0, 0.01]),
+            basis_twap15_pct=rng.choice([-0.1, 0.0, 0.1, 0.3]),
+            perp_dominance_pct=rng.choice([40.0, 60.0, 70.0, 90.0]),
+            delta_oi_1h_usdt=rng.choice([-1.0, 0.0, 1.0]),
+            oi_usdt=rng.choice([0.0, 1e8]),
+            has_spot=rng.random() < 0.8,
+            borrow={"shortable": rng.random() < 0.7, "venues": rng.choice([[], ["x"]])},
+        )
+        for i in range(300)
+    }
+    up = [rng.random() < 0.5 for _ in snaps]
+    ok = [rng.random() < 0.5 for _ in snaps]
+    vectorized = rules.evaluate_vectorized(snaps, up, ok)
+    closures = {s: rules.closure_for(s)(snap, u, o) for (s, snap), u, o in zip(snaps.items(), up, ok)}
+    assert vectorized == closures
+
+    # The same snapshots as one symbol's history (S0 has no overrides, unlike S3)
+    cols = snapshot_columns(list(snaps.values()), SNAPSHOT_FIELDS)
+    cols["price_up"] = np.array(up, dtype=np.float64)
+    cols["funding_nonnegative"] = np.array(ok, dtype=np.float64)
+    state, _ = rules.evaluate_series("S0", cols)
+    series = [SERIES_STATES[c] for c in state.tolist()]
+    assert all(series[i] == vectorized[s][0] for i, s in enumerate(snaps) if s != "S3")
+
+    # Rules on a field the history lacks stay silent
+    del cols["has_spot"]
+    _, masks = rules.evaluate_series("S0", cols)
+    assert not masks[[r.id for r in rules.rules].index("no_spot")].any()
+
+
+@pytest.mark.parametrize(
+    "over",
+    [
+        {"rules": [{"id": "x", "level": "purple", "all": [["srs", ">", 1]]}]},
+        {"rules": [{"id": "x", "level": "red", "all": [["nope", ">", 1]]}]},
+        {"rules": [{"id": "x", "level": "red", "all": [["srs", ">", "$missing"]]}]},
+        {"symbols": {"BTCUSDT": {"profile": "ghost"}}},
+        {"profiles": {"p": {"params": {"unknown": 1}}}},
+    ],
+)
+def test_invalid_rulesets_are_rejected(over):
+    with pytest.raises(RuleSetError):
+        compile_ruleset(_ruleset(**over))
+
+
+def test_engine_keeps_previous_rules_when_a_reload_is_invalid():
+    engine = RuleEngine()
+    engine.load(orjson.dumps(_ruleset(params={**DEFAULT_RULESET["params"], "green_dominance_max": 99.0})))
+    assert engine.compiled.params["green_dominance_max"] == 99.0
+    with pytest.raises(RuleSetError):
+        engine.load(orjson.dumps({"rules": [{"level": "red", "all": []}]}))
+    assert engine.compiled.params["green_dominance_max"] == 99.0
+    engine.load(None)
+    assert engine.compiled.params["green_dominance_max"] == 60.0
+
+
+@pytest.mark.parametrize(
+    "over",
+    [
+        {"symbols": {"BTCUSDT": {"params": {"red_dominance_pct": "high"}}}},
+        {"profiles": {"p": {"params": {"red_dominance_pct": None}}}},
+        {"symbols": {"BTCUSDT": {"green_min": "2"}}},
+        {"symbols": {"BTCUSDT": {"green_min": -1}}},
+        {"params": {**DEFAULT_RULESET["params"], "red_dominance_pct": "high"}},
+        {"symbols": ["BTCUSDT"]},
+    ],
+)
+def test_non_numeric_overrides_are_rejected(over):
+    with pytest.raises(RuleSetError):
+        compile_ruleset(_ruleset(**over))
+
+
+def test_engine_falls_back_when_evaluation_fails(monkeypatch):
+    engine = RuleEngine()
+    snaps = {"A": _snap("A", perp_dominance_pct=80.0, oi_usdt=1e8)}
+    assert engine.evaluate(snaps, [False], [True])["A"][0] == "RED"
+    good = engine.compiled
+    engine.load(orjson.dumps(_ruleset()))
+    bad = engine.compiled
+
+    def boom(*args):
+        raise ValueError("broken rule set")
+
+    monkeypatch.setattr(bad, "evaluate", boom)
+    assert engine.evaluate(snaps, [False], [True])["A"][0] == "RED"
+    assert engine.compiled is good
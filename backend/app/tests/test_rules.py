@@ -0,0 +1,60 @@
+from app.analytics import rules
+from app.analytics.rule_engine import RuleEngine
+from app.analytics.rules import evaluate_batch, evaluate_snapshot
+from app.analytics.windows import WindowStore
+
+
+def _snap(**over):
+    snap = {
+        "funding_1h_pct": 0.01,
+        "basis_twap15_pct": 0.2,
+        "perp_dominance_pct": 50.0,
+        "delta_oi_1h_usdt": -1.0,
+        "oi_usdt": 1e6,
+        "fut_vol24_usdt": 1e8,
+        "has_spot": True,
+        "borrow": {"shortable": True, "venues": []},
+    }
+    snap.update(over)
+    return snap
+
+
+def test_batch_uses_fresh_snapshots_and_window_lookbacks():
+    windows = WindowStore()
+    for ts, mark in ((0, 100.0), (60_000, 101.0)):
+        windows["UPUSDT"].mark.push(ts, mark)
+        windows["UPUSDT"].funding.push(ts, 0.01)
+        windows["CALMUSDT"].funding.push(ts, 0.01)
+
+    out = evaluate_batch(
+        {
+            "UPUSDT": _snap(delta_oi_1h_usdt=5.0),
+            "CALMUSDT": _snap(),
+            "NOSPOTUSDT": _snap(has_spot=False),
+            "NEWUSDT": _snap(),  # no windows yet: lookbacks are unknown
+        },
+        windows,
+    )
+    assert out["UPUSDT"] == ("RED", ["ΔOI 1h > 0 while price ↑ last hour"])
+    assert out["CALMUSDT"][0] == "GREEN"
+    assert out["NOSPOTUSDT"][0] == "RED"
+    assert out["NEWUSDT"] == ("YELLOW", ["default state"])
+
+
+def test_very_negative_funding_with_borrow_is_basis_only():
+    traffic, reasons = evaluate_snapshot(_snap(funding_1h_pct=-0.2), price_up=False, funding_nonnegative=False)
+    assert traffic == "YELLOW" and "borrowable" in reasons[0]
+
+
+def test_snapshot_evaluation_falls_back_when_the_rule_set_fails(monkeypatch):
+    engine = RuleEngine()
+    monkeypatch.setattr(rules, "get_rule_engine", lambda: engine)
+    bad = engine.compiled
+
+    def boom(*args):
+        raise ValueError("broken rule set")
+
+    monkeypatch.setattr(bad, "evaluate", boom)
+    traffic, _ = evaluate_snapshot(_snap(symbol="BTCUSDT", perp_dominance_pct=80.0, oi_usdt=1e8), False, True)
+    assert traffic == "RED"
+    assert engine.compiled is not bad
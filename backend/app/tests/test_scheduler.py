@@ -0,0 +1,41 @@
+import asyncio
+
+from app.collectors.scheduler import Source
+
+
+def test_source_refreshes_only_when_due_and_keeps_last_value():
+    calls = []
+
+    async def fetch(sym):
+        calls.append(sym)
+        if sym == "BAD":
+            raise RuntimeError("boom")
+        return len(calls)
+
+    src = Source("test", interval_sec=60, fetch_one=fetch, retry_sec=5)
+
+    async def run():
+        await src.refresh(["AAA", "BAD"], now=0)
+        await src.refresh(["AAA", "BAD"], now=3)   # nothing due: fresh value / retry backoff
+        await src.refresh(["AAA", "BAD"], now=10)  # BAD retried
+        await src.refresh(["AAA"], now=61)         # AAA interval elapsed
+
+    asyncio.run(run())
+    assert calls == ["AAA", "BAD", "BAD", "AAA"]
+    assert src.get("AAA") == 4
+    assert src.get("BAD") is None
+
+
+def test_batch_source_retries_symbols_missing_from_the_response():
+    seen = []
+
+    async def fetch_batch(syms):
+        seen.append(list(syms))
+        return {"AAA": {"v": 1}}
+
+    src = Source("batch", interval_sec=60, fetch_batch=fetch_batch, retry_sec=5)
+    assert asyncio.run(src.refresh(["AAA", "MISSING"], now=0)) == ["AAA"]
+    asyncio.run(src.refresh(["AAA", "MISSING"], now=3))  # retry backoff
+    asyncio.run(src.refresh(["AAA", "MISSING"], now=10))
+    assert seen == [["AAA", "MISSING"], ["MISSING"]]
+    assert src.get("AAA") == {"v": 1} and src.get("MISSING") is None
@@ -0,0 +1,87 @@
+import numpy as np
+
+from app.analytics.srs import (
+    SRS_COMPONENTS,
+    SrsNormalizer,
+    compute_srs,
+    heuristic_srs,
+    history_components,
+    srs_components,
+)
+from app.services.retention import raw_to_rows
+
+
+def _snap(ts, funding=0.01, basis=0.02, dominance=50.0, delta_oi=0.0, oi=1e6, imbalance=1.0):
+    return {
+        "ts": ts,
+        "funding_1h_pct": funding,
+        "basis_twap15_pct": basis,
+        "perp_dominance_pct": dominance,
+        "delta_oi_1h_usdt": delta_oi,
+        "oi_usdt": oi,
+        "orderbook_imbalance": imbalance,
+    }
+
+
+def test_cold_statistics_fall_back_to_heuristic_scale():
+    norm = SrsNormalizer([3600], min_samples=5)
+    snap = _snap(1_000, funding=-0.1, basis=0.05, delta_oi=2e5)
+    assert norm.score({"BTCUSDT": snap}) == {"BTCUSDT": compute_srs(snap)}
+
+
+def test_streaming_statistics_match_exponential_weights_and_zscore():
+    rng = np.random.default_rng(3)
+    norm = SrsNormalizer([600], min_samples=10)
+    funding, basis = rng.normal(0.01, 0.002, 1000), rng.normal(0, 0.01, 1000)
+    dominance, imbalance = rng.normal(60, 5, 1000), rng.normal(1, 0.2, 1000)
+    snaps = [
+        _snap(i * 10_000, funding=f, basis=b, dominance=d, imbalance=m)
+        for i, (f, b, d, m) in enumerate(zip(funding, basis, dominance, imbalance))
+    ]
+    for snap in snaps:
+        norm.score({"ETHUSDT": snap})
+    mean, var, count = norm.stats("ETHUSDT")
+    assert count == 1000
+    # Same statistics as the closed-form warm start over the same samples
+    seeded = SrsNormalizer([600], min_samples=10)
+    ts = np.arange(1000, dtype=np.int64) * 10_000
+    seeded.seed("ETHUSDT", ts, srs_components(snaps))
+    s_mean, s_var, _ = seeded.stats("ETHUSDT")
+    assert np.allclose(mean, s_mean, rtol=1e-3)
+    assert np.allclose(var, s_var, rtol=1e-2)
+
+    # A 3-sigma funding spike saturates its component; everything else sits at its mean.
+    # ΔOI never moved, so it has no variance and stays on the heuristic scale (0 here)
+    spike = _snap(10_010_000, funding=mean[0] + 3 * np.sqrt(var[0]), basis=mean[1], dominance=mean[2], imbalance=mean[4])
+    assert norm.score({"ETHUSDT": spike})["ETHUSDT"] == 25
+
+
+def test_batch_score_and_retain():
+    norm = SrsNormalizer([3600], min_samples=1)
+    norm.score({"A": _snap(0), "B": _snap(0, funding=0.2)})
+    norm.retain(["b"])
+    assert "A" not in norm and "B" in norm
+    assert norm.stats("B")[0][0] == 0.2
+
+
+def test_history_components_rebuild_twap_and_delta_oi():
+    minute = 60_000
+    ts = np.arange(0, 120 * minute, 10_000, dtype=np.int64)
+    series = {m: (ts, raw_to_rows(np.full(ts.size, 1.0))) for m in ("funding", "dominance", "imbalance")}
+    series["basis"] = (ts, raw_to_rows(np.full(ts.size, -0.5)))
+    series["oi"] = (ts, raw_to_rows(1e6 + ts / minute * 1e3))
+    grid, x = history_components(series, 0, ts[-1])
+    assert x.shape[1] == len(SRS_COMPONENTS)
+    assert grid[0] == 60 * minute  # first row with a full hour of OI behind it
+    assert np.allclose(x[:, 1], 0.5)
+    assert np.allclose(x[:, 3], 60e3 / (1e6 + grid / minute * 1e3), rtol=1e-3)
+
+
+def test_heuristic_srs_matches_compute_srs():
+    rng = np.random.default_rng(5)
+    snaps = [
+        _snap(0, *rng.normal(0, 0.2, 2), rng.uniform(0, 100), rng.normal(0, 5e5), rng.uniform(1, 2e6), rng.uniform(0, 3))
+        for _ in range(500)
+    ]
+    x = srs_components(snaps)
+    assert heuristic_srs(x.T).tolist() == [compute_srs(s) for s in snaps]
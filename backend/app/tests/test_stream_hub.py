@@ -0,0 +1,59 @@
+import asyncio
+
+import orjson
+
+from app.services.stream_hub import StreamHub, sse_frame
+
+
+def _parse(frame: bytes):
+    head, data = frame.decode().strip().split("\n")
+    return head.removeprefix("event: "), orjson.loads(data.removeprefix("data: "))
+
+
+def test_first_tick_is_snapshot_then_deltas_with_changed_fields_only():
+    async def run():
+        hub = StreamHub(listen=False)
+        sub = hub.subscribe(["btcusdt"])
+        hub.publish_tick({"BTCUSDT": {"symbol": "BTCUSDT", "ts": 1, "mark": 100.0, "srs": 10}}, [])
+        hub.publish_tick({"BTCUSDT": {"symbol": "BTCUSDT", "ts": 2, "mark": 101.0, "srs": 10}}, [])
+        hub.publish_tick({"ETHUSDT": {"symbol": "ETHUSDT", "ts": 2, "mark": 10.0}}, [])
+        frames = [_parse(sub.queue.get_nowait()) for _ in range(sub.queue.qsize())]
+        assert frames == [
+            ("snapshot", {"symbol": "BTCUSDT", "ts": 1, "mark": 100.0, "srs": 10}),
+            ("delta", {"symbol": "BTCUSDT", "ts": 2, "mark": 101.0}),
+        ]
+        assert hub.last("ETHUSDT")["mark"] == 10.0
+
+    asyncio.run(run())
+
+
+def test_points_are_grouped_per_symbol_and_shared_across_subscribers():
+    async def run():
+        hub = StreamHub(listen=False)
+        a, b = hub.subscribe(), hub.subscribe(["ETHUSDT"])
+        hub.publish_tick({}, [["BTCUSDT", "mark", 1, 100.0], ["BTCUSDT", "basis_bps", 1, 3.0], ["ETHUSDT", "mark", 1, 10.0]])
+        got_a = [a.queue.get_nowait() for _ in range(a.queue.qsize())]
+        got_b = [b.queue.get_nowait() for _ in range(b.queue.qsize())]
+        assert _parse(got_a[0]) == ("points", {"symbol": "BTCUSDT", "points": [["mark", 1, 100.0], ["basis_bps", 1, 3.0]]})
+        assert got_b == [got_a[1]]
+        assert got_b[0] is got_a[1]  # encoded once
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_overflows_instead_of_blocking():
+    async def run():
+        hub = StreamHub(listen=False)
+        sub = hub.subscribe()
+        sub.queue = asyncio.Queue(maxsize=1)
+        for ts in range(3):
+            hub.publish_tick({"BTCUSDT": {"ts": ts}}, [])
+        assert sub.overflowed and sub.queue.qsize() == 1
+        hub.unsubscribe(sub)
+        assert hub.subscriber_count == 0
+
+    asyncio.run(run())
+
+
+def test_sse_frame_format():
+    assert sse_frame("delta", {"a": 1}) == b'event: delta\ndata: {"a":1}\n\n'
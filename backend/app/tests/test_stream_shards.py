@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+import websockets
+
+from app.collectors import stream_shards
+from app.collectors.stream_shards import StreamShards
+
+
+def test_shards_pack_streams_and_resubscribe_live_without_reconnect(monkeypatch):
+    monkeypatch.setattr(stream_shards, "CONTROL_MESSAGE_INTERVAL_SEC", 0)
+
+    async def run():
+        frames = []  # (connection id, method, params)
+        connections = []
+
+        async def handler(ws):
+            connections.append(ws)
+            async for msg in ws:
+                req = json.loads(msg)
+                frames.append((id(ws), req["method"], sorted(req["params"])))
+                await ws.send(json.dumps({"result": None, "id": req["id"]}))
+                if req["method"] == "SUBSCRIBE":
+                    for p in req["params"]:
+                        await ws.send(json.dumps({"stream": p, "data": {"s": p.split("@")[0].upper()}}))
+
+        received = []
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            shards = StreamShards(f"ws://127.0.0.1:{port}", received.append, max_streams=2, name="test")
+            await shards.set_streams(["a@ticker", "b@ticker", "c@ticker"])
+            for _ in range(100):
+                if len(received) >= 3:
+                    break
+                await asyncio.sleep(0.02)
+            assert shards.stats()["connections"] == 2
+            await shards.set_streams(["a@ticker", "c@ticker", "d@ticker"])
+            for _ in range(100):
+                if any(m == "UNSUBSCRIBE" for _, m, _ in frames) and len(received) >= 4:
+                    break
+                await asyncio.sleep(0.02)
+            await shards.stop()
+
+        assert len(connections) == 2  # changes never reopened a socket
+        assert ("UNSUBSCRIBE", ["b@ticker"]) in [(m, p) for _, m, p in frames]
+        assert sorted(r["s"] for r in received) == ["A", "B", "C", "D"]
+
+    asyncio.run(run())
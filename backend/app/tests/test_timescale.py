@@ -0,0 +1,131 @@
+import asyncio
+
+import numpy as np
+import orjson
+
+from app.services import timescale
+from app.services.instrumentation import HISTORY_ROWS
+from app.services.timescale import HistoryWriter, encode_points, encode_snapshots, history_source
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, sql, file):
+        if self.conn.fail:
+            self.conn.fail -= 1
+            raise ConnectionError("server closed the connection")
+        self.conn.copies.append((sql.split()[1], file.read()))
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.conn.records
+
+
+class _Conn:
+    """Stand-in for a psycopg2 connection; records COPY payloads across reconnects."""
+
+    def __init__(self, shared):
+        self.__dict__ = shared
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed += 1
+
+
+def _writer(**kwargs):
+    shared = {"fail": 0, "copies": [], "executed": [], "records": [], "closed": 0, "autocommit": False}
+    return HistoryWriter("postgresql://test", connect=lambda dsn: _Conn(shared), **kwargs), shared
+
+
+def test_copy_encoding():
+    points = [("BTCUSDT", "basis", 1_700_000_000_123, 0.25), ("BTCUSDT", "oi", 1_700_000_000_123, float("nan"))]
+    assert encode_points(points) == (
+        b"2023-11-14T22:13:20.123Z\tBTCUSDT\tbasis\t0.25\n2023-11-14T22:13:20.123Z\tBTCUSDT\toi\t\\N\n"
+    )
+    [line] = encode_snapshots([(0, "ETHUSDT", {"note": 'a\\b\n"c"', "srs": 40})]).splitlines()
+    ts, sym, doc = line.split(b"\t")
+    assert (ts, sym) == (b"1970-01-01T00:00:00.000Z", b"ETHUSDT")
+    # COPY text unescapes \\ back to \, leaving orjson's JSON intact
+    assert orjson.loads(doc.replace(b"\\\\", b"\\")) == {"note": 'a\\b\n"c"', "srs": 40}
+
+
+def test_offer_samples_snapshots_and_drops_when_full():
+    writer, _ = _writer(batch_rows=4, max_buffer_rows=8, snapshot_interval_sec=60)
+    tick = lambda ts: {"BTCUSDT": {"ts": ts}, "ETHUSDT": {"ts": ts}}  # noqa: E731
+    point = ("BTCUSDT", "basis", 0, 1.0)
+    assert writer.offer(tick(0), [point])
+    assert writer.offer(tick(10_000), [point])  # snapshots not due yet
+    assert writer.buffered == 4 and writer._wake.is_set()
+
+    dropped = HISTORY_ROWS.value(outcome="dropped")
+    assert not writer.offer(tick(60_000), [point] * 3)  # 5 more rows would exceed 8
+    assert writer.buffered == 4 and HISTORY_ROWS.value(outcome="dropped") == dropped + 5
+    assert writer.offer(tick(60_000), [])  # a dropped tick does not consume the snapshot slot
+    assert len(writer._snapshots) == 4
+
+
+def test_failed_flush_keeps_the_batch_and_reconnects():
+    async def scenario():
+        writer, shared = _writer()
+        writer.offer({"BTCUSDT": {"ts": 0, "srs": 10}}, [("BTCUSDT", "basis", 0, 1.0)])
+        shared["fail"] = 1
+        try:
+            await writer.flush()
+        except ConnectionError:
+            pass
+        assert writer.buffered == 2 and shared["closed"] == 1
+        writer.offer({}, [("BTCUSDT", "basis", 10_000, 2.0)])
+        assert await writer.flush() == 3
+        assert writer.buffered == 0
+        [(points_table, points), (snap_table, _)] = shared["copies"]
+        assert (points_table, snap_table) == ("srr_points", "srr_snapshots")
+        # The retried batch goes out ahead of the newer point
+        assert [line.split(b"\t")[3] for line in points.splitlines()] == [b"1.0", b"2.0"]
+
+    asyncio.run(scenario())
+
+
+def test_long_windows_read_the_matching_rollup(monkeypatch):
+    assert history_source(None) == "srr_points"
+    assert history_source(30_000) == "srr_points"
+    assert history_source(5 * 60_000) == "srr_points_1m"
+    assert history_source(6 * 3600_000) == "srr_points_1h"
+
+    async def scenario():
+        writer, shared = _writer()
+        monkeypatch.setattr(timescale, "get_history_writer", lambda: writer)
+        day = 86400 * 1000
+        assert await timescale.get_history_rows_many("BTCUSDT", ["basis"], 0, day) is None  # schema not ready
+        writer.ready = True
+        assert await timescale.get_history_rows_many("BTCUSDT", ["basis"], 0, 3600_000) is None  # short window
+
+        shared["records"] = [("basis", 60_000, 2.0, 1.5, 1.0, 2.0, 6), ("basis", 0, 1.0, 1.0, 1.0, 1.0, 6)]
+        out = await timescale.get_history_rows_many(
+            "btcusdt", ["basis", "oi"], 23 * 3600_000, 2 * day, resolution_ms=60_000, window_ms=2 * day
+        )
+        sql, params = shared["executed"][-1]
+        assert "FROM srr_points_1m" in sql and params[:2] == ("BTCUSDT", ["basis", "oi"])
+        ts, rows = out["basis"]
+        assert ts.dtype == np.int64 and ts.tolist() == [60_000, 0]
+        assert rows.tolist()[0] == [2.0, 1.5, 1.0, 2.0, 6.0]
+        assert out["oi"][1].shape == (0, 5)
+
+    asyncio.run(scenario())
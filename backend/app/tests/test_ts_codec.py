@@ -0,0 +1,53 @@
+import numpy as np
+
+from app.services.ts_codec import (
+    ROW_MAGIC,
+    chunk_starts,
+    decode_chunk,
+    decode_chunks,
+    encode_row,
+    encode_rows,
+    is_sealed,
+    seal,
+)
+
+
+def _row_chunk(points):
+    return ROW_MAGIC + b"".join(encode_row(ts, (v,)) for ts, v in points)
+
+
+def test_row_chunk_roundtrip():
+    buf = _row_chunk([(1_000, 1.5), (11_000, -2.0)])
+    ts, values = decode_chunk(buf, 1)
+    assert ts.tolist() == [1_000, 11_000]
+    assert values[:, 0].tolist() == [1.5, -2.0]
+
+
+def test_sealed_chunk_is_smaller_and_roundtrips():
+    ts = np.arange(1_700_000_000_000, 1_700_000_000_000 + 360 * 10_000, 10_000, dtype=np.int64)
+    values = np.random.default_rng(0).normal(size=(360, 1))
+    buf = ROW_MAGIC + encode_rows(ts, values)
+    sealed = seal(buf, 1)
+    assert is_sealed(sealed) and len(sealed) < len(buf)
+    out_ts, out_values = decode_chunk(sealed, 1)
+    assert np.array_equal(out_ts, ts)
+    assert np.array_equal(out_values, values)
+
+
+def test_late_rows_after_seal_are_kept():
+    sealed = seal(_row_chunk([(0, 1.0), (10, 2.0)]), 1) + encode_row(20, (3.0,))
+    ts, values = decode_chunk(sealed, 1)
+    assert ts.tolist() == [0, 10, 20]
+    assert values[:, 0].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_decode_chunks_filters_and_dedupes():
+    a = _row_chunk([(0, 1.0), (10, 2.0)])
+    b = _row_chunk([(10, 5.0), (20, 3.0), (30, 4.0)])
+    ts, values = decode_chunks([a, None, b], 1, 5, 25)
+    assert ts.tolist() == [10, 20]
+    assert values[:, 0].tolist() == [5.0, 3.0]
+
+
+def test_chunk_starts_cover_window():
+    assert chunk_starts(1_500, 4_100, 1_000) == [1_000, 2_000, 3_000, 4_000]
@@ -0,0 +1,67 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app.services import redis_store
+from app.services.retention import tier_by_name
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_legacy_zsets_move_into_chunks_once(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(redis_store, "get_redis", lambda: redis)
+
+    async def scenario():
+        now = redis_store._now_ms()
+        old = now - 400 * 86400 * 1000  # past every retention
+        await redis.zadd(
+            "srr:ts:BTCUSDT:basis",
+            {orjson.dumps([now - 60_000, 1.5]): now - 60_000, orjson.dumps([old, 9.0]): old},
+        )
+        hour = now - now % 3600_000 - 3600_000
+        await redis.zadd("srr:tsr:1h:BTCUSDT:oi", {orjson.dumps([hour, 4.0, 3.0, 2.0, 5.0, 360]): hour})
+
+        assert await redis_store.migrate_legacy_timeseries() == 2
+        assert await redis.keys("srr:ts:*") == [] and await redis.keys("srr:tsr:*") == []
+        assert await redis_store.migrate_legacy_timeseries() == 0
+
+        raw = await redis_store.get_timeseries_rows("BTCUSDT", "basis", now - 3600_000, now)
+        rollup_keys = redis_store._rollup_chunk_keys(tier_by_name()["1h"], "BTCUSDT", "oi", hour, now)
+        ts, rows = redis_store.decode_chunks(await redis.mget(rollup_keys), 5, hour, now)
+        return raw, ts, rows, hour, now
+
+    (raw_ts, raw_rows), ts, rows, hour, now = asyncio.run(scenario())
+    assert raw_ts.tolist() == [now - 60_000] and raw_rows[0, 0] == 1.5
+    assert ts.tolist() == [hour] and rows[0].tolist() == [4.0, 3.0, 2.0, 5.0, 360.0]
+
+
+def test_seal_skips_chunks_appended_after_the_read():
+    pytest.importorskip("lupa")  # fakeredis needs it for EVAL
+    redis = fakeredis.FakeAsyncRedis()
+
+    async def scenario():
+        key = redis_store._raw_chunk_key("BTCUSDT", "basis", 0)
+        pipe = redis.pipeline(transaction=False)
+        redis_store._queue_append(pipe, key, 60_000, redis_store.encode_row(1_000, (1.0,)))
+        await pipe.execute()
+        buf = await redis.get(key)
+
+        # A late row lands between the compactor's read and its seal
+        await redis.append(key, redis_store.encode_row(2_000, (2.0,)))
+        pipe = redis.pipeline(transaction=False)
+        redis_store._queue_seal(pipe, key, buf, 1)
+        assert await pipe.execute() == [0]
+        ts, _ = redis_store.decode_chunks([await redis.get(key)], 1, 0, 10_000)
+        assert ts.tolist() == [1_000, 2_000]
+
+        pipe = redis.pipeline(transaction=False)
+        redis_store._queue_seal(pipe, key, await redis.get(key), 1)
+        assert await pipe.execute() == [1]
+        sealed = await redis.get(key)
+        assert redis_store.is_sealed(sealed) and await redis.pttl(key) > 0
+        ts, values = redis_store.decode_chunks([sealed], 1, 0, 10_000)
+        assert ts.tolist() == [1_000, 2_000] and values[:, 0].tolist() == [1.0, 2.0]
+
+    asyncio.run(scenario())
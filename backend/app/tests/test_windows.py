@@ -0,0 +1,35 @@
+import math
+
+from app.analytics.windows import RollingWindow, SymbolWindows
+
+
+def test_rolling_window_mean_min_evicts_by_time():
+    w = RollingWindow(span_ms=30)
+    for ts, v in [(0, 3.0), (10, 1.0), (20, 2.0), (30, 4.0)]:
+        w.push(ts, v)
+    assert len(w) == 4
+    assert math.isclose(w.mean(), 2.5)
+    assert w.min() == 1.0
+    w.push(45, 5.0)  # evicts ts 0 and 10
+    assert (w.first(), w.last()) == (2.0, 5.0)
+    assert w.min() == 2.0
+    assert math.isclose(w.mean(), 11.0 / 3)
+    w.evict(200)
+    assert w.mean() is None and w.min() is None
+
+
+def test_symbol_windows_rule_lookbacks():
+    sw = SymbolWindows()
+    sw.mark.extend([(0, 100.0), (1_000, 101.0)])
+    sw.funding.extend([(0, 0.01), (1_000, -0.001)])
+    assert sw.price_up()
+    assert not sw.funding_nonnegative()
+
+
+def test_symbol_windows_take_one_sample_per_resolution_bucket():
+    sw = SymbolWindows(resolution_ms=10_000)
+    assert [sw.sample_due(ts) for ts in (0, 1_000, 9_999, 10_000, 25_000)] == [True, False, False, True, True]
+    assert SymbolWindows().sample_due(0) and SymbolWindows().sample_due(0)
+    w = RollingWindow(span_ms=60_000)
+    w.extend([(0, 1.0), (10_000, 2.0)])
+    assert math.isclose(w.mean_with(6.0), 3.0) and len(w) == 2
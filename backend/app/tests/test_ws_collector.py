@@ -0,0 +1,57 @@
+import asyncio
+
+from app.collectors.snapshot_builder import premium_from_mark_price
+from app.collectors.ws_collector import StreamingCollector
+from app.services.binance_client import BinanceClient
+
+MARK_EVENT = {
+    "e": "markPriceUpdate",
+    "E": 1_700_000_000_000,
+    "s": "BTCUSDT",
+    "p": "101.0",
+    "i": "100.0",
+    "r": "0.0004",
+    "T": 1_700_000_000_000 + 3_600_000,
+}
+
+
+def test_mark_price_event_maps_to_premium_fields():
+    pi = premium_from_mark_price(MARK_EVENT)
+    assert pi["markPrice"] == "101.0" and pi["indexPrice"] == "100.0"
+    assert pi["lastFundingRate"] == "0.0004"
+
+
+def test_build_uses_streamed_inputs_and_waits_for_rest_only_ones():
+    collector = StreamingCollector(BinanceClient("https://fapi.ws.example"))
+    now = MARK_EVENT["E"]
+    collector.premium["BTCUSDT"] = premium_from_mark_price(MARK_EVENT)
+    assert collector.build("BTCUSDT", now) is None  # OI history / funding interval not fetched yet
+
+    sched = collector.scheduler
+    sched.oi_hist.put("BTCUSDT", [{"sumOpenInterestValue": "1000"}, {"sumOpenInterestValue": "1500"}])
+    sched.funding_interval.put("BTCUSDT", 4)
+    sched.depth.put("BTCUSDT", {"bids": [["100.9", "2"]], "asks": [["101.1", "1"]]})
+    collector.fut_vol24["BTCUSDT"] = 900.0
+    collector.spot_vol24["BTCUSDT"] = 100.0
+    collector.has_spot["BTCUSDT"] = True
+
+    snap = collector.build("BTCUSDT", now)
+    assert snap is not None
+    assert snap["mark"] == 101.0 and snap["index"] == 100.0
+    assert abs(snap["basis_pct"] - 1.0) < 1e-9
+    assert abs(snap["funding_1h_pct"] - 0.01) < 1e-9
+    assert snap["next_funding_in_sec"] == 3600
+    assert snap["delta_oi_1h_usdt"] == 500.0
+    assert abs(snap["perp_dominance_pct"] - 90.0) < 1e-9
+    assert snap["orderbook_imbalance"] == 2.0
+    assert "srs" in snap
+
+    # Per-second events inside one collect interval preview the TWAP but add no window samples
+    collector.premium["BTCUSDT"] = premium_from_mark_price({**MARK_EVENT, "p": "102.0"})
+    later = collector.build("BTCUSDT", now + 1_000)
+    windows = collector.windows["BTCUSDT"]
+    assert len(windows.basis) == len(windows.mark) == len(windows.funding) == 1
+    assert abs(later["basis_twap15_pct"] - 1.5) < 1e-9
+    collector.build("BTCUSDT", now + collector.windows.resolution_ms)
+    assert len(windows.mark) == 2
+    asyncio.run(collector.client.close())
@@ -3,19 +3,21 @@ import useSWR from "swr";
 import Link from "next/link";
 import { useState } from "react";
 import MetricHelp from "../components/MetricHelp";
+import useSnapshotStream from "../components/useSnapshotStream";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
 const fetcher = (url: string) => fetch(url).then((r) => r.json());
 
-function useMetrics(symbol: string) {
+// Every tile in one request; polled only while the stream is down
+function useTiles(poll: boolean) {
   const [latencyMs, setLatencyMs] = useState<number | null>(null);
-  const { data, error, isLoading } = useSWR(`${API_BASE}/metrics/${symbol}`, async (url) => {
+  const { data, error, isLoading } = useSWR(`${API_BASE}/metrics`, async (url) => {
     const t0 = performance.now();
     const res = await fetch(url);
     const json = await res.json();
     setLatencyMs(Math.round(performance.now() - t0));
     return json;
-  }, { refreshInterval: 10000 });
+  }, { refreshInterval: poll ? 10000 : 0 });
   return { data, error, isLoading, latencyMs };
 }
 
@@ -25,6 +27,8 @@ export default function Home() {
   const { data: available } = useSWR(`${API_BASE}/symbols/available?include_spot=true`, fetcher);
   const list: string[] = symbols?.watchlist || [];
   const [newSym, setNewSym] = useState("");
+  const { snapshots, live } = useSnapshotStream(list);
+  const { data: tiles, latencyMs } = useTiles(!live);
 
   async function addSymbol(sym: string) {
     const symbol = sym.trim().toUpperCase();
@@ -114,7 +118,7 @@ export default function Home() {
         {list.length === 0 ? (
           <div className="text-slate-400 text-sm">No symbols in watchlist.</div>
         ) : (
-          list.map((s) => <Tile key={s} symbol={s} onRemove={() => removeSymbol(s)} />)
+          list.map((s) => <Tile key={s} symbol={s} data={snapshots[s] ?? tiles?.tiles?.[s]} live={Boolean(snapshots[s])} latencyMs={latencyMs} onRemove={() => removeSymbol(s)} />)
         )}
       </section>
 
@@ -140,9 +144,8 @@ export default function Home() {
   );
 }
 
-function Tile({ symbol, onRemove }: { symbol: string; onRemove: () => void }) {
-  const { data, isLoading, latencyMs } = useMetrics(symbol);
-  if (!data || isLoading) return <div className="rounded border border-slate-700 p-4">Loading {symbol}…</div>;
+function Tile({ symbol, data, live, latencyMs, onRemove }: { symbol: string; data?: Record<string, any>; live: boolean; latencyMs: number | null; onRemove: () => void }) {
+  if (!data) return <div className="rounded border border-slate-700 p-4">Loading {symbol}…</div>;
 
   const ageSec = data?.ts ? Math.max(0, Math.round((Date.now() - data.ts) / 1000)) : null;
   const light = String(data.traffic_light || "YELLOW").toUpperCase();
@@ -180,7 +183,11 @@ function Tile({ symbol, onRemove }: { symbol: string; onRemove: () => void }) {
             {actionText}
           </span>
           {ageSec !== null && <span className="text-slate-400">age {ageSec}s</span>}
-          {typeof latencyMs === "number" && <span className="text-slate-400">api {latencyMs}ms</span>}
+          {live ? (
+            <span className="text-emerald-400" title="Updates pushed over /stream">live</span>
+          ) : (
+            typeof latencyMs === "number" && <span className="text-slate-400">api {latencyMs}ms</span>
+          )}
           <button onClick={onRemove} className="px-2 py-0.5 rounded border border-slate-600 hover:bg-red-500/10 hover:border-red-500">Remove</button>
         </div>
       </div>
@@ -1,6 +1,8 @@
 "use client";
 import { useParams } from "next/navigation";
 import useSWR from "swr";
+import { useRef } from "react";
+import useSnapshotStream from "../../../components/useSnapshotStream";
 import { AreaChart, Area, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from "recharts";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
@@ -11,19 +13,65 @@ function formatTs(ts: number) {
   return d.toLocaleTimeString();
 }
 
-function useSeries(symbol: string, metric: string, window = "6h") {
-  return useSWR(`${API_BASE}/timeseries/${symbol}?metric=${metric}&interval=1m&window=${window}`, fetcher, { refreshInterval: 10000 });
+const DETAIL_METRICS = ["mark", "basis", "funding", "oi", "dominance", "imbalance"];
+
+type Columns = { ts: number[]; series: Record<string, Array<number | null>> };
+
+const UNIT_MS: Record<string, number> = { s: 1000, m: 60 * 1000, h: 3600 * 1000, d: 86400 * 1000 };
+
+// "90s", "5m", "48h" or "7d" in milliseconds, parsed like the backend's parse_duration_ms
+function durationMs(text: string): number | null {
+  const unit = UNIT_MS[text.slice(-1).toLowerCase()];
+  const n = Number(text.slice(0, -1));
+  return unit && Number.isInteger(n) && n > 0 ? n * unit : null;
+}
+
+// Every chart's metric on one grid in one request: the full window once, then only rows
+// from `next_cursor` on; the first new row replaces the last one held (a bucket still filling)
+function useAlignedSeries(symbol: string, window = "6h") {
+  const url = `${API_BASE}/timeseries/${symbol}/aligned?metrics=${DETAIL_METRICS.join(",")}&interval=1m&window=${window}`;
+  const held = useRef<{ url: string; cols: Columns; cursor: number | null }>({ url, cols: { ts: [], series: {} }, cursor: null });
+  if (held.current.url !== url) held.current = { url, cols: { ts: [], series: {} }, cursor: null };
+  return useSWR(url, async () => {
+    const h = held.current;
+    const res = await fetch(h.cursor === null ? url : `${url}&since=${h.cursor}`);
+    if (!res.ok) return h.cols;
+    const json = await res.json();
+    const ts: number[] = json.ts || [];
+    if (ts.length > 0) {
+      const keepFrom = ts[ts.length - 1] - (durationMs(window) ?? Infinity);
+      const keep = h.cols.ts.map((t) => t < ts[0] && t >= keepFrom);
+      const series: Columns["series"] = {};
+      for (const m of DETAIL_METRICS) {
+        const old = h.cols.series[m] || [];
+        series[m] = old.filter((_, i) => keep[i]).concat(json.series?.[m] || []);
+      }
+      h.cols = { ts: h.cols.ts.filter((_, i) => keep[i]).concat(ts), series };
+    }
+    h.cursor = json.next_cursor ?? h.cursor;
+    return h.cols;
+  }, { refreshInterval: 10000 });
+}
+
+function points(cols: Columns | undefined, metric: string): PointTuple[] {
+  if (!cols) return [];
+  const values = cols.series[metric] || [];
+  const out: PointTuple[] = [];
+  cols.ts.forEach((t, i) => {
+    const v = values[i];
+    if (v !== null && v !== undefined) out.push([t, v]);
+  });
+  return out;
 }
 
 export default function SymbolDetail() {
   const params = useParams();
   const symbol = String(params?.symbol || "").toUpperCase();
-  const { data: snap } = useSWR(`${API_BASE}/metrics/${symbol}`, fetcher, { refreshInterval: 10000 });
+  const { snapshots, live } = useSnapshotStream(symbol ? [symbol] : []);
+  const { data: polled } = useSWR(`${API_BASE}/metrics/${symbol}`, fetcher, { refreshInterval: live ? 0 : 10000 });
+  const snap = snapshots[symbol] ?? polled;
 
-  const { data: basis } = useSeries(symbol, "basis");
-  const { data: funding } = useSeries(symbol, "funding");
-  const { data: oi } = useSeries(symbol, "oi");
-  const { data: dom } = useSeries(symbol, "dominance");
+  const { data: cols } = useAlignedSeries(symbol);
 
   return (
     <main className="p-4 space-y-6">
@@ -34,10 +82,12 @@ export default function SymbolDetail() {
       )}
 
       <div className="grid md:grid-cols-2 gap-6">
-        <ChartCard title="Basis (1m)" data={basis?.points || []} color="#60a5fa" />
-        <ChartCard title="Funding 1h%" data={funding?.points || []} color="#f59e0b" />
-        <ChartCard title="Open Interest (USDT)" data={oi?.points || []} color="#34d399" />
-        <ChartCard title="Perp Dominance%" data={dom?.points || []} color="#a78bfa" />
+        <ChartCard title="Mark" data={points(cols, "mark")} color="#e2e8f0" />
+        <ChartCard title="Basis (1m)" data={points(cols, "basis")} color="#60a5fa" />
+        <ChartCard title="Funding 1h%" data={points(cols, "funding")} color="#f59e0b" />
+        <ChartCard title="Open Interest (USDT)" data={points(cols, "oi")} color="#34d399" />
+        <ChartCard title="Perp Dominance%" data={points(cols, "dominance")} color="#a78bfa" />
+        <ChartCard title="Order Book Imbalance" data={points(cols, "imbalance")} color="#f472b6" />
       </div>
     </main>
   );
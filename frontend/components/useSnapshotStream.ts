@@ -0,0 +1,35 @@
+"use client";
+import { useEffect, useState } from "react";
+
+const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
+
+type Snapshot = Record<string, any>;
+
+// Live snapshots from GET /stream: a full `snapshot` per symbol, then `delta` patches.
+// EventSource reconnects on its own; the server resends full snapshots on every connect.
+export default function useSnapshotStream(symbols: string[]) {
+  const [snapshots, setSnapshots] = useState<Record<string, Snapshot>>({});
+  const [live, setLive] = useState(false);
+  const key = symbols.join(",");
+
+  useEffect(() => {
+    if (!key || typeof EventSource === "undefined") return;
+    const es = new EventSource(`${API_BASE}/stream?symbols=${encodeURIComponent(key)}`);
+    es.onopen = () => setLive(true);
+    es.onerror = () => setLive(false);
+    es.addEventListener("snapshot", (e) => {
+      const snap = JSON.parse((e as MessageEvent).data);
+      setSnapshots((prev) => ({ ...prev, [snap.symbol]: snap }));
+    });
+    es.addEventListener("delta", (e) => {
+      const delta = JSON.parse((e as MessageEvent).data);
+      setSnapshots((prev) => ({ ...prev, [delta.symbol]: { ...prev[delta.symbol], ...delta } }));
+    });
+    return () => {
+      es.close();
+      setLive(false);
+    };
+  }, [key]);
+
+  return { snapshots, live };
+}